@@ -4,25 +4,35 @@ Free tier available - 5 API calls per minute
 """
 
 import asyncio
+import time
 import aiohttp
-import json
-from decimal import Decimal
-from typing import Dict, List, Optional, Callable
-from datetime import datetime
+from typing import Dict, List, Optional, Callable, Iterable, Tuple
 import logging
-from .market_data import market_data
 from .config import settings
+from .feed_providers import FeedQuote
+from .prices import optional_paise, to_paise
+from .symbol_universe import diff_symbols
 
 logger = logging.getLogger(__name__)
 
 class AlphaVantageFeed:
-    """Alpha Vantage market data feed - Free tier available"""
+    """Alpha Vantage market data feed - Free tier available
+
+    As a feed provider it only spends the free tier's call budget (one call
+    per 12 s, up to 5 saved up), on the symbols it fetched least recently.
+    """
+
+    name = "alpha_vantage"
+    call_interval_seconds = 12.0
+    max_saved_calls = 5
     
     def __init__(self):
         self.api_key = getattr(settings, 'alpha_vantage_api_key', None)
         self.base_url = "https://www.alphavantage.co/query"
         self.price_callback = None
         self.is_running = False
+        self._budget_at = time.monotonic()
+        self._fetched_at: Dict[str, float] = {}
         
         # Indian stocks (Alpha Vantage uses different symbols)
         self.symbols = {
@@ -41,6 +51,34 @@ class AlphaVantageFeed:
     def set_price_callback(self, callback: Callable):
         """Set callback function for price updates"""
         self.price_callback = callback
+
+    def set_symbols(self, names: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Fetch exactly `names` from the next cycle on; returns (added, removed)"""
+        self.symbols, added, removed = diff_symbols(self.symbols, names, lambda name: f"{name}.BSE")
+        for name in removed:
+            self._fetched_at.pop(name, None)
+        return added, removed
+
+    def _take_calls(self, wanted: int) -> int:
+        """Calls allowed right now under the rate limit (saved up while idle)"""
+        now = time.monotonic()
+        saved = self.max_saved_calls * self.call_interval_seconds
+        self._budget_at = max(self._budget_at, now - saved)
+        calls = min(wanted, int((now - self._budget_at) // self.call_interval_seconds))
+        self._budget_at += calls * self.call_interval_seconds
+        return calls
+
+    async def fetch_quotes(self, symbols: Iterable[str]) -> List[FeedQuote]:
+        """Quotes for as many of `symbols` as the rate limit allows (the rest are left out)"""
+        symbols = sorted(symbols, key=lambda symbol: self._fetched_at.get(symbol, 0.0))
+        chosen = symbols[:self._take_calls(len(symbols))]
+        prices = await asyncio.gather(*(self.get_latest_price(symbol) for symbol in chosen))
+        now = time.monotonic()
+        quotes = []
+        for symbol, price in zip(chosen, prices):
+            self._fetched_at[symbol] = now
+            quotes.append((symbol, optional_paise(price), 0, "BSE", None))
+        return quotes
     
     async def get_latest_price(self, symbol: str) -> Optional[float]:
         """Get latest price for a symbol"""
@@ -84,7 +122,7 @@ class AlphaVantageFeed:
                 price = await self.get_latest_price(symbol)
                 if price and self.price_callback:
                     volume = 1000  # Default volume
-                    await self.price_callback(symbol, Decimal(str(price)), volume, "BSE")
+                    await self.price_callback(symbol, to_paise(price), volume, "BSE")
                     logger.info(f"Alpha Vantage: {symbol} = ₹{price}")
                 
                 # Wait 12 seconds between calls (5 calls per minute = 12 seconds each)
@@ -4,17 +4,26 @@ Angel Broking Market Data Feed
 
 import asyncio
 import json
+import time
 import websockets
 import aiohttp
-from typing import Dict, List, Optional, Callable
-from datetime import datetime
+from typing import Dict, List, Optional, Callable, Iterable, Tuple
 import logging
 from .config import settings
+from .feed_providers import FeedQuote
+from .prices import Paise, to_paise
+from .symbol_universe import diff_symbols
 
 logger = logging.getLogger(__name__)
 
 class AngelBrokingFeed:
-    """Angel Broking WebSocket feed for real-time market data"""
+    """Angel Broking WebSocket feed for real-time market data
+
+    As a feed provider it streams in the background (started by the first
+    fetch_quotes) and answers fetches from the latest LTP it received.
+    """
+
+    name = "angel"
     
     def __init__(self):
         self.api_key = settings.angel_api_key
@@ -29,6 +38,10 @@ class AngelBrokingFeed:
         self.ws_connection = None
         self.is_connected = False
         self.price_callback = None
+        # standard symbol -> (price paise, monotonic receive time)
+        self.latest: Dict[str, Tuple[Paise, float]] = {}
+        self.freshness_seconds = settings.feed_freshness_seconds
+        self._stream_task: Optional[asyncio.Task] = None
         
         # Common symbols mapping
         self.symbols = {
@@ -110,26 +123,72 @@ class AngelBrokingFeed:
             self.is_connected = False
             return False
     
-    async def subscribe_symbols(self):
-        """Subscribe to symbol feeds"""
+    async def subscribe_symbols(self, tokens: Optional[List[str]] = None, action: str = "subscribe"):
+        """Subscribe to symbol feeds (default: every symbol), or unsubscribe `tokens`"""
         if not self.is_connected:
             return
+        if tokens is None:
+            tokens = list(self.symbols.values())
+        if not tokens:
+            return
         
         try:
             # Subscribe to LTP (Last Traded Price) for symbols
             subscription_data = {
-                "actiontype": "subscribe",
+                "actiontype": action,
                 "feedtype": "ltp",
                 "jwttoken": self.feed_token,
                 "clientcode": self.client_id,
-                "tokens": list(self.symbols.values())
+                "tokens": tokens
             }
             
             await self.ws_connection.send(json.dumps(subscription_data))
-            logger.info(f"Subscribed to {len(self.symbols)} symbols")
+            logger.info(f"{action.capitalize()}d {len(tokens)} symbols")
             
         except Exception as e:
             logger.error(f"Subscription error: {e}")
+
+    def set_symbols(self, names: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Follow exactly `names`: subscribe the new ones, unsubscribe the dropped ones"""
+        previous = self.symbols
+        self.symbols, added, removed = diff_symbols(previous, names, lambda name: f"{name}-EQ")
+        for name in removed:
+            self.latest.pop(name, None)
+        if self.is_connected and (added or removed):
+            loop = asyncio.get_running_loop()
+            loop.create_task(self.subscribe_symbols([self.symbols[name] for name in added]))
+            loop.create_task(self.subscribe_symbols([previous[name] for name in removed], action="unsubscribe"))
+        return added, removed
+
+    async def _stream(self):
+        """Keep the WebSocket connected, reconnecting with backoff"""
+        delay = 1.0
+        while True:
+            started = time.monotonic()
+            await self.connect_websocket()
+            if time.monotonic() - started > 60:
+                delay = 1.0
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+    async def fetch_quotes(self, symbols: Iterable[str]) -> List[FeedQuote]:
+        """Latest streamed LTP of `symbols`; None price when none arrived within freshness_seconds"""
+        if self._stream_task is None or self._stream_task.done():
+            self._stream_task = asyncio.create_task(self._stream())
+        now = time.monotonic()
+        quotes = []
+        for symbol in symbols:
+            price, received = self.latest.get(symbol, (None, 0.0))
+            if price is not None and now - received > self.freshness_seconds:
+                price = None
+            quotes.append((symbol, price, 0, "NSE", None))
+        return quotes
+
+    async def close(self):
+        if self._stream_task is not None:
+            self._stream_task.cancel()
+            self._stream_task = None
+        await self.disconnect()
     
     async def listen_messages(self):
         """Listen for incoming WebSocket messages"""
@@ -167,13 +226,16 @@ class AngelBrokingFeed:
             for token_data in ltp_data:
                 symbol = token_data.get("symbol")
                 price = token_data.get("ltp", 0)
-                timestamp = datetime.now()
                 
-                if symbol and price and self.price_callback:
-                    # Convert Angel symbol to standard symbol
-                    standard_symbol = self.get_standard_symbol(symbol)
-                    if standard_symbol:
-                        await self.price_callback(standard_symbol, price, timestamp)
+                # Convert Angel symbol to standard symbol
+                standard_symbol = self.get_standard_symbol(symbol) if symbol and price else None
+                if standard_symbol:
+                    # LTP is rupees, possibly a JSON int
+                    price = to_paise(float(price))
+                    self.latest[standard_symbol] = (price, time.monotonic())
+                    if self.price_callback:
+                        # LTP packets carry no volume
+                        await self.price_callback(standard_symbol, price, 0, "NSE")
                         
         except Exception as e:
             logger.error(f"LTP data processing error: {e}")
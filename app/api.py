@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Form
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from .database import get_db
 from .models import User, AlertRule, AlertTrigger
 from .schemas import (
     UserCreate, User as UserSchema, AlertRuleCreate, AlertRule as AlertRuleSchema,
-    AlertRuleUpdate, AlertTrigger as AlertTriggerSchema, PriceData, OHLCVData, Token
+    AlertRuleUpdate, AlertTrigger as AlertTriggerSchema, PriceData, OHLCVData, SymbolDetails, Token
 )
+from .bars import TIMEFRAME_LABELS, parse_timeframe
+from .columnar import ARROW_STREAM_MEDIA_TYPE, ohlcv_arrow_stream, ohlcv_columns_json
 from .auth import get_current_active_user, get_password_hash, verify_password, create_access_token
 from .market_data import market_data
-from datetime import timedelta
+from .rule_changes import record_rule_change
+from datetime import datetime, timedelta
 from .config import settings
 
 router = APIRouter()
@@ -69,16 +72,78 @@ def get_latest_price(symbol: str):
     return price_data
 
 
+@router.get("/prices", response_model=List[PriceData])
+def get_latest_prices(symbols: str):
+    """Get latest prices for a comma-separated list of symbols (unknown symbols are omitted)"""
+    requested = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    if not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No symbols given"
+        )
+    return market_data.get_latest_prices(requested)
+
+
 @router.get("/ohlcv/{symbol}", response_model=List[OHLCVData])
-def get_ohlcv_data(symbol: str, minutes: int = 60):
-    """Get OHLCV data for a symbol"""
-    ohlcv_data = market_data.get_ohlcv_1min(symbol, minutes)
-    if not ohlcv_data:
+def get_ohlcv_data(request: Request, symbol: str, minutes: int = 60, timeframe: str = "1m",
+                   format: Optional[str] = None):
+    """Get OHLCV bars for a symbol over the last `minutes` (timeframe: 1m, 5m, 15m, 1h or 1d)
+
+    `format=columns` returns parallel arrays instead of one object per bar;
+    `format=arrow` (or `Accept: application/vnd.apache.arrow.stream`) returns
+    an Arrow IPC stream.
+    """
+    timeframe_minutes = parse_timeframe(timeframe)
+    if timeframe_minutes is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported timeframe {timeframe}; use one of {', '.join(TIMEFRAME_LABELS)}"
+        )
+    if format is None:
+        format = "arrow" if ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "") else "rows"
+    if format not in ("rows", "columns", "arrow"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format {format}; use rows, columns or arrow"
+        )
+    
+    if format == "rows":
+        ohlcv_data = market_data.get_ohlcv(symbol, timeframe_minutes, minutes)
+        found = bool(ohlcv_data)
+    else:
+        columns = market_data.get_ohlcv_columns(symbol, timeframe_minutes, minutes)
+        found = len(columns["timestamp"]) > 0
+    if not found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No OHLCV data found for {symbol}"
         )
-    return ohlcv_data
+    if format == "rows":
+        return ohlcv_data
+    if format == "columns":
+        return Response(ohlcv_columns_json(symbol, timeframe_minutes, columns), media_type="application/json")
+    try:
+        body = ohlcv_arrow_stream(symbol, timeframe_minutes, columns)
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Arrow output needs pyarrow installed on the server; use format=columns"
+        )
+    return Response(body, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+
+@router.get("/ticks/{symbol}", response_model=List[PriceData])
+def get_tick_history(symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     limit: int = 1000):
+    """Get raw ticks for a symbol between start and end (default: the last hour), newest first"""
+    end = end or datetime.now()
+    start = start or end - timedelta(hours=1)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    return market_data.get_ticks(symbol, start, end, min(max(limit, 1), 10000))
 
 
 @router.get("/symbols", response_model=List[str])
@@ -87,6 +152,12 @@ def get_all_symbols():
     return market_data.get_all_symbols()
 
 
+@router.get("/symbols/details", response_model=List[SymbolDetails])
+def get_symbol_details():
+    """Get every known symbol with its exchange, first/last stored tick time, stored tick count and last price"""
+    return market_data.get_symbol_details()
+
+
 # Alert endpoints
 @router.post("/alerts", response_model=AlertRuleSchema)
 def create_alert(
@@ -104,9 +175,12 @@ def create_alert(
         cooldown_minutes=alert.cooldown_minutes,
         data_source=alert.data_source,
         column_name=alert.column_name,
-        ohlcv_timeframe_minutes=alert.ohlcv_timeframe_minutes
+        ohlcv_timeframe_minutes=alert.ohlcv_timeframe_minutes,
+        trigger_mode=alert.trigger_mode
     )
     db.add(db_alert)
+    db.flush()  # Get alert ID for the change stream
+    record_rule_change(db, db_alert.id)
     db.commit()
     db.refresh(db_alert)
     return db_alert
@@ -167,6 +241,7 @@ def update_alert(
     for field, value in update_data.items():
         setattr(alert, field, value)
     
+    record_rule_change(db, alert.id)
     db.commit()
     db.refresh(alert)
     return alert
@@ -190,6 +265,7 @@ def delete_alert(
             detail="Alert not found"
         )
     
+    record_rule_change(db, alert.id, op="delete")
     db.delete(alert)
     db.commit()
     
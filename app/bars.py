@@ -0,0 +1,148 @@
+# app/bars.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .prices import PRICE_SCALE, Paise
+
+# Columns evaluated as soon as they move inside the bar
+INTRABAR_COLUMNS = ("high_price", "low_price")
+# Columns only final once the bar closes
+CLOSE_COLUMNS = ("open_price", "close_price", "volume")
+# Rule column aliases
+COLUMN_ALIASES = {"price": "close_price"}
+
+# (timeframe_minutes, column, value, previous value or None); values are fixed-point x100
+BarEvent = Tuple[int, str, Paise, Optional[Paise]]
+
+# Stored OHLCV timeframes (minutes) -> DuckDB table; everything above 1 minute
+# is rolled up from closed 1-minute bars
+OHLCV_TABLES = {
+    1: "ohlcv_1min",
+    5: "ohlcv_5min",
+    15: "ohlcv_15min",
+    60: "ohlcv_1hour",
+    1440: "ohlcv_1day",
+}
+ROLLUP_TIMEFRAMES = tuple(tf for tf in OHLCV_TABLES if tf > 1)
+TIMEFRAME_LABELS = {"1m": 1, "5m": 5, "15m": 15, "1h": 60, "1d": 1440}
+
+
+def parse_timeframe(value: str) -> Optional[int]:
+    """'5m' / '1h' / '1d' (or plain minutes) -> stored timeframe in minutes, None if not stored"""
+    value = value.strip().lower()
+    minutes = TIMEFRAME_LABELS.get(value)
+    if minutes is None and value.isdigit():
+        minutes = int(value)
+    return minutes if minutes in OHLCV_TABLES else None
+
+
+def bar_start(ts: datetime, timeframe_minutes: int) -> datetime:
+    """Start of the bar containing `ts`, aligned to local midnight like ohlcv_1min"""
+    midnight = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes = (ts.hour * 60 + ts.minute) // timeframe_minutes * timeframe_minutes
+    return midnight + timedelta(minutes=minutes)
+
+
+@dataclass
+class Bar:
+    start: datetime
+    open_price: Paise
+    high_price: Paise
+    low_price: Paise
+    close_price: Paise
+    volume: int = 0
+
+    def value(self, column: str) -> Paise:
+        """Column value on the same x100 scale as rule targets (volume included)"""
+        column = COLUMN_ALIASES.get(column, column)
+        if column == "volume":
+            return self.volume * PRICE_SCALE
+        return getattr(self, column)
+
+    def absorb(self, later: "Bar"):
+        """Fold a later bar of the same (longer) period into this one"""
+        if later.high_price > self.high_price:
+            self.high_price = later.high_price
+        if later.low_price < self.low_price:
+            self.low_price = later.low_price
+        self.close_price = later.close_price
+        self.volume += later.volume
+
+
+class BarAggregator:
+    """Builds OHLCV bars for one (symbol, timeframe) from ticks, O(1) per tick"""
+
+    def __init__(self, symbol: str, timeframe_minutes: int):
+        self.symbol = symbol
+        self.timeframe_minutes = timeframe_minutes
+        self.current: Optional[Bar] = None
+        self.last_closed: Optional[Bar] = None
+
+    def update(self, price: Paise, volume: int, ts: datetime) -> List[BarEvent]:
+        tf = self.timeframe_minutes
+        start = bar_start(ts, tf)
+        events: List[BarEvent] = []
+        bar = self.current
+
+        if bar is not None and start > bar.start:
+            # Bar closed: close-time columns are final now
+            prev = self.last_closed
+            for column in CLOSE_COLUMNS:
+                events.append((tf, column, bar.value(column), prev.value(column) if prev else None))
+            self.last_closed = bar
+            bar = None
+
+        if bar is None:
+            bar = self.current = Bar(start, price, price, price, price, volume)
+            prev = self.last_closed
+            for column in INTRABAR_COLUMNS:
+                events.append((tf, column, price, prev.value(column) if prev else None))
+            return events
+
+        if price > bar.high_price:
+            events.append((tf, "high_price", price, bar.high_price))
+            bar.high_price = price
+        if price < bar.low_price:
+            events.append((tf, "low_price", price, bar.low_price))
+            bar.low_price = price
+        bar.close_price = price
+        bar.volume += volume
+        return events
+
+
+class BarBook:
+    """One shared BarAggregator per distinct (symbol, timeframe) referenced by rules"""
+
+    def __init__(self):
+        self.aggregators: Dict[Tuple[str, int], BarAggregator] = {}
+        self._by_symbol: Dict[str, List[BarAggregator]] = {}
+
+    def __len__(self) -> int:
+        return len(self.aggregators)
+
+    def sync(self, series: Iterable[Tuple[str, int]]):
+        """Keep aggregators for exactly the referenced series (existing bars are kept)"""
+        wanted: Set[Tuple[str, int]] = set(series)
+        for key in list(self.aggregators):
+            if key not in wanted:
+                del self.aggregators[key]
+        for key in wanted:
+            if key not in self.aggregators:
+                self.aggregators[key] = BarAggregator(*key)
+        self._by_symbol = {}
+        for (symbol, _), aggregator in self.aggregators.items():
+            self._by_symbol.setdefault(symbol, []).append(aggregator)
+
+    def update(self, symbol: str, price: Paise, volume: int,
+               ts: Optional[datetime] = None) -> List[BarEvent]:
+        aggregators = self._by_symbol.get(symbol)
+        if not aggregators:
+            return []
+        ts = ts or datetime.now()
+        events: List[BarEvent] = []
+        for aggregator in aggregators:
+            events.extend(aggregator.update(price, volume, ts))
+        return events
@@ -0,0 +1,55 @@
+# app/columnar.py
+"""
+Column-oriented encodings of OHLCV bars for chart clients.
+
+`MarketDataManager.get_ohlcv_columns` returns parallel NumPy arrays; these
+helpers turn them into a response body without building an object per bar:
+
+- "columns": JSON object of parallel arrays (timestamps as ISO strings,
+  prices as rupee floats);
+- "arrow": Apache Arrow IPC stream. This needs the optional `pyarrow`
+  package, imported on first use.
+"""
+from __future__ import annotations
+
+import json
+from typing import Dict
+
+import numpy as np
+
+from .prices import PRICE_SCALE
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PRICE_COLUMNS = ("open_price", "high_price", "low_price", "close_price")
+
+
+def ohlcv_columns_json(symbol: str, timeframe_minutes: int, columns: Dict[str, np.ndarray]) -> bytes:
+    """{"symbol", "timeframe_minutes", "timestamp": [...], "open_price": [...], ...} as UTF-8 JSON"""
+    body = {
+        "symbol": symbol,
+        "timeframe_minutes": timeframe_minutes,
+        "timestamp": np.datetime_as_string(columns["timestamp"], unit="s").tolist(),
+        **{name: (columns[name] / PRICE_SCALE).tolist() for name in PRICE_COLUMNS},
+        "volume": columns["volume"].tolist(),
+        "exchange": columns["exchange"].tolist(),
+    }
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def ohlcv_arrow_stream(symbol: str, timeframe_minutes: int, columns: Dict[str, np.ndarray]) -> bytes:
+    """Arrow IPC stream of the bars; raises ImportError when pyarrow is not installed"""
+    import pyarrow as pa
+
+    table = pa.table({
+        "timestamp": pa.array(columns["timestamp"]),
+        **{name: pa.array(columns[name] / PRICE_SCALE) for name in PRICE_COLUMNS},
+        "volume": pa.array(columns["volume"]),
+        "exchange": pa.array(columns["exchange"].tolist(), type=pa.string()),
+    }).replace_schema_metadata({
+        "symbol": symbol,
+        "timeframe_minutes": str(timeframe_minutes),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
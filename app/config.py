@@ -31,7 +31,68 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     
     # Feed selection
-    feed_provider: str = "auto"  # options: auto, simple, yahoo, alpha_vantage, angel, openalgo, upstox, dhan
+    feed_provider: str = "auto"  # auto (every configured provider) or a list in priority order: yahoo,angel,alpha_vantage
+    feed_hedge_seconds: float = 1.5  # ask the next provider after at least this long (or the current one's p95)
+    feed_timeout_seconds: float = 10.0  # give up on a poll's missing symbols after this long
+    feed_freshness_seconds: float = 90.0  # older exchange times do not count as an answer
+    feed_min_fresh_ratio: float = 0.5  # a provider answering fewer fresh quotes than this counts as failing
+    feed_breaker_failures: int = 3  # consecutive failures before a provider is taken out of rotation
+    feed_breaker_open_seconds: float = 30.0  # first probe after this long, doubling up to the max
+    feed_breaker_max_open_seconds: float = 300.0
+    
+    # Yahoo feed (multi-symbol quote requests; per-symbol yfinance calls when off or failing)
+    yahoo_batch_fetch: bool = True
+    yahoo_batch_size: int = 100  # symbols per quote request
+    yahoo_max_connections: int = 4  # keep-alive connections in the pool
+    yahoo_timeout_seconds: float = 10.0
+    yahoo_breaker_failures: int = 3  # consecutive failures before a symbol's source tier is skipped
+    yahoo_breaker_open_seconds: float = 60.0  # first retry (half-open probe) after this long
+    yahoo_breaker_max_open_seconds: float = 300.0  # probe interval doubles up to this
+    
+    # Poll scheduling (per symbol: sooner near an alert threshold or when volatile)
+    adaptive_polling: bool = True  # off: every symbol every poll_base_seconds
+    poll_min_seconds: float = 2.0
+    poll_base_seconds: float = 8.0  # fixed interval when not adaptive; retry after a failed fetch
+    poll_max_seconds: float = 60.0  # symbols far from every threshold, or without rules
+    poll_volatility_z: float = 3.0  # poll before a move of this many sigmas could reach a threshold
+    market_hours_only: bool = True  # no polling outside NSE sessions
+    nse_holidays_file: Optional[str] = None  # extra exchange holidays, one YYYY-MM-DD per line
+    
+    # Symbol universe (feeds follow active rules plus what the UI watches)
+    dynamic_symbols: bool = True  # off: the feeds' fixed NIFTY lists
+    watch_symbols: str = ""  # always polled, comma-separated
+    symbol_watch_seconds: float = 15.0  # how often the worker asks the API what the UI watches
+    
+    # Worker rule cache (fed by the alert_rule_changes stream)
+    rule_sync_seconds: float = 1.0  # max delay before API rule edits reach the worker
+    rule_sync_overlap: int = 200  # re-scan window for change ids committed out of order
+    batch_evaluation: bool = True  # evaluate each poll cycle as one NumPy snapshot
+    trigger_write_attempts: int = 3  # retries of a batch's trigger/deactivation write (idempotent)
+    
+    # Tick storage (DuckDB bulk writer)
+    tick_flush_rows: int = 5000  # flush once this many ticks are buffered
+    tick_flush_seconds: float = 1.0  # ...or after this long
+    tick_change_only: bool = True  # store a repeated tick only as the end of its run
+    metrics_log_seconds: int = 60  # worker metrics log interval
+    
+    # Tick archive (closed days move from DuckDB to partitioned Parquet)
+    tick_archive_path: str = "./data/tick_archive"
+    tick_hot_days: int = 1  # days kept in the DuckDB ticks table, today included
+    tick_archive_interval_seconds: int = 3600
+    tick_archive_compact_files: int = 2  # merge a partition once it has this many files
+    
+    # Shared latest-quote table (worker writes, API processes map it read-only)
+    quote_table_path: str = "./data/quotes.shm"
+    quote_table_capacity: int = 4096  # symbols per table
+    quote_table_heartbeat_seconds: float = 5.0
+    quote_table_stale_seconds: float = 60.0  # readers skip a table whose writer is silent this long
+    
+    # Worker sharding (run several workers, each owning a slice of the symbols)
+    worker_sharding: bool = False
+    worker_id: Optional[str] = None  # defaults to <hostname>-<pid>
+    shard_count: int = 64
+    shard_lease_seconds: int = 30
+    shard_heartbeat_seconds: int = 10
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,66 @@
+# app/cooldown.py
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Set
+
+
+class CooldownWheel:
+    """
+    Hashed timing wheel of rule cooldowns.
+    `active()` is a dict lookup, so rules cooling down are skipped in O(1);
+    `advance()` only visits the slots that elapsed since the last call and
+    re-arms the rules whose cooldown has expired. Cooldowns longer than one
+    revolution simply stay in their slot until their expiry comes round.
+    """
+
+    def __init__(self, slots: int = 3600, tick_seconds: float = 1.0):
+        self.tick_seconds = tick_seconds
+        self._slots: List[Set[int]] = [set() for _ in range(slots)]
+        self.expiries: Dict[int, float] = {}
+        self._last_tick = None
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+    def _tick(self, ts: float) -> int:
+        return int(math.floor(ts / self.tick_seconds))
+
+    def _slot(self, ts: float) -> Set[int]:
+        return self._slots[self._tick(ts) % len(self._slots)]
+
+    def start(self, rule_id: int, until: float):
+        """Put a rule in cooldown until the epoch timestamp `until`"""
+        self.cancel(rule_id)
+        self.expiries[rule_id] = until
+        self._slot(until).add(rule_id)
+
+    def cancel(self, rule_id: int):
+        until = self.expiries.pop(rule_id, None)
+        if until is not None:
+            self._slot(until).discard(rule_id)
+
+    def active(self, rule_id: int, now: float) -> bool:
+        until = self.expiries.get(rule_id)
+        return until is not None and until > now
+
+    def advance(self, now: float) -> List[int]:
+        """Expire cooldowns up to `now`; returns the re-armed rule ids"""
+        # Only sweep fully elapsed ticks so no slot is left half-processed
+        current = self._tick(now) - 1
+        if self._last_tick is None:
+            # First call: cooldowns started before it (restored at startup) may lie in any slot
+            self._last_tick = current - len(self._slots)
+        if current <= self._last_tick:
+            return []
+
+        rearmed: List[int] = []
+        first = max(self._last_tick + 1, current - len(self._slots) + 1)
+        for tick in range(first, current + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for rule_id in [r for r in slot if self.expiries[r] <= now]:
+                slot.discard(rule_id)
+                del self.expiries[rule_id]
+                rearmed.append(rule_id)
+        self._last_tick = current
+        return rearmed
@@ -4,6 +4,8 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy import text
 import duckdb
 import os
+from typing import Optional
+from .bars import OHLCV_TABLES
 from .config import settings
 
 # PostgreSQL setup
@@ -11,10 +13,21 @@ engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def insert_ignoring_conflicts(dialect_name: str, table, index_elements):
+    """INSERT ... ON CONFLICT DO NOTHING for PostgreSQL/SQLite (None on other dialects)"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
 # DuckDB setup
-def get_duckdb_connection():
-    """Get DuckDB connection for market data"""
-    raw_path = settings.duckdb_path or ":memory:"
+def get_duckdb_connection(path: Optional[str] = None):
+    """Get DuckDB connection for market data (settings.duckdb_path unless a path is given)"""
+    raw_path = path or settings.duckdb_path or ":memory:"
     # Normalize quotes around special value
     duckdb_path = str(raw_path).strip().strip('"\'')
     if duckdb_path == ":memory:":
@@ -42,22 +55,39 @@ def get_duckdb_connection():
         )
     """)
     
+    # ohlcv_1min plus the rollup tables (ohlcv_5min ... ohlcv_1day) share one layout
+    for table in OHLCV_TABLES.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                symbol VARCHAR(50),
+                open_price DECIMAL(10, 2),
+                high_price DECIMAL(10, 2),
+                low_price DECIMAL(10, 2),
+                close_price DECIMAL(10, 2),
+                volume BIGINT,
+                timestamp TIMESTAMP,
+                exchange VARCHAR(20)
+            )
+        """)
+    
+    # Symbol registry, upserted from every tick batch
     conn.execute("""
-        CREATE TABLE IF NOT EXISTS ohlcv_1min (
-            symbol VARCHAR(50),
-            open_price DECIMAL(10, 2),
-            high_price DECIMAL(10, 2),
-            low_price DECIMAL(10, 2),
-            close_price DECIMAL(10, 2),
-            volume BIGINT,
-            timestamp TIMESTAMP,
-            exchange VARCHAR(20)
+        CREATE TABLE IF NOT EXISTS symbols (
+            symbol VARCHAR(50) PRIMARY KEY,
+            exchange VARCHAR(20),
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP,
+            stored_ticks BIGINT,
+            last_price DECIMAL(10, 2)
         )
     """)
     
     # Create indexes
     conn.execute("CREATE INDEX IF NOT EXISTS idx_ticks_symbol_timestamp ON ticks(symbol, timestamp)")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_ohlcv_symbol_timestamp ON ohlcv_1min(symbol, timestamp)")
+    for table in OHLCV_TABLES.values():
+        if table != "ohlcv_1min":
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_symbol_timestamp ON {table}(symbol, timestamp)")
     
     return conn
 
@@ -79,6 +109,16 @@ def _ensure_sqlite_migrations():
                 conn.execute(text("ALTER TABLE alert_rules ADD COLUMN column_name VARCHAR(20) NOT NULL DEFAULT 'price'"))
             if 'ohlcv_timeframe_minutes' not in col_names:
                 conn.execute(text("ALTER TABLE alert_rules ADD COLUMN ohlcv_timeframe_minutes INTEGER NOT NULL DEFAULT 1"))
+            if 'trigger_mode' not in col_names:
+                conn.execute(text("ALTER TABLE alert_rules ADD COLUMN trigger_mode VARCHAR(10) NOT NULL DEFAULT 'level'"))
+
+            # Check alert_triggers table
+            cols = conn.execute(text("PRAGMA table_info('alert_triggers')")).fetchall()
+            col_names = {row[1] for row in cols}
+            if cols and 'batch_id' not in col_names:
+                conn.execute(text("ALTER TABLE alert_triggers ADD COLUMN batch_id VARCHAR(32)"))
+            if cols:
+                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_alert_triggers_rule_batch ON alert_triggers(alert_rule_id, batch_id)"))
     except Exception:
         # Best-effort; avoid blocking app startup for local DBs
         pass
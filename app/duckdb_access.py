@@ -0,0 +1,155 @@
+# app/duckdb_access.py
+"""
+Thread-safe access to the market data DuckDB database.
+
+A DuckDB connection must not be used from several threads at once, yet
+MarketDataManager is called from FastAPI's threadpool, the worker's event
+loop, `asyncio.to_thread` helpers and the tick writer thread. `DuckDBAccess`
+splits the traffic:
+
+- reads run on a cursor owned by the calling thread (`conn.cursor()`, created
+  lazily), so concurrent readers never share connection state and DuckDB can
+  run them in parallel;
+- writes are jobs `fn(cursor)` queued to one writer thread with its own
+  cursor, so DuckDB only ever sees a single writer and callers get the job's
+  result (or exception) back through a Future.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DuckDBAccess:
+    """Per-thread read cursors plus a single queue-fed writer thread over one DuckDB database"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._local = threading.local()
+        # Read cursor per thread; those of finished threads are closed when the next one is made
+        self._cursors: Dict[threading.Thread, Any] = {}
+        self._cursors_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[Callable[[Any], Any], Future, float]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        self.writes = 0
+        self.failed_writes = 0
+        self.max_queue_depth = 0
+        self.max_queue_wait_ms = 0.0
+
+    # Reads
+
+    def cursor(self):
+        """This thread's read cursor"""
+        if self._closed:
+            raise RuntimeError("DuckDB access layer is closed")
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.conn.cursor()
+            self._local.cursor = cursor
+            with self._cursors_lock:
+                finished = [thread for thread in self._cursors if not thread.is_alive()]
+                stale = [self._cursors.pop(thread) for thread in finished]
+                self._cursors[threading.current_thread()] = cursor
+            for old in stale:
+                self._close_cursor(old)
+        return cursor
+
+    def fetchone(self, sql: str, params: Optional[Sequence] = None):
+        return self.cursor().execute(sql, params or []).fetchone()
+
+    def fetchall(self, sql: str, params: Optional[Sequence] = None) -> list:
+        return self.cursor().execute(sql, params or []).fetchall()
+
+    # Writes
+
+    def submit(self, job: Callable[[Any], T]) -> "Future[T]":
+        """Queue `job(cursor)` for the writer thread"""
+        if self._closed:
+            raise RuntimeError("DuckDB access layer is closed")
+        self._ensure_writer()
+        future: "Future[T]" = Future()
+        self._queue.put((job, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def write(self, job: Callable[[Any], T]) -> T:
+        """Run `job(cursor)` on the writer thread and wait for its result"""
+        if threading.current_thread() is self._writer:
+            # Already on the writer (a job writing more); queueing would deadlock
+            return job(self._local.cursor)
+        return self.submit(job).result()
+
+    def execute(self, sql: str, params: Optional[Sequence] = None):
+        """Single write statement through the writer thread"""
+        self.write(lambda cursor: cursor.execute(sql, params or []))
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="duckdb-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        cursor = self.cursor()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, future, queued = item
+            wait_ms = (time.perf_counter() - queued) * 1000
+            if wait_ms > self.max_queue_wait_ms:
+                self.max_queue_wait_ms = wait_ms
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(job(cursor))
+                self.writes += 1
+            except BaseException as e:
+                self.failed_writes += 1
+                future.set_exception(e)
+
+    def close(self):
+        """Finish queued writes, stop the writer and close every cursor and the connection"""
+        self._closed = True
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout=30)
+        with self._cursors_lock:
+            cursors, self._cursors = list(self._cursors.values()), {}
+        for cursor in cursors:
+            self._close_cursor(cursor)
+        self.conn.close()
+
+    @staticmethod
+    def _close_cursor(cursor):
+        try:
+            cursor.close()
+        except Exception as e:
+            logger.debug("Closing DuckDB cursor failed: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "read_cursors": len(self._cursors),
+            "write_queue_depth": self._queue.qsize(),
+            "max_write_queue_depth": self.max_queue_depth,
+            "max_write_wait_ms": round(self.max_queue_wait_ms, 1),
+            "writes": self.writes,
+            "failed_writes": self.failed_writes,
+        }
@@ -0,0 +1,317 @@
+# app/feed_providers.py
+"""
+Market data provider registry and hedged, failing-over quote routing.
+
+Every provider implements the same async interface:
+
+    name: str
+    async fetch_quotes(symbols) -> List[FeedQuote]   # quotes it could get; None price = not fresh
+    set_symbols(symbols)                             # follow the symbol universe
+    async close()                                    # optional
+
+Providers register a factory under a name (`register_provider`), and
+`build_providers(spec)` turns `settings.feed_provider` ("auto" or a
+comma-separated list) into instances. "auto" picks every registered provider
+whose credentials are configured.
+
+`FeedRouter.fetch` asks the healthiest provider first. If the provider has
+not answered every symbol by its hedge delay, the symbols still missing go to
+the next provider, and so on. The hedge delay is about the provider's p95
+latency (EWMA mean + 4 EWMA deviations), floored at `hedge_seconds`. A
+provider that answers early, but only in part, hands the rest over at once.
+Per symbol, the first fresh answer wins and the remaining requests are
+cancelled. A quote is fresh when it has a price and an exchange time no
+older than `freshness_seconds`, and that time is not older than what was
+already emitted for the symbol.
+
+Each provider has a circuit breaker. Errors, timeouts, and answers that
+mostly lack a usable price count as failures. A valid but stale quote is
+not a failure (an illiquid symbol simply has not traded); it only leaves the
+symbol to the next provider. An open breaker removes the provider from
+rotation until its half-open probe, so traffic fails over automatically.
+`unseen()` drops quotes already delivered, for example when a stream and a
+poll both report the same trade: by (symbol, exchange time), or by
+(symbol, price, volume) for providers that report no exchange time.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .fetch_tiers import CircuitBreaker
+from .prices import Paise
+
+logger = logging.getLogger(__name__)
+
+# symbol, price in paise (None: nothing fresh), volume, exchange, exchange time (None: not reported)
+FeedQuote = Tuple[str, Optional[Paise], int, str, Optional[datetime]]
+
+# name -> (factory, configured?)
+_REGISTRY: Dict[str, Tuple[Callable[[], object], Callable[[], bool]]] = {}
+
+
+def register_provider(name: str, factory: Callable[[], object],
+                      configured: Callable[[], bool] = lambda: True):
+    """Make a provider available to build_providers; `factory` may import lazily"""
+    _REGISTRY[name] = (factory, configured)
+
+
+def registered_providers() -> List[str]:
+    return list(_REGISTRY)
+
+
+def build_providers(spec: str) -> List[object]:
+    """Instances for "auto" (every configured provider) or a comma-separated list, in order"""
+    spec = (spec or "auto").strip().lower()
+    if spec == "auto":
+        names = [name for name, (_, configured) in _REGISTRY.items() if configured()]
+    else:
+        names = [name.strip() for name in spec.split(",") if name.strip()]
+    providers = []
+    for name in dict.fromkeys(names):
+        if name not in _REGISTRY:
+            logger.warning("Unknown feed provider %r (known: %s)", name, ", ".join(_REGISTRY))
+            continue
+        factory, configured = _REGISTRY[name]
+        if not configured():
+            logger.warning("Feed provider %s is not configured, skipping it", name)
+            continue
+        try:
+            providers.append(factory())
+        except Exception as e:
+            # Missing optional dependency or bad credentials: run without it
+            logger.error("Feed provider %s unavailable: %s", name, e)
+    return providers
+
+
+class _ProviderStats:
+    __slots__ = ("requests", "symbols", "fresh", "stale", "wins", "hedges", "cancelled", "errors", "timeouts",
+                 "degraded", "latency", "deviation", "max_latency", "age_total", "age_samples")
+
+    def __init__(self):
+        self.requests = 0
+        self.symbols = 0
+        self.fresh = 0
+        self.stale = 0
+        self.wins = 0
+        self.hedges = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.degraded = 0
+        self.latency = 0.0
+        self.deviation = 0.0
+        self.max_latency = 0.0
+        self.age_total = 0.0
+        self.age_samples = 0
+
+    def observe_latency(self, seconds: float, alpha: float = 0.2):
+        if not self.latency:
+            self.latency = seconds
+        else:
+            self.deviation += alpha * (abs(seconds - self.latency) - self.deviation)
+            self.latency += alpha * (seconds - self.latency)
+        self.max_latency = max(self.max_latency, seconds)
+
+
+class FeedRouter:
+    """Sends each poll to the providers as hedged requests; first fresh answer per symbol wins"""
+
+    def __init__(self, providers: Sequence[object], hedge_seconds: float = 1.5, timeout_seconds: float = 10.0,
+                 freshness_seconds: float = 90.0, min_fresh_ratio: float = 0.5, failure_threshold: int = 3,
+                 open_seconds: float = 30.0, max_open_seconds: float = 300.0):
+        self.providers = list(providers)
+        self.hedge_seconds = hedge_seconds
+        self.timeout_seconds = max(hedge_seconds, timeout_seconds)
+        self.freshness_seconds = freshness_seconds
+        self.min_fresh_ratio = min_fresh_ratio
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self._breakers = {provider.name: CircuitBreaker() for provider in self.providers}
+        self._stats = {provider.name: _ProviderStats() for provider in self.providers}
+        # symbol -> newest exchange time handed out (fetch)
+        self._latest: Dict[str, datetime] = {}
+        # symbol -> last delivered exchange time, or (price, volume) when it had none (unseen)
+        self._delivered: Dict[str, object] = {}
+        self.duplicates = 0
+
+    def set_symbols(self, symbols: Iterable[str]):
+        symbols = list(symbols)
+        wanted = set(symbols)
+        for provider in self.providers:
+            try:
+                provider.set_symbols(symbols)
+            except Exception as e:
+                logger.error("Feed provider %s could not follow the symbol set: %s", provider.name, e)
+        for seen in (self._latest, self._delivered):
+            for symbol in seen.keys() - wanted:
+                del seen[symbol]
+
+    def _healthy(self, now: float) -> List[object]:
+        healthy = [p for p in self.providers if self._breakers[p.name].allows(now)]
+        # Every breaker open: keep trying the first provider rather than going dark
+        return healthy or self.providers[:1]
+
+    def _hedge_delay(self, name: str) -> float:
+        stats = self._stats[name]
+        return min(self.timeout_seconds, max(self.hedge_seconds, stats.latency + 4 * stats.deviation))
+
+    @staticmethod
+    def _valid(quote: FeedQuote) -> bool:
+        return quote[1] is not None and quote[1] > 0
+
+    def _fresh(self, quote: FeedQuote, now: datetime) -> bool:
+        """Valid, and neither older than freshness_seconds nor than what was handed out before"""
+        symbol, price, _, _, exchange_time = quote
+        if not self._valid(quote):
+            return False
+        if exchange_time is None:
+            return True
+        if (now - exchange_time).total_seconds() > self.freshness_seconds:
+            return False
+        latest = self._latest.get(symbol)
+        return latest is None or exchange_time >= latest
+
+    def _failure(self, name: str, now: float):
+        if self._breakers[name].failure(now, self.failure_threshold, self.open_seconds, self.max_open_seconds):
+            logger.warning("Feed provider %s degraded; failing over for %.0fs",
+                           name, self._breakers[name].open_seconds)
+
+    def _accept(self, provider, quotes: List[FeedQuote], pending: Set[str],
+                winners: Dict[str, FeedQuote], started: float):
+        """Account one finished provider request and take its fresh quotes for pending symbols"""
+        name = provider.name
+        stats = self._stats[name]
+        stats.observe_latency(time.monotonic() - started)
+        now = datetime.now(timezone.utc)
+        fresh = valid = 0
+        for quote in quotes:
+            if not self._valid(quote):
+                continue
+            valid += 1
+            if not self._fresh(quote, now):
+                continue
+            fresh += 1
+            if quote[4] is not None:
+                stats.age_total += max(0.0, (now - quote[4]).total_seconds())
+                stats.age_samples += 1
+            symbol = quote[0]
+            if symbol in pending:
+                pending.discard(symbol)
+                winners[symbol] = quote
+                stats.wins += 1
+                if quote[4] is not None:
+                    self._latest[symbol] = quote[4]
+        stats.symbols += len(quotes)
+        stats.fresh += fresh
+        stats.stale += valid - fresh
+        # Stale but valid quotes are an answer, not a fault of the provider
+        if quotes and valid < self.min_fresh_ratio * len(quotes):
+            stats.degraded += 1
+            self._failure(name, time.monotonic())
+        elif valid:
+            self._breakers[name].success()
+
+    async def fetch(self, symbols: Sequence[str]) -> List[FeedQuote]:
+        """One quote per symbol: the first fresh one any provider returns, else (symbol, None, 0, ...)"""
+        pending = set(symbols)
+        winners: Dict[str, FeedQuote] = {}
+        candidates = self._healthy(time.monotonic())
+        running: Dict[asyncio.Task, Tuple[object, float]] = {}
+        deadline = time.monotonic() + self.timeout_seconds
+        hedge_at = 0.0
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if candidates and (not running or now >= hedge_at):
+                    provider = candidates.pop(0)
+                    stats = self._stats[provider.name]
+                    stats.requests += 1
+                    if running:
+                        stats.hedges += 1
+                    asked = [symbol for symbol in symbols if symbol in pending]
+                    running[asyncio.ensure_future(provider.fetch_quotes(asked))] = (provider, now)
+                    hedge_at = now + self._hedge_delay(provider.name)
+                if not running or now >= deadline:
+                    break
+                wait_until = min(deadline, hedge_at) if candidates else deadline
+                done, _ = await asyncio.wait(
+                    running, timeout=max(0.0, wait_until - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    provider, started = running.pop(task)
+                    try:
+                        quotes = task.result()
+                    except Exception as e:
+                        logger.debug("Feed provider %s failed: %s", provider.name, e)
+                        self._stats[provider.name].errors += 1
+                        self._failure(provider.name, time.monotonic())
+                    else:
+                        self._accept(provider, quotes, pending, winners, started)
+                    # Failed or partial answer: hand the rest to the next provider now
+                    hedge_at = 0.0
+        finally:
+            for task, (provider, _) in running.items():
+                task.cancel()
+                if pending and time.monotonic() >= deadline:
+                    self._stats[provider.name].timeouts += 1
+                    self._failure(provider.name, time.monotonic())
+                else:
+                    self._stats[provider.name].cancelled += 1
+
+        return [winners.get(symbol) or (symbol, None, 0, "NSE", None) for symbol in symbols]
+
+    def unseen(self, quotes: Iterable[FeedQuote]) -> List[FeedQuote]:
+        """Priced quotes not delivered before (same exchange time, or same price and volume without one)"""
+        delivered = []
+        for quote in quotes:
+            symbol, price, volume, _, exchange_time = quote
+            if price is None:
+                continue
+            key = exchange_time if exchange_time is not None else (price, volume)
+            if self._delivered.get(symbol) == key:
+                self.duplicates += 1
+                continue
+            self._delivered[symbol] = key
+            delivered.append(quote)
+        return delivered
+
+    async def close(self):
+        for provider in self.providers:
+            close = getattr(provider, "close", None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception as e:
+                    logger.error("Closing feed provider %s failed: %s", provider.name, e)
+
+    def stats(self) -> dict:
+        """Per provider: requests, hedges, win/fresh rates, latency, quote age, breaker state"""
+        stats = {}
+        for provider in self.providers:
+            name = provider.name
+            s = self._stats[name]
+            breaker = self._breakers[name]
+            stats[name] = {
+                "requests": s.requests,
+                "hedges": s.hedges,
+                "wins": s.wins,
+                "fresh_rate": round(s.fresh / s.symbols, 3) if s.symbols else 0.0,
+                "stale_rate": round(s.stale / s.symbols, 3) if s.symbols else 0.0,
+                "avg_ms": round(s.latency * 1000, 1),
+                "p95_ms": round((s.latency + 4 * s.deviation) * 1000, 1),
+                "max_ms": round(s.max_latency * 1000, 1),
+                "avg_age_s": round(s.age_total / s.age_samples, 1) if s.age_samples else None,
+                "errors": s.errors,
+                "timeouts": s.timeouts,
+                "degraded": s.degraded,
+                "cancelled": s.cancelled,
+                "breaker": breaker.state,
+            }
+        stats["duplicates"] = self.duplicates
+        return stats
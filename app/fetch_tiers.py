@@ -0,0 +1,164 @@
+# app/fetch_tiers.py
+"""
+Per-symbol memo of which quote source ("tier") works, with circuit breakers.
+
+A feed with a fallback chain (cheapest source first, heavier ones after)
+asks `order(symbol)` which tiers to try this poll. Each (symbol, tier) has a
+breaker; an open breaker means the tier is skipped. When a symbol is
+answered by a tier after cheaper tiers failed in the same poll, those
+cheaper breakers open at once, so from the next poll the symbol goes
+straight to the tier that worked: one request per symbol in steady state.
+A tier that fails `failure_threshold` times in a row with nothing better
+answering opens too. After `open_seconds` a breaker turns half-open and the
+next poll sends one probe; success closes it (and the cheaper tier takes
+over again), failure reopens it for twice as long, up to `max_open_seconds`.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    __slots__ = ("state", "failures", "open_seconds", "retry_at")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.open_seconds = 0.0
+        self.retry_at = 0.0
+
+    def allows(self, now: float) -> bool:
+        if self.state == OPEN and now >= self.retry_at:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.open_seconds = 0.0
+
+    def failure(self, now: float, threshold: int, open_seconds: float, max_open_seconds: float) -> bool:
+        """Count a failure; True when this one opened the breaker"""
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.open_seconds = min(self.open_seconds * 2, max_open_seconds)
+        elif self.failures >= threshold:
+            self.open_seconds = open_seconds
+        else:
+            return False
+        self.state = OPEN
+        self.retry_at = now + self.open_seconds
+        return True
+
+
+class _TierStats:
+    __slots__ = ("attempts", "successes", "total_ms", "max_ms", "opened")
+
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.opened = 0
+
+
+class FetchTierMemo:
+    """Remembers the working tier per symbol and trips breakers on tiers that keep failing"""
+
+    def __init__(self, tiers: Sequence[str], failure_threshold: int = 3,
+                 open_seconds: float = 60.0, max_open_seconds: float = 300.0):
+        self.tiers = tuple(tiers)
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        # symbol -> tier that answered last time
+        self._preferred: Dict[str, str] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._stats = {tier: _TierStats() for tier in self.tiers}
+        # Symbols are fetched on several threads at once
+        self._lock = threading.Lock()
+
+    def order(self, symbol: str, now: Optional[float] = None) -> List[str]:
+        """Tiers to try for `symbol` this poll, cheapest first; open breakers are left out
+
+        Tiers cheaper than the one that last answered only appear as half-open probes.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            preferred = self._preferred.get(symbol)
+            rank = self.tiers.index(preferred) if preferred in self.tiers else 0
+            order = []
+            for i, tier in enumerate(self.tiers):
+                breaker = self._breakers.get((symbol, tier))
+                if breaker is not None and not breaker.allows(now):
+                    continue
+                if i < rank and (breaker is None or breaker.state != HALF_OPEN):
+                    continue
+                order.append(tier)
+            return order
+
+    def record(self, symbol: str, tier: str, ok: bool, seconds: float, now: Optional[float] = None) -> bool:
+        """Account one attempt; returns True when it tripped the tier's (closed) breaker for `symbol`"""
+        now = time.monotonic() if now is None else now
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            stats = self._stats[tier]
+            stats.attempts += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            breaker = self._breakers.get((symbol, tier))
+            if ok:
+                stats.successes += 1
+                self._preferred[symbol] = tier
+                if breaker is not None:
+                    breaker.success()
+                # Cheaper tiers that just failed are skipped from now on (until their probe)
+                for cheaper in self.tiers[:self.tiers.index(tier)]:
+                    skipped = self._breakers.get((symbol, cheaper))
+                    if skipped is not None and skipped.state == CLOSED and skipped.failures:
+                        skipped.failure(now, 1, self.open_seconds, self.max_open_seconds)
+                        self._stats[cheaper].opened += 1
+                return False
+            if breaker is None:
+                breaker = self._breakers[(symbol, tier)] = CircuitBreaker()
+            was_closed = breaker.state == CLOSED
+            if not breaker.failure(now, self.failure_threshold, self.open_seconds, self.max_open_seconds):
+                return False
+            stats.opened += 1
+            if self._preferred.get(symbol) == tier:
+                del self._preferred[symbol]
+            return was_closed
+
+    def preferred(self, symbol: str) -> Optional[str]:
+        return self._preferred.get(symbol)
+
+    def forget(self, symbol: str):
+        """Drop what is known about a symbol that is no longer fetched"""
+        with self._lock:
+            self._preferred.pop(symbol, None)
+            for tier in self.tiers:
+                self._breakers.pop((symbol, tier), None)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per tier: attempts, success rate, mean/max latency, breakers opened and currently open"""
+        with self._lock:
+            open_now: Dict[str, int] = {tier: 0 for tier in self.tiers}
+            for (_, tier), breaker in self._breakers.items():
+                if breaker.state != CLOSED:
+                    open_now[tier] += 1
+            return {
+                tier: {
+                    "attempts": stats.attempts,
+                    "success_rate": round(stats.successes / stats.attempts, 3) if stats.attempts else 0.0,
+                    "avg_ms": round(stats.total_ms / stats.attempts, 1) if stats.attempts else 0.0,
+                    "max_ms": round(stats.max_ms, 1),
+                    "breakers_opened": stats.opened,
+                    "breakers_open": open_now[tier],
+                    "preferred_by": sum(1 for preferred in self._preferred.values() if preferred == tier),
+                }
+                for tier, stats in self._stats.items()
+            }
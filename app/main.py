@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import json
 import os
+from datetime import datetime
 from typing import Set
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Body
@@ -11,6 +12,10 @@ from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from .api import router
+from .market_data import market_data
+from .prices import to_paise
+from .rule_changes import ensure_change_table
+from .symbol_universe import WatchRegistry
 
 app = FastAPI(title="QuantAlert API", version="1.0.0")
 
@@ -53,6 +58,8 @@ async def health_check():
 
 # WebSocket Management
 websocket_connections: Set[WebSocket] = set()
+# Symbols each client shows; the worker polls them (see /_internal/watched)
+websocket_watches = WatchRegistry()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -67,6 +74,14 @@ async def websocket_endpoint(websocket: WebSocket):
                 message = await websocket.receive_text()
                 if message == "ping":
                     await websocket.send_text("pong")
+                    continue
+                # {"type": "watch", "symbols": [...]} replaces what this client watches
+                request = json.loads(message)
+                if isinstance(request, dict) and request.get("type") == "watch":
+                    symbols = request.get("symbols")
+                    websocket_watches.watch(websocket, symbols if isinstance(symbols, list) else [])
+            except ValueError:
+                continue
             except Exception:
                 break
     except WebSocketDisconnect:
@@ -75,6 +90,7 @@ async def websocket_endpoint(websocket: WebSocket):
         print(f"📡 WebSocket error: {e}")
     finally:
         websocket_connections.discard(websocket)
+        websocket_watches.forget(websocket)
         print(f"📡 WebSocket removed. Total: {len(websocket_connections)}")
 
 async def broadcast_to_websockets(message: dict):
@@ -104,10 +120,25 @@ app.state.broadcast = broadcast_to_websockets
 # ⭐ THIS IS THE MISSING ENDPOINT THAT FIXES THE 404 ERROR ⭐
 @app.post("/_internal/broadcast")
 async def internal_broadcast(payload: dict = Body(...)):
-    """Internal endpoint for worker to broadcast price updates to WebSocket clients"""
+    """Internal endpoint for worker to broadcast price updates to WebSocket clients
+
+    A "price_batch" (one poll cycle) reaches clients as its individual price_update messages.
+    """
     try:
-        await broadcast_to_websockets(payload)
-        print(f"📡 Broadcasted {payload.get('symbol', 'data')} to {len(websocket_connections)} clients")
+        messages = payload.get("updates", []) if payload.get("type") == "price_batch" else [payload]
+        for message in messages:
+            if message.get("type") == "price_update" and "price" in message:
+                # Keeps /price and /prices current in this process without querying ticks
+                market_data.record_quote(
+                    message["symbol"],
+                    to_paise(float(message["price"])),
+                    int(message.get("volume") or 0),
+                    datetime.fromisoformat(message["timestamp"]) if message.get("timestamp") else datetime.now(),
+                    message.get("exchange", "NSE"),
+                )
+            await broadcast_to_websockets(message)
+        what = payload.get("symbol") or (f"{len(messages)} quotes" if payload.get("type") == "price_batch" else "data")
+        print(f"📡 Broadcasted {what} to {len(websocket_connections)} clients")
         return {
             "ok": True, 
             "clients_notified": len(websocket_connections),
@@ -117,6 +148,11 @@ async def internal_broadcast(payload: dict = Body(...)):
         print(f"❌ Broadcast error: {e}")
         return {"ok": False, "error": str(e)}
 
+@app.get("/_internal/watched")
+async def internal_watched():
+    """Symbols watched by connected UI clients (polled by the worker)"""
+    return {"symbols": websocket_watches.symbols()}
+
 @app.get("/_internal/status")
 async def internal_status():
     """Internal status endpoint for monitoring"""
@@ -130,6 +166,7 @@ async def internal_status():
 async def startup_event():
     """Application startup"""
     print("🚀 QuantAlert API starting up...")
+    ensure_change_table()
     print("📡 WebSocket endpoint: /ws")
     print("📊 API docs: /docs") 
     print("🔧 Health check: /health")
@@ -0,0 +1,93 @@
+# app/market_calendar.py
+"""
+NSE trading session calendar.
+
+The cash market trades 09:15-15:30 IST on weekdays that are not exchange
+holidays. The built-in holiday list only holds dates known when it was last
+updated; `nse_holidays_file` (one YYYY-MM-DD per line, `#` comments) adds
+the rest from NSE's yearly holiday circular without a code change. IST has
+no daylight saving, so a fixed UTC offset is exact.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import FrozenSet, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+SESSION_OPEN = time(9, 15)
+SESSION_CLOSE = time(15, 30)
+
+NSE_HOLIDAYS: FrozenSet[date] = frozenset(date.fromisoformat(day) for day in (
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18",
+    "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22",
+    "2025-11-05", "2025-12-25",
+    # 2026 (fixed-date holidays and Good Friday; add the rest via nse_holidays_file)
+    "2026-01-26", "2026-04-03", "2026-04-14", "2026-05-01", "2026-10-02", "2026-12-25",
+))
+
+
+def read_holidays(path: str) -> FrozenSet[date]:
+    """Dates listed in `path`, one YYYY-MM-DD per line"""
+    days = set()
+    with open(path) as handle:
+        for line in handle:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                days.add(date.fromisoformat(line))
+    return frozenset(days)
+
+
+class MarketCalendar:
+    """Answers whether the exchange is in session, and when it next opens"""
+
+    def __init__(self, holidays: Iterable[date] = NSE_HOLIDAYS,
+                 open_time: time = SESSION_OPEN, close_time: time = SESSION_CLOSE, tz: timezone = IST):
+        self.holidays = frozenset(holidays)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.tz = tz
+
+    @classmethod
+    def nse(cls, holidays_file: Optional[str] = None) -> "MarketCalendar":
+        holidays = set(NSE_HOLIDAYS)
+        if holidays_file:
+            try:
+                holidays |= read_holidays(holidays_file)
+            except (OSError, ValueError) as e:
+                logger.error("Could not read holiday file %s: %s", holidays_file, e)
+        return cls(holidays)
+
+    def _local(self, now: Optional[datetime]) -> datetime:
+        if now is None:
+            return datetime.now(self.tz)
+        if now.tzinfo is None:
+            # Naive datetimes are this host's local time
+            now = now.astimezone()
+        return now.astimezone(self.tz)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        local = self._local(now)
+        return self.is_trading_day(local.date()) and self.open_time <= local.time() < self.close_time
+
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the current session if in session, else of the next one (aware, IST)"""
+        local = self._local(now)
+        day = local.date()
+        if local.time() >= self.close_time:
+            day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return datetime.combine(day, self.open_time, tzinfo=self.tz)
+
+    def seconds_until_open(self, now: Optional[datetime] = None) -> float:
+        """0 while in session"""
+        if self.is_open(now):
+            return 0.0
+        return max(0.0, (self.next_open(now) - self._local(now)).total_seconds())
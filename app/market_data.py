@@ -1,116 +1,508 @@
+import atexit
 import duckdb
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
-from decimal import Decimal
+from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import replace
+import threading
+from .bars import OHLCV_TABLES, ROLLUP_TIMEFRAMES, Bar, bar_start
+from .config import Settings, settings
 from .database import get_duckdb_connection
-from .schemas import PriceData, OHLCVData
+from .duckdb_access import DuckDBAccess
+from .prices import Paise, from_paise
+from .quote_table import QuoteTable, SharedQuoteReader
+from .schemas import PriceData, OHLCVData, SymbolDetails
+from .symbol_registry import UPSERT_SQL as SYMBOLS_UPSERT_SQL, SymbolRegistry
+from .tick_archive import TickArchive
+from .tick_filter import ChangeOnlyFilter
+from .tick_writer import TickWriter
+
+# symbol -> (price paise, volume, timestamp, exchange) of the last tick seen
+Quote = Tuple[Paise, int, datetime, str]
 
 
 class MarketDataManager:
-    def __init__(self):
-        self.conn = get_duckdb_connection()
+    def __init__(self, config: Settings = settings):
+        # Reads on per-thread cursors, writes on one writer thread
+        self.db = DuckDBAccess(get_duckdb_connection(config.duckdb_path))
+        self.tick_writer = TickWriter(self.db, config.tick_flush_rows, config.tick_flush_seconds)
+        # symbol -> (open 1-minute bar, exchange)
+        self._open_bars: Dict[str, Tuple[Bar, str]] = {}
+        # (symbol, timeframe) -> (open rollup bar, exchange); fed by closed 1-minute bars
+        self._open_rollups: Dict[Tuple[str, int], Tuple[Bar, str]] = {}
+        self._bars_lock = threading.Lock()
+        # Partial bars a previous process persisted are taken over once, in bulk (resume_bars)
+        self._bars_resumed = False
+        self._resume_lock = threading.Lock()
+        # Bars whose minute elapsed without a further tick are closed at the next flush
+        self.tick_writer.before_flush.append(self._close_elapsed_bars)
+        self.tick_archive = TickArchive(
+            self.db, config.tick_archive_path, config.tick_hot_days, config.tick_archive_compact_files
+        )
+        # Last quote per symbol, so /price never has to scan ticks
+        self._quotes: Dict[str, Quote] = {}
+        # Repeats of a symbol's previous tick are not stored, except as the end of their run
+        self.tick_filter = ChangeOnlyFilter(config.tick_change_only)
+        self.symbol_registry = SymbolRegistry(self.db)
+        self.tick_writer.after_load.append(self._update_symbol_table)
+        backfill = ["ticks"]
+        if self.tick_archive.has_files():
+            backfill.append(self.tick_archive.scan_sql())
+        self.symbol_registry.load(backfill)
+        # Worker: memory-mapped table it publishes quotes to; API processes read it instead
+        self.quote_publisher: Optional[QuoteTable] = None
+        self.shared_quotes = SharedQuoteReader(config.quote_table_path,
+                                               stale_seconds=config.quote_table_stale_seconds)
+        self._closed = False
+        # Open bars and held run ends exist only in memory until close()
+        atexit.register(self.close)
+    
+    def publish_quotes(self, path: str, capacity: int):
+        """Make this process the writer of a shared quote table (worker startup)"""
+        self.quote_publisher = QuoteTable.create(path, capacity)
+        for symbol, quote in list(self._quotes.items()):
+            self.quote_publisher.publish(symbol, *quote)
     
-    def store_tick(self, symbol: str, price: Decimal, volume: int, exchange: str = "NSE"):
-        """Store a tick data point"""
+    def store_tick(self, symbol: str, price: Paise, volume: int, exchange: str = "NSE"):
+        """Buffer a tick (price in integer paise); the tick writer bulk-loads it shortly after
+
+        The last-quote cache always takes the tick; storage only does when it
+        differs from the symbol's previous tick (see ChangeOnlyFilter).
+        """
         timestamp = datetime.now()
-        
-        self.conn.execute("""
-            INSERT INTO ticks (symbol, price, volume, timestamp, exchange)
-            VALUES (?, ?, ?, ?, ?)
-        """, [symbol, float(price), volume, timestamp, exchange])
+        quote = (price, volume, timestamp, exchange)
+        self._quotes[symbol] = quote
+        if self.quote_publisher is not None:
+            self.quote_publisher.publish(symbol, price, volume, timestamp, exchange)
+        for stored in self.tick_filter.offer(symbol, quote):
+            self._append_tick(symbol, stored)
+    
+    def _append_tick(self, symbol: str, quote: Quote):
+        price, volume, timestamp, exchange = quote
+        self.symbol_registry.record(symbol, price, timestamp, exchange)
+        self.tick_writer.append(symbol, price, volume, timestamp, exchange)
+    
+    def record_quote(self, symbol: str, price: Paise, volume: int, timestamp: datetime, exchange: str = "NSE"):
+        """Update the last-quote cache without storing a tick (API process, fed by the worker broadcast)"""
+        current = self._quotes.get(symbol)
+        if current is None or current[2] <= timestamp:
+            self._quotes[symbol] = (price, volume, timestamp, exchange)
+    
+    @staticmethod
+    def _update_symbol_table(cursor, table: str, view: str):
+        if table == "ticks":
+            cursor.execute(SYMBOLS_UPSERT_SQL.format(view=view))
+    
+    def flush_ticks(self) -> int:
+        """Write buffered ticks now (tests, shutdown)"""
+        return self.tick_writer.flush()
     
     def get_latest_price(self, symbol: str) -> Optional[PriceData]:
-        """Get the latest price for a symbol"""
-        result = self.conn.execute("""
-            SELECT symbol, price, volume, timestamp, exchange
+        """Get the latest price for a symbol from the last-quote cache
+
+        API processes also read the worker's shared quote table and keep
+        whichever quote is newer. Only a symbol found in neither falls back
+        to DuckDB, and the answer is cached, so the cost does not grow with
+        tick history.
+        """
+        quote = self._quotes.get(symbol)
+        if self.quote_publisher is None:
+            shared = self.shared_quotes.get(symbol)
+            if shared is not None and (quote is None or shared[2] >= quote[2]):
+                quote = shared
+        if quote is None:
+            quote = self._load_quote(symbol)
+            if quote is None:
+                return None
+        return self._price_data(symbol, quote)
+    
+    def get_latest_prices(self, symbols: List[str]) -> List[PriceData]:
+        """Latest quotes for many symbols in one call; unknown symbols are left out"""
+        prices = []
+        for symbol in dict.fromkeys(symbols):
+            price_data = self.get_latest_price(symbol)
+            if price_data is not None:
+                prices.append(price_data)
+        return prices
+    
+    def _load_quote(self, symbol: str) -> Optional[Quote]:
+        """Last stored tick: hot table first, else the newest archived day of the symbol"""
+        result = self.db.fetchone("""
+            SELECT CAST(price * 100 AS BIGINT), volume, timestamp, exchange
             FROM ticks
             WHERE symbol = ?
             ORDER BY timestamp DESC
             LIMIT 1
-        """, [symbol]).fetchone()
-        
-        if result:
-            return PriceData(
-                symbol=result[0],
-                price=Decimal(str(result[1])),
-                volume=result[2],
-                timestamp=result[3],
-                exchange=result[4]
-            )
-        return None
+        """, [symbol])
+        if result is None:
+            archived_day = self.tick_archive.latest_date(symbol)
+            if archived_day is None:
+                return None
+            result = self.db.fetchone(f"""
+                SELECT CAST(price * 100 AS BIGINT), volume, timestamp, exchange
+                FROM {self.tick_archive.scan_sql("symbol = ? AND date = ?")}
+                ORDER BY timestamp DESC
+                LIMIT 1
+            """, [symbol, archived_day])
+            if result is None:
+                return None
+        quote = (result[0], result[1], result[2], result[3])
+        # A tick may have arrived while the query ran; keep the newer one
+        return self._quotes.setdefault(symbol, quote)
+    
+    def get_ticks(self, symbol: str, start_time: datetime, end_time: datetime,
+                  limit: int = 1000) -> List[PriceData]:
+        """Ticks in [start, end], newest first, across the hot table, the write buffer and the archive
+
+        Repeated ticks were stored as runs, so a run shows up as its first
+        tick and its latest repeat.
+
+        The archive part filters on its date/symbol partitions, so only the
+        files of the requested days are read.
+        """
+        # Unflushed rows are taken before the queries: a batch committing in
+        # between is then seen twice (and deduplicated below), never not at all
+        held = self.tick_filter.held(symbol)
+        pending = self.tick_writer.pending("ticks", symbol)
+        rows = self.db.fetchall("""
+            SELECT CAST(price * 100 AS BIGINT), volume, timestamp, exchange
+            FROM ticks
+            WHERE symbol = ? AND timestamp BETWEEN ? AND ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        """, [symbol, start_time, end_time, limit])
+        if start_time < self.tick_archive.cutoff() and self.tick_archive.has_files():
+            rows += self.db.fetchall(f"""
+                SELECT CAST(price * 100 AS BIGINT), volume, timestamp, exchange
+                FROM {self.tick_archive.scan_sql("symbol = ? AND date BETWEEN ? AND ?")}
+                WHERE timestamp BETWEEN ? AND ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, [symbol, start_time.date(), end_time.date(), start_time, end_time, limit])
+        rows += [
+            (row["price"], row["volume"], row["timestamp"], row["exchange"])
+            for row in pending
+            if start_time <= row["timestamp"] <= end_time
+        ]
+        if held is not None and start_time <= held[2] <= end_time:
+            rows.append(held)
+        # A tick is identified by its values and time; copies come from a concurrent flush or archive run
+        rows = list(dict.fromkeys(tuple(row) for row in rows))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return [self._price_data(symbol, row) for row in rows[:limit]]
+    
+    @staticmethod
+    def _price_data(symbol: str, quote: Quote) -> PriceData:
+        price, volume, timestamp, exchange = quote
+        return PriceData(
+            symbol=symbol,
+            price=from_paise(price),
+            volume=volume,
+            timestamp=timestamp,
+            exchange=exchange
+        )
+    
+    def get_latest_price_paise(self, symbol: str) -> Optional[Paise]:
+        """Latest tick price as integer paise (worker side, no Decimal round-trip)"""
+        quote = self._quotes.get(symbol) or self._load_quote(symbol)
+        return quote[0] if quote is not None else None
     
     def get_ohlcv_1min(self, symbol: str, minutes: int = 60) -> List[OHLCVData]:
-        """Get 1-minute OHLCV data for the last N minutes"""
+        """Get 1-minute OHLCV data for the last N minutes (persisted + not yet flushed + open bar)"""
+        return self.get_ohlcv(symbol, 1, minutes)
+    
+    def get_ohlcv(self, symbol: str, timeframe_minutes: int = 1, minutes: int = 60) -> List[OHLCVData]:
+        """Get OHLCV bars of a stored timeframe (see OHLCV_TABLES) covering the last N minutes
+
+        Closed bars come from that timeframe's own table (plus the write
+        buffer); only the bar still in progress is derived from minute bars.
+        """
         end_time = datetime.now()
         start_time = end_time - timedelta(minutes=minutes)
-        
-        result = self.conn.execute("""
-            SELECT symbol, open_price, high_price, low_price, close_price, volume, timestamp, exchange
-            FROM ohlcv_1min
-            WHERE symbol = ? AND timestamp BETWEEN ? AND ?
-            ORDER BY timestamp DESC
-        """, [symbol, start_time, end_time]).fetchall()
+        bars = self._persisted_bars(OHLCV_TABLES[timeframe_minutes], symbol, start_time, end_time)
+        bars.update(self._recent_bars(symbol, timeframe_minutes, start_time, end_time))
         
         return [
             OHLCVData(
-                symbol=row[0],
-                open_price=Decimal(str(row[1])),
-                high_price=Decimal(str(row[2])),
-                low_price=Decimal(str(row[3])),
-                close_price=Decimal(str(row[4])),
-                volume=row[5],
-                timestamp=row[6],
-                exchange=row[7]
+                symbol=symbol,
+                open_price=from_paise(bar.open_price),
+                high_price=from_paise(bar.high_price),
+                low_price=from_paise(bar.low_price),
+                close_price=from_paise(bar.close_price),
+                volume=bar.volume,
+                timestamp=ts,
+                exchange=exchange,
+                timeframe_minutes=timeframe_minutes
             )
-            for row in result
+            for ts, (bar, exchange) in sorted(bars.items(), reverse=True)
         ]
     
-    def update_ohlcv_1min(self, symbol: str, current_price: Decimal, volume: int, exchange: str = "NSE"):
-        """Update 1-minute OHLCV data with new tick"""
-        current_time = datetime.now()
-        minute_start = current_time.replace(second=0, microsecond=0)
+    def get_ohlcv_columns(self, symbol: str, timeframe_minutes: int = 1,
+                          minutes: int = 60) -> Dict[str, np.ndarray]:
+        """Same bars as get_ohlcv as parallel NumPy arrays, newest first
+
+        Persisted bars are fetched straight into arrays with `fetchnumpy()`;
+        only the handful of bars still in memory are appended row by row.
+        Prices stay integer paise (int64).
+        """
+        end_time = datetime.now()
+        start_time = end_time - timedelta(minutes=minutes)
+        columns = self.db.cursor().execute(f"""
+            SELECT timestamp, CAST(open_price * 100 AS BIGINT) AS open_price,
+                   CAST(high_price * 100 AS BIGINT) AS high_price, CAST(low_price * 100 AS BIGINT) AS low_price,
+                   CAST(close_price * 100 AS BIGINT) AS close_price, volume, exchange
+            FROM {OHLCV_TABLES[timeframe_minutes]}
+            WHERE symbol = ? AND timestamp BETWEEN ? AND ?
+        """, [symbol, start_time, end_time]).fetchnumpy()
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        columns["timestamp"] = columns["timestamp"].astype("datetime64[us]")
+        for name in ("open_price", "high_price", "low_price", "close_price", "volume"):
+            columns[name] = columns[name].astype(np.int64)
+        columns["exchange"] = columns["exchange"].astype(object)
+        
+        recent = self._recent_bars(symbol, timeframe_minutes, start_time, end_time)
+        if recent:
+            stamps = np.array(sorted(recent), dtype="datetime64[us]")
+            # In-memory bars replace persisted rows of the same period
+            keep = ~np.isin(columns["timestamp"], stamps)
+            bars = [recent[ts] for ts in sorted(recent)]
+            extra = {
+                "timestamp": stamps,
+                "exchange": np.array([exchange for _, exchange in bars], dtype=object),
+                **{
+                    name: np.fromiter((getattr(bar, name) for bar, _ in bars), np.int64, len(bars))
+                    for name in ("open_price", "high_price", "low_price", "close_price", "volume")
+                },
+            }
+            columns = {name: np.concatenate((values[keep], extra[name])) for name, values in columns.items()}
+        
+        order = np.argsort(columns["timestamp"], kind="stable")[::-1]
+        return {name: values[order] for name, values in columns.items()}
+    
+    def _persisted_bars(self, table: str, symbol: str, start_time: datetime,
+                        end_time: datetime) -> Dict[datetime, Tuple[Bar, str]]:
+        """Bars of `table` in [start, end] already written to DuckDB"""
+        result = self.db.fetchall(f"""
+            SELECT CAST(open_price * 100 AS BIGINT), CAST(high_price * 100 AS BIGINT),
+                   CAST(low_price * 100 AS BIGINT), CAST(close_price * 100 AS BIGINT),
+                   volume, timestamp, exchange
+            FROM {table}
+            WHERE symbol = ? AND timestamp BETWEEN ? AND ?
+        """, [symbol, start_time, end_time])
+        return {
+            row[5]: (Bar(row[5], row[0], row[1], row[2], row[3], row[4] or 0), row[6])
+            for row in result
+        }
+    
+    def _recent_bars(self, symbol: str, timeframe_minutes: int, start_time: datetime,
+                     end_time: datetime) -> Dict[datetime, Tuple[Bar, str]]:
+        """Bars in [start, end] not (finally) in DuckDB yet: the write buffer and the bar in progress
+
+        These override persisted rows with the same timestamp.
+        """
+        bars = {}
+        for row in self.tick_writer.pending(OHLCV_TABLES[timeframe_minutes], symbol):
+            if start_time <= row["timestamp"] <= end_time:
+                bars[row["timestamp"]] = (
+                    Bar(row["timestamp"], row["open_price"], row["high_price"], row["low_price"],
+                        row["close_price"], row["volume"]),
+                    row["exchange"],
+                )
+        if timeframe_minutes == 1:
+            with self._bars_lock:
+                open_bar = self._open_bars.get(symbol)
+                if open_bar is not None and start_time <= open_bar[0].start <= end_time:
+                    bars[open_bar[0].start] = (replace(open_bar[0]), open_bar[1])
+            return bars
         
-        # Check if we have data for this minute
-        existing = self.conn.execute("""
-            SELECT open_price, high_price, low_price, close_price, volume
-            FROM ohlcv_1min
-            WHERE symbol = ? AND timestamp = ?
-        """, [symbol, minute_start]).fetchone()
+        # Rollups: the current period is completed with the open minute bar
+        period_start = bar_start(end_time, timeframe_minutes)
+        live = None
+        with self._bars_lock:
+            rollup = self._open_rollups.get((symbol, timeframe_minutes))
+            if rollup is not None:
+                bar, exchange = replace(rollup[0]), rollup[1]
+                if bar.start == period_start:
+                    open_bar = self._open_bars.get(symbol)
+                    if open_bar is not None and open_bar[0].start >= period_start:
+                        bar.absorb(open_bar[0])
+                    live = (bar, exchange)
+                elif start_time <= bar.start:
+                    # Period over but not closed yet (closed at the next flush)
+                    bars[bar.start] = (bar, exchange)
+        if live is None:
+            # Nothing folded in this process yet (e.g. the API process): derive from minute bars
+            minutes = self._persisted_bars("ohlcv_1min", symbol, period_start, end_time)
+            minutes.update(self._recent_bars(symbol, 1, period_start, end_time))
+            for ts in sorted(minutes):
+                bar, exchange = minutes[ts]
+                if live is None:
+                    live = (Bar(period_start, bar.open_price, bar.high_price, bar.low_price,
+                                bar.close_price, bar.volume), exchange)
+                else:
+                    live[0].absorb(bar)
+        if live is not None and start_time <= period_start:
+            bars[period_start] = live
+        return bars
+    
+    def update_ohlcv_1min(self, symbol: str, current_price: Paise, volume: int, exchange: str = "NSE"):
+        """Fold a tick into the symbol's open 1-minute bar (price in integer paise)
+
+        The bar lives in memory and is updated in O(1); DuckDB only sees it
+        once the minute closes, appended in batches by the tick writer.
+        """
+        if not self._bars_resumed:
+            self.resume_bars()
+        minute_start = datetime.now().replace(second=0, microsecond=0)
         
-        if existing:
-            # Update existing minute data
-            open_price = existing[0]
-            high_price = max(existing[1], float(current_price))
-            low_price = min(existing[2], float(current_price))
-            close_price = float(current_price)
-            total_volume = existing[4] + volume
+        with self._bars_lock:
+            entry = self._open_bars.get(symbol)
+            if entry is None or entry[0].start < minute_start:
+                if entry is not None:
+                    self._close_minute(symbol, *entry)
+                bar = Bar(minute_start, current_price, current_price, current_price, current_price, 0)
+                entry = self._open_bars[symbol] = (bar, exchange)
             
-            self.conn.execute("""
-                UPDATE ohlcv_1min
-                SET high_price = ?, low_price = ?, close_price = ?, volume = ?
-                WHERE symbol = ? AND timestamp = ?
-            """, [high_price, low_price, close_price, total_volume, symbol, minute_start])
-        else:
-            # Create new minute data
-            self.conn.execute("""
-                INSERT INTO ohlcv_1min (symbol, open_price, high_price, low_price, close_price, volume, timestamp, exchange)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, [symbol, float(current_price), float(current_price), float(current_price), float(current_price), volume, minute_start, exchange])
+            bar = entry[0]
+            if current_price > bar.high_price:
+                bar.high_price = current_price
+            elif current_price < bar.low_price:
+                bar.low_price = current_price
+            bar.close_price = current_price
+            bar.volume += volume
     
-    def get_all_symbols(self) -> List[str]:
-        """Get all unique symbols in the database"""
-        result = self.conn.execute("""
-            SELECT DISTINCT symbol FROM ticks
-            UNION
-            SELECT DISTINCT symbol FROM ohlcv_1min
-        """).fetchall()
+    def resume_bars(self):
+        """Take over the partial bars a previous process persisted at shutdown
+
+        The open minute and the open period of every rollup timeframe are
+        read back and deleted in one write job, for all symbols at once, and
+        then continue in memory; they are re-appended when their period
+        closes. Runs once per process: the worker calls it at startup, off the
+        event loop, otherwise the first tick does.
+        """
+        with self._resume_lock:
+            if self._bars_resumed:
+                return
+            minute_start = datetime.now().replace(second=0, microsecond=0)
+            minutes, rollups = self.db.write(lambda cursor: self._take_open_bars(cursor, minute_start))
+            with self._bars_lock:
+                self._open_bars.update(minutes)
+                self._open_rollups.update(rollups)
+            self._bars_resumed = True
+    
+    @staticmethod
+    def _take_open_bars(cursor, minute_start: datetime):
+        """Persisted bars of the periods open at `minute_start`, deleted from their tables
+
+        Rollups are rebuilt from the minute bars before `minute_start`; the
+        minute bar itself is folded in when it closes.
+        """
+        minutes = {}
+        rows = cursor.execute("""
+            SELECT symbol, CAST(open_price * 100 AS BIGINT), CAST(high_price * 100 AS BIGINT),
+                   CAST(low_price * 100 AS BIGINT), CAST(close_price * 100 AS BIGINT), volume, exchange
+            FROM ohlcv_1min
+            WHERE timestamp = ?
+        """, [minute_start]).fetchall()
+        for symbol, open_price, high, low, close, volume, exchange in rows:
+            minutes[symbol] = (Bar(minute_start, open_price, high, low, close, int(volume or 0)), exchange)
+        if rows:
+            cursor.execute("DELETE FROM ohlcv_1min WHERE timestamp = ?", [minute_start])
         
-        return [row[0] for row in result]
+        rollups = {}
+        for timeframe in ROLLUP_TIMEFRAMES:
+            start = bar_start(minute_start, timeframe)
+            cursor.execute(f"DELETE FROM {OHLCV_TABLES[timeframe]} WHERE timestamp = ?", [start])
+            if start == minute_start:
+                continue
+            rows = cursor.execute("""
+                SELECT symbol, CAST(arg_min(open_price, timestamp) * 100 AS BIGINT),
+                       CAST(max(high_price) * 100 AS BIGINT), CAST(min(low_price) * 100 AS BIGINT),
+                       CAST(arg_max(close_price, timestamp) * 100 AS BIGINT), sum(volume),
+                       arg_max(exchange, timestamp)
+                FROM ohlcv_1min
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY symbol
+            """, [start, minute_start]).fetchall()
+            for symbol, open_price, high, low, close, volume, exchange in rows:
+                rollups[(symbol, timeframe)] = (Bar(start, open_price, high, low, close, int(volume or 0)), exchange)
+        return minutes, rollups
+    
+    def _close_minute(self, symbol: str, bar: Bar, exchange: str):
+        """Queue a closed 1-minute bar and fold it into every rollup timeframe (caller holds _bars_lock)"""
+        self.tick_writer.append_bar(symbol, bar, exchange)
+        for timeframe in ROLLUP_TIMEFRAMES:
+            key = (symbol, timeframe)
+            start = bar_start(bar.start, timeframe)
+            entry = self._open_rollups.get(key)
+            if entry is not None and entry[0].start < start:
+                self.tick_writer.append_bar(symbol, entry[0], entry[1], OHLCV_TABLES[timeframe])
+                entry = None
+            if entry is not None:
+                entry[0].absorb(bar)
+                continue
+            rollup = Bar(start, bar.open_price, bar.high_price, bar.low_price, bar.close_price, 0)
+            rollup.absorb(bar)
+            self._open_rollups[key] = (rollup, exchange)
+    
+    def close_bars(self, before: Optional[datetime] = None):
+        """Queue bars whose period ended by `before` for writing (all open bars when None)
+
+        1-minute bars are folded into their rollups as they close; a rollup
+        is written once its whole period has elapsed.
+        """
+        with self._bars_lock:
+            for symbol, (bar, exchange) in list(self._open_bars.items()):
+                if before is None or bar.start < before:
+                    self._close_minute(symbol, bar, exchange)
+                    del self._open_bars[symbol]
+            for (symbol, timeframe), (bar, exchange) in list(self._open_rollups.items()):
+                if before is None or bar.start + timedelta(minutes=timeframe) <= before:
+                    self.tick_writer.append_bar(symbol, bar, exchange, OHLCV_TABLES[timeframe])
+                    del self._open_rollups[(symbol, timeframe)]
+    
+    def _close_elapsed_bars(self):
+        self.close_bars(datetime.now().replace(second=0, microsecond=0))
+    
+    def get_all_symbols(self) -> List[str]:
+        """Get all known symbols from the symbol registry (and the worker's shared quote table)"""
+        return sorted(set(self.symbol_registry.symbols()) | set(self.shared_quotes.symbols()))
+    
+    def get_symbol_details(self) -> List[SymbolDetails]:
+        """Registry metadata (exchange, first/last stored tick, stored tick count, last price) per symbol"""
+        return [
+            SymbolDetails(
+                symbol=info.symbol,
+                exchange=info.exchange,
+                first_seen=info.first_seen,
+                last_seen=info.last_seen,
+                stored_ticks=info.stored_ticks,
+                last_price=from_paise(info.last_price)
+            )
+            for info in self.symbol_registry.infos()
+        ]
+    
+    def archive_ticks(self) -> Dict[str, int]:
+        """Move closed days of ticks to the Parquet archive and compact it"""
+        return self.tick_archive.run()
     
     def close(self):
-        """Close the database connection"""
-        self.conn.close()
+        """Persist open bars and held run ends, flush buffered rows and close the database connection
+
+        Safe to call more than once (worker stop() and atexit both do).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.close_bars()
+        for symbol, quote in self.tick_filter.drain():
+            self._append_tick(symbol, quote)
+        self.tick_writer.close()
+        self.db.close()
+        if self.quote_publisher is not None:
+            self.quote_publisher.remove()
+            self.quote_publisher = None
 
 
 # Global instance
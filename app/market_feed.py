@@ -2,10 +2,41 @@
 import asyncio
 import inspect
 from .config import settings
+from .feed_providers import FeedRouter, build_providers, register_provider
 from .yahoo_feed import yahoo_feed
 
-async def start_market_feeds(price_callback):
-    """Start market data feeds - Yahoo Finance ONLY (no simple_feed)"""
+
+def _angel():
+    from .angel_feed import angel_feed
+    return angel_feed
+
+
+def _alpha_vantage():
+    from .alpha_vantage_feed import alpha_vantage_feed
+    return alpha_vantage_feed
+
+
+# Registration order is the "auto" priority order
+register_provider("yahoo", lambda: yahoo_feed)
+register_provider("angel", _angel, lambda: bool(settings.angel_api_key and settings.angel_client_id
+                                                 and settings.angel_password))
+register_provider("alpha_vantage", _alpha_vantage, lambda: bool(settings.alpha_vantage_api_key))
+
+
+async def start_market_feeds(price_callback, batch_callback=None, symbol_filter=None, threshold_distance=None):
+    """Start market data feeds
+
+    The Yahoo feed's poll loop (scheduling, market hours, callbacks) always
+    runs. When `settings.feed_provider` selects anything but Yahoo alone, its
+    fetches go through a FeedRouter over every selected provider instead.
+
+    When `batch_callback` is given, each poll cycle is delivered once as a
+    list of (symbol, price, volume, exchange) instead of per-symbol calls.
+    Prices are integer paise (see app.prices).
+    `symbol_filter(symbol) -> bool` restricts polling to this worker's shard.
+    `threshold_distance(symbol, price) -> paise or None` tells the poll
+    scheduler how close a symbol is to firing an alert.
+    """
     
     # Ensure callback works with both sync/async
     async def safe_callback(*args):
@@ -15,14 +46,40 @@ async def start_market_feeds(price_callback):
             loop = asyncio.get_running_loop()
             await loop.run_in_executor(None, price_callback, *args)
     
-    provider = getattr(settings, 'feed_provider', 'yahoo')
-    print(f"🔥 Starting market feed provider: {provider}")
+    providers = build_providers(settings.feed_provider)
+    if not providers:
+        print(f"⚠️ No usable feed provider in {settings.feed_provider!r}; falling back to Yahoo Finance")
+        providers = [yahoo_feed]
+    print(f"🔥 Starting market feed providers: {', '.join(p.name for p in providers)}")
     
-    # ONLY Yahoo Finance - no mock feeds
     try:
         yahoo_feed.set_price_callback(safe_callback)
-        await yahoo_feed.start_feed(poll_seconds=8)
-        print("✅ Yahoo Finance feed started successfully")
+        if batch_callback is not None:
+            yahoo_feed.set_batch_callback(batch_callback)
+        if symbol_filter is not None:
+            yahoo_feed.set_symbol_filter(symbol_filter)
+        if threshold_distance is not None and yahoo_feed.scheduler is not None:
+            yahoo_feed.scheduler.distance = threshold_distance
+        if providers != [yahoo_feed]:
+            yahoo_feed.router = FeedRouter(
+                providers, settings.feed_hedge_seconds, settings.feed_timeout_seconds,
+                settings.feed_freshness_seconds, settings.feed_min_fresh_ratio, settings.feed_breaker_failures,
+                settings.feed_breaker_open_seconds, settings.feed_breaker_max_open_seconds,
+            )
+            yahoo_feed.router.set_symbols(yahoo_feed.symbols)
+        await yahoo_feed.start_feed(poll_seconds=settings.poll_base_seconds,
+                                    freshness_secs=settings.feed_freshness_seconds)
+        print("✅ Market feed stopped")
     except Exception as e:
-        print(f"❌ Yahoo Finance failed: {e}")
-        raise RuntimeError("Yahoo feed failed")
+        print(f"❌ Market feed failed: {e}")
+        raise RuntimeError("Market feed failed")
+
+
+def set_feed_symbols(symbols):
+    """Point the running feeds at exactly `symbols` (friendly names); returns the poller's (added, removed)"""
+    symbols = list(symbols)
+    added, removed = yahoo_feed.set_symbols(symbols)
+    if yahoo_feed.router is not None:
+        # The other providers (Yahoo itself sees no change the second time)
+        yahoo_feed.router.set_symbols(symbols)
+    return added, removed
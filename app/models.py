@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Text, Index, CheckConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -30,12 +30,18 @@ class AlertRule(Base):
     data_source = Column(String(20), nullable=False, default="tick")  # tick or ohlcv
     column_name = Column(String(20), nullable=False, default="price")  # price, volume, open_price, high_price, low_price, close_price
     ohlcv_timeframe_minutes = Column(Integer, nullable=False, default=1)
+    trigger_mode = Column(String(10), nullable=False, default="level")  # level (every qualifying tick) or cross (edge-triggered)
     is_active = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     user = relationship("User", back_populates="alert_rules")
     triggers = relationship("AlertTrigger", back_populates="alert_rule", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Same constraint as init.sql, for databases created from the models (SQLite)
+        CheckConstraint("trigger_mode IN ('level', 'cross')", name="ck_alert_rules_trigger_mode"),
+    )
 
 
 class AlertTrigger(Base):
@@ -47,5 +53,29 @@ class AlertTrigger(Base):
     triggered_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     email_sent = Column(Boolean, default=False)
     email_sent_at = Column(DateTime(timezone=True))
+    batch_id = Column(String(32))  # worker evaluation batch; makes retried batch inserts idempotent
     
     alert_rule = relationship("AlertRule", back_populates="triggers")
+    
+    __table_args__ = (
+        Index("uq_alert_triggers_rule_batch", "alert_rule_id", "batch_id", unique=True),
+    )
+
+
+class AlertRuleChange(Base):
+    """Append-only change log for alert_rules; the id doubles as a monotonically increasing version"""
+    __tablename__ = "alert_rule_changes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    alert_rule_id = Column(Integer, nullable=False, index=True)  # no FK: deletes must stay visible
+    op = Column(String(10), nullable=False, default="upsert")  # upsert, delete
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class WorkerLease(Base):
+    """Time-limited leases: 'worker:<id>' rows track live workers, 'shard:<n>' rows grant symbol-shard ownership"""
+    __tablename__ = "worker_leases"
+    
+    lease_key = Column(String(64), primary_key=True)
+    owner = Column(String(64), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
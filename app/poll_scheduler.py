@@ -0,0 +1,144 @@
+# app/poll_scheduler.py
+"""
+Per-symbol poll intervals driven by alert proximity and volatility.
+
+Every symbol has a due time in a heap. After each poll its next interval is
+the time a `z`-sigma move would need to reach the nearest alert threshold:
+
+    interval = (distance / price / (z * sigma)) ** 2
+
+where sigma is an EWMA of the symbol's squared returns per second (relative
+volatility per sqrt-second, floored at `min_volatility`). A symbol trading
+next to a threshold, or moving fast, is polled every `min_seconds`; one far
+from every threshold drifts out to `max_seconds`, as does a symbol with no
+rules at all. A symbol whose fetch failed is retried after `base_seconds`.
+Symbols falling due within `min_seconds` of each other are handed out
+together, so a batched fetch still covers them with one request, and
+spare room in that request is filled with the symbols due next.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .prices import Paise
+
+# symbol, price -> distance in paise to the nearest alert threshold (None: no rules)
+DistanceFn = Callable[[str, Paise], Optional[Paise]]
+
+# ~2% daily moves over a 6h15m session, per sqrt-second
+TYPICAL_VOLATILITY = 0.02 / math.sqrt(6.25 * 3600)
+
+
+class _SymbolState:
+    __slots__ = ("price", "seen_at", "variance", "interval")
+
+    def __init__(self):
+        self.price: Optional[Paise] = None
+        self.seen_at = 0.0
+        self.variance = 0.0
+        self.interval = 0.0
+
+
+class PollScheduler:
+    """Hands out the symbols due for a poll and reschedules them from what the poll saw"""
+
+    def __init__(self, min_seconds: float = 2.0, base_seconds: float = 8.0, max_seconds: float = 60.0,
+                 z: float = 3.0, min_volatility: float = TYPICAL_VOLATILITY / 2, alpha: float = 0.2):
+        self.min_seconds = min_seconds
+        self.base_seconds = max(min_seconds, base_seconds)
+        self.max_seconds = max(self.base_seconds, max_seconds)
+        self.z = z
+        self.min_volatility = min_volatility
+        self.alpha = alpha
+        self.distance: Optional[DistanceFn] = None
+        self._heap: List[Tuple[float, str]] = []
+        # symbol -> due time; heap entries that disagree with it are stale
+        self._due: Dict[str, float] = {}
+        self._state: Dict[str, _SymbolState] = {}
+
+        self.polls = 0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def sync(self, symbols: Iterable[str], now: Optional[float] = None):
+        """Track exactly `symbols`: new ones are due at once, dropped ones are forgotten"""
+        now = time.monotonic() if now is None else now
+        wanted = set(symbols)
+        for symbol in wanted - self._due.keys():
+            self._schedule(symbol, now)
+        for symbol in self._due.keys() - wanted:
+            del self._due[symbol]
+            self._state.pop(symbol, None)
+
+    def _schedule(self, symbol: str, due: float):
+        self._due[symbol] = due
+        heapq.heappush(self._heap, (due, symbol))
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due, symbol = self._heap[0]
+            if self._due.get(symbol) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def due(self, now: Optional[float] = None, fill_to: int = 1) -> List[str]:
+        """Pop the symbols due by now (or within min_seconds, to share their request)
+
+        With `fill_to` > 1 (symbols per batched request) the last request is
+        topped up with the symbols due next, which ride along for free.
+        """
+        now = time.monotonic() if now is None else now
+        horizon = now + self.min_seconds
+        symbols, taken = [], set()
+        while self._heap and (self._heap[0][0] <= horizon or (symbols and len(symbols) % fill_to)):
+            due, symbol = heapq.heappop(self._heap)
+            # A symbol re-added at the instant it had been due holds two identical entries
+            if self._due.get(symbol) == due and symbol not in taken:
+                taken.add(symbol)
+                symbols.append(symbol)
+        return symbols
+
+    def observe(self, symbol: str, price: Optional[Paise], now: Optional[float] = None) -> float:
+        """Record one poll result for a symbol handed out by due(); returns its next interval"""
+        now = time.monotonic() if now is None else now
+        if symbol not in self._due:
+            return 0.0
+        self.polls += 1
+        state = self._state.get(symbol)
+        if state is None:
+            state = self._state[symbol] = _SymbolState()
+        if price is None or price <= 0:
+            interval = self.base_seconds
+        else:
+            if state.price is not None and now > state.seen_at:
+                change = (price - state.price) / state.price
+                sample = change * change / (now - state.seen_at)
+                state.variance += self.alpha * (sample - state.variance)
+            state.price, state.seen_at = price, now
+            interval = self._interval(symbol, price, state)
+        state.interval = interval
+        self._schedule(symbol, now + interval)
+        return interval
+
+    def _interval(self, symbol: str, price: Paise, state: _SymbolState) -> float:
+        distance = self.distance(symbol, price) if self.distance is not None else None
+        if distance is None:
+            return self.max_seconds
+        sigma = max(math.sqrt(state.variance), self.min_volatility)
+        seconds = (distance / price / (self.z * sigma)) ** 2
+        return min(self.max_seconds, max(self.min_seconds, seconds))
+
+    def stats(self) -> Dict[str, float]:
+        intervals = [state.interval for state in self._state.values() if state.interval]
+        return {
+            "symbols": len(self._due),
+            "polls": self.polls,
+            "avg_interval_s": round(sum(intervals) / len(intervals), 1) if intervals else 0.0,
+            "at_min_interval": sum(1 for interval in intervals if interval <= self.min_seconds),
+            "at_max_interval": sum(1 for interval in intervals if interval >= self.max_seconds),
+        }
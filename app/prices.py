@@ -0,0 +1,75 @@
+# app/prices.py
+"""
+Fixed-point prices for the tick hot path.
+
+Prices travel from the feed adapters through MarketDataManager, the rule
+index and the bar builder as plain ints of paise (1/100 rupee, the NSE tick
+size granularity), so comparisons and bar updates are integer operations
+with no Decimal allocation per tick. Decimal only appears at the API/email
+boundary via `from_paise`.
+
+A bare int is never a price: rupees arrive as float/Decimal/str, and paise
+as `Paise`, so the unit of a number is never guessed from its Python type.
+"""
+from __future__ import annotations
+
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+import numpy as np
+
+
+class Paise(int):
+    """Integer paise (int64 in DuckDB / NumPy)
+
+    Feed adapters hand prices over as Paise (`to_paise` or an explicit
+    `Paise(...)` around paise they computed); the price callback rejects bare
+    ints. Arithmetic on a Paise gives a plain int, which the annotation
+    still describes inside the pipeline.
+    """
+    __slots__ = ()
+
+
+PRICE_SCALE = 100
+
+# Float noise allowance when rounding feed floats half-up (prices are < 1e8 rupees)
+_FLOAT_NUDGE = 1e-6
+
+
+def to_paise(value) -> Paise:
+    """Rupees (float/Decimal/str) -> integer paise, rounded half-up like _q2 was
+
+    A Paise is returned as is. A bare int is ambiguous (rupees or paise?) and
+    raises TypeError.
+    """
+    if isinstance(value, float):
+        return Paise(math.floor(value * PRICE_SCALE + 0.5 + _FLOAT_NUDGE))
+    if isinstance(value, Paise):
+        return value
+    if isinstance(value, int):
+        raise TypeError(f"Ambiguous price {value!r}: pass rupees as float/Decimal/str or paise as Paise")
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return Paise(int((value * PRICE_SCALE).to_integral_value(rounding=ROUND_HALF_UP)))
+
+
+def to_paise_array(values: np.ndarray) -> np.ndarray:
+    """Float rupees -> int64 paise, element-wise, same rounding as to_paise (no NaNs)"""
+    return np.floor(np.asarray(values, dtype=np.float64) * PRICE_SCALE + 0.5 + _FLOAT_NUDGE).astype(np.int64)
+
+
+def optional_paise(value) -> Optional[Paise]:
+    return None if value is None else to_paise(value)
+
+
+def from_paise(paise: Paise) -> Decimal:
+    """Integer paise -> 2dp Decimal rupees (API / email / Postgres boundary)"""
+    return Decimal(paise).scaleb(-2)
+
+
+def format_paise(paise: Paise) -> str:
+    """'1234.50' without building a Decimal (log lines)"""
+    sign = "-" if paise < 0 else ""
+    rupees, rest = divmod(abs(paise), PRICE_SCALE)
+    return f"{sign}{rupees}.{rest:02d}"
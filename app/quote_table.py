@@ -0,0 +1,279 @@
+# app/quote_table.py
+"""
+Memory-mapped latest-quote table shared between the worker and API processes.
+
+The worker (the only writer of its file) publishes every tick into a
+fixed-layout file under the shared data directory; uvicorn workers map the
+same file read-only and read quotes straight out of the page cache, with no
+DuckDB file and no IPC round trip involved.
+
+Layout: a 64-byte header (magic, version, capacity, slots in use, retired
+flag, writer heartbeat) followed by `capacity` fixed 72-byte slots. A symbol keeps its slot for
+the life of the file; readers learn new symbols by indexing slots up to the
+header's `count`. Each slot is guarded by a seqlock: the writer makes `seq`
+odd, writes the fields and makes it even again, and a reader retries until
+it copied the slot between two equal, even `seq` reads. Plain stores are
+enough for that ordering on x86-64, where the stack is deployed.
+
+With worker sharding each worker writes its own `<path>.<worker_id>` file;
+readers merge every file matching `<path>*` and keep the newest quote.
+
+The writer stamps a heartbeat into the header while it runs and deletes its
+file on a clean shutdown. Readers skip tables whose heartbeat is stale, and a
+starting writer removes stale siblings that crashed workers left behind.
+"""
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .prices import Paise
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QAQT"
+VERSION = 2
+HEADER = np.dtype({
+    "names": ["magic", "version", "capacity", "count", "retired", "heartbeat_us"],
+    "formats": ["S4", "<u4", "<u4", "<u4", "<u4", "<i8"],  # heartbeat: epoch microseconds
+    "offsets": [0, 4, 8, 12, 16, 24],
+    "itemsize": 64,
+})
+SLOT = np.dtype([
+    ("seq", "<u8"),
+    ("price", "<i8"),     # paise
+    ("volume", "<i8"),
+    ("ts_us", "<i8"),     # local time, microseconds since the epoch
+    ("symbol", "S32"),
+    ("exchange", "S8"),
+])
+# Give up on a slot that stays mid-write this many times (writer died mid-update)
+READ_ATTEMPTS = 64
+
+# (price paise, volume, timestamp, exchange); same shape as MarketDataManager quotes
+SharedQuote = Tuple[Paise, int, datetime, str]
+
+
+def _file_size(capacity: int) -> int:
+    return HEADER.itemsize + capacity * SLOT.itemsize
+
+
+class QuoteTable:
+    """One quote file mapped into this process, as its writer or as a reader"""
+
+    def __init__(self, path: str, raw: np.memmap):
+        self.path = path
+        self._raw = raw
+        # Plain ndarray views (still backed by the mapping) skip np.memmap's per-index overhead
+        raw = raw.view(np.ndarray)
+        self.header = raw[:HEADER.itemsize].view(HEADER)
+        capacity = int(self.header["capacity"][0])
+        self.slots = raw[HEADER.itemsize:_file_size(capacity)].view(SLOT)
+        self.capacity = capacity
+        self._seq = self.slots["seq"]
+        self._price = self.slots["price"]
+        self._volume = self.slots["volume"]
+        self._ts_us = self.slots["ts_us"]
+        self._exchange = self.slots["exchange"]
+        self._index: Dict[str, int] = {}
+        self._indexed = 0
+        self._full_logged = False
+
+    @classmethod
+    def create(cls, path: str, capacity: int) -> "QuoteTable":
+        """Open `path` for writing, reusing a compatible file so readers keep their slots"""
+        existing = cls.open(path, writable=True)
+        if existing is not None and existing.capacity == capacity:
+            existing.refresh()
+            existing.beat()
+            return existing
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix=".quotes-", dir=directory)
+        with os.fdopen(fd, "wb") as handle:
+            handle.truncate(_file_size(capacity))
+        raw = np.memmap(staging, dtype=np.uint8, mode="r+")
+        header = raw[:HEADER.itemsize].view(HEADER)
+        header["version"] = VERSION
+        header["capacity"] = capacity
+        header["heartbeat_us"] = int(time.time() * 1_000_000)
+        header["magic"] = MAGIC
+        raw.flush()
+        os.replace(staging, path)
+        if existing is not None:
+            # Readers still mapping the old file reopen when they see this
+            existing.header["retired"] = 1
+        return cls(path, raw)
+
+    @classmethod
+    def open(cls, path: str, writable: bool = False) -> Optional["QuoteTable"]:
+        try:
+            raw = np.memmap(path, dtype=np.uint8, mode="r+" if writable else "r")
+        except (OSError, ValueError):
+            return None
+        if len(raw) < HEADER.itemsize:
+            return None
+        header = raw[:HEADER.itemsize].view(HEADER)
+        capacity = int(header["capacity"][0])
+        if header["magic"][0] != MAGIC or header["version"][0] != VERSION or len(raw) < _file_size(capacity):
+            return None
+        return cls(path, raw)
+
+    @property
+    def retired(self) -> bool:
+        return bool(self.header["retired"][0])
+
+    def heartbeat_age(self) -> float:
+        """Seconds since the writer last stamped its heartbeat"""
+        return time.time() - int(self.header["heartbeat_us"][0]) / 1_000_000
+
+    def refresh(self):
+        """Index slots the writer has filled since the last call"""
+        count = min(int(self.header["count"][0]), self.capacity)
+        if count <= self._indexed:
+            return
+        for slot, name in enumerate(self.slots["symbol"][self._indexed:count].tolist(), self._indexed):
+            self._index[name.decode()] = slot
+        self._indexed = count
+
+    def symbols(self) -> List[str]:
+        self.refresh()
+        return list(self._index)
+
+    # Writer side
+
+    def beat(self):
+        """Mark the writer alive (called periodically, ticks or not)"""
+        self.header["heartbeat_us"] = int(time.time() * 1_000_000)
+
+    def remove(self):
+        """Clean writer shutdown: readers drop the table and its file is deleted"""
+        self.header["retired"] = 1
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def remove_stale(path: str, stale_seconds: float, keep: str) -> List[str]:
+        """Delete `<path>.*` siblings (other than `keep`) whose writer stopped beating or that cannot be read"""
+        removed = []
+        for sibling in glob.glob(f"{glob.escape(path)}.*"):
+            if sibling == keep:
+                continue
+            table = QuoteTable.open(sibling)
+            if table is not None and table.heartbeat_age() <= stale_seconds:
+                continue
+            try:
+                os.unlink(sibling)
+                removed.append(sibling)
+            except OSError:
+                pass
+        return removed
+
+    def publish(self, symbol: str, price: Paise, volume: int, timestamp: datetime, exchange: str = "NSE"):
+        slot = self._index.get(symbol)
+        if slot is None:
+            slot = self._allocate(symbol, exchange)
+            if slot is None:
+                return
+        seq = self._seq
+        seq[slot] += 1  # odd: write in progress
+        self._price[slot] = price
+        self._volume[slot] = volume
+        self._ts_us[slot] = int(timestamp.timestamp() * 1_000_000)
+        self._exchange[slot] = exchange.encode()[:8]
+        seq[slot] += 1  # even: consistent again
+
+    def _allocate(self, symbol: str, exchange: str) -> Optional[int]:
+        slot = self._indexed
+        if slot >= self.capacity:
+            if not self._full_logged:
+                logger.warning("Quote table %s is full (%d symbols); %s not published",
+                               self.path, self.capacity, symbol)
+                self._full_logged = True
+            return None
+        row = self.slots[slot]
+        row["symbol"] = symbol.encode()[:32]
+        row["exchange"] = exchange.encode()[:8]
+        # Publishing the slot count makes the symbol visible to readers
+        self.header["count"] = slot + 1
+        self._index[symbol] = slot
+        self._indexed = slot + 1
+        return slot
+
+    # Reader side
+
+    def read(self, symbol: str) -> Optional[SharedQuote]:
+        slot = self._index.get(symbol)
+        if slot is None:
+            self.refresh()
+            slot = self._index.get(symbol)
+            if slot is None:
+                return None
+        seq = self._seq
+        for _ in range(READ_ATTEMPTS):
+            before = int(seq[slot])
+            if before & 1:
+                continue
+            price = int(self._price[slot])
+            volume = int(self._volume[slot])
+            ts_us = int(self._ts_us[slot])
+            exchange = self._exchange[slot]
+            if int(seq[slot]) == before:
+                if before == 0:
+                    return None  # slot allocated, no tick published yet
+                return price, volume, datetime.fromtimestamp(ts_us / 1_000_000), exchange.decode()
+        return None
+
+
+class SharedQuoteReader:
+    """Read-only view over every quote file at `path` (and its per-worker siblings)"""
+
+    def __init__(self, path: str, rescan_seconds: float = 5.0, stale_seconds: float = 60.0):
+        self.path = path
+        self.rescan_seconds = rescan_seconds
+        # Tables whose writer has not beaten for this long are skipped (crashed worker)
+        self.stale_seconds = stale_seconds
+        self._tables: Dict[str, QuoteTable] = {}
+        self._scanned_at = 0.0
+
+    def _scan(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._scanned_at < self.rescan_seconds:
+            return
+        self._scanned_at = now
+        for path in glob.glob(f"{glob.escape(self.path)}*"):
+            table = self._tables.get(path)
+            if table is None or table.retired:
+                table = QuoteTable.open(path)
+                if table is not None:
+                    self._tables[path] = table
+        for path, table in list(self._tables.items()):
+            if not os.path.exists(path) or table.heartbeat_age() > self.stale_seconds:
+                del self._tables[path]
+
+    def get(self, symbol: str) -> Optional[SharedQuote]:
+        """Newest quote for `symbol` across the writers' files"""
+        self._scan(force=any(table.retired for table in self._tables.values()))
+        best = None
+        for table in self._tables.values():
+            quote = table.read(symbol)
+            if quote is not None and (best is None or quote[2] > best[2]):
+                best = quote
+        return best
+
+    def symbols(self) -> List[str]:
+        self._scan()
+        names = set()
+        for table in self._tables.values():
+            names.update(table.symbols())
+        return sorted(names)
@@ -0,0 +1,157 @@
+# app/rule_changes.py
+"""
+Alert rule change stream.
+
+The API appends one row to `alert_rule_changes` for every create/update/delete,
+in the same transaction as the rule write. The row id is a monotonically
+increasing version: workers remember the last version they applied and only
+pull newer rows, then re-read just the affected rules. On PostgreSQL a NOTIFY
+is sent as well so listening workers wake up without waiting for the next poll.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.orm import Session
+
+from .database import Base, engine
+from .models import AlertRuleChange
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "alert_rule_changes"
+
+
+def ensure_change_table():
+    """Create alert_rule_changes on databases initialised before it existed"""
+    try:
+        Base.metadata.create_all(bind=engine, tables=[AlertRuleChange.__table__])
+    except Exception as e:
+        logger.error("Could not create %s: %s", AlertRuleChange.__tablename__, e)
+
+
+def _notify(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        # Delivered by PostgreSQL only when the surrounding transaction commits
+        db.execute(text(f"NOTIFY {CHANNEL}"))
+
+
+def record_rule_change(db: Session, rule_id: int, op: str = "upsert"):
+    """Queue a change row in the caller's transaction (committed with the rule)"""
+    db.add(AlertRuleChange(alert_rule_id=rule_id, op=op, changed_at=datetime.now(timezone.utc)))
+    _notify(db)
+
+
+def record_rule_changes(db: Session, rule_ids: List[int], op: str = "upsert"):
+    """Bulk variant: one multi-row INSERT and a single NOTIFY for many rules"""
+    if not rule_ids:
+        return
+    changed_at = datetime.now(timezone.utc)
+    db.execute(insert(AlertRuleChange), [
+        {"alert_rule_id": rule_id, "op": op, "changed_at": changed_at} for rule_id in rule_ids
+    ])
+    _notify(db)
+
+
+def latest_version(db: Session) -> int:
+    return db.query(func.max(AlertRuleChange.id)).scalar() or 0
+
+
+def fetch_changes(db: Session, after: int, upto: Optional[int] = None,
+                  limit: int = 1000) -> List[AlertRuleChange]:
+    """Changes with after < id (<= upto), oldest first"""
+    query = db.query(AlertRuleChange).filter(AlertRuleChange.id > after)
+    if upto is not None:
+        query = query.filter(AlertRuleChange.id <= upto)
+    return query.order_by(AlertRuleChange.id).limit(limit).all()
+
+
+def change_lag_seconds(change: AlertRuleChange, now: Optional[datetime] = None) -> float:
+    """Seconds between the API write and now (SQLite hands back naive UTC)"""
+    changed_at = change.changed_at
+    if changed_at is None:
+        return 0.0
+    if changed_at.tzinfo is None:
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (now - changed_at).total_seconds())
+
+
+class RuleSyncStats:
+    """Propagation metrics for rule changes reaching the worker's index"""
+
+    def __init__(self):
+        self.version = 0
+        self.applied = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._total_lag_ms = 0.0
+
+    def record(self, lag_seconds: float):
+        lag_ms = lag_seconds * 1000.0
+        self.applied += 1
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self._total_lag_ms += lag_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "version": self.version,
+            "applied": self.applied,
+            "last_lag_ms": round(self.last_lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "avg_lag_ms": round(self._total_lag_ms / self.applied, 1) if self.applied else 0.0,
+        }
+
+
+class RuleChangeListener:
+    """LISTEN on PostgreSQL and call `on_notify` from the event loop on each NOTIFY"""
+
+    def __init__(self, on_notify: Callable[[], None]):
+        self.on_notify = on_notify
+        self._conn = None
+        self._loop = None
+
+    def start(self, loop) -> bool:
+        if engine.dialect.name != "postgresql":
+            return False
+        try:
+            import psycopg2
+            import psycopg2.extensions
+
+            dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            self._conn = psycopg2.connect(dsn)
+            self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            self._conn.cursor().execute(f"LISTEN {CHANNEL}")
+            loop.add_reader(self._conn.fileno(), self._on_readable)
+            self._loop = loop
+            return True
+        except Exception as e:
+            logger.error("Rule change LISTEN unavailable, polling only: %s", e)
+            self.stop()
+            return False
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.error("Rule change listener error: %s", e)
+            self.stop()
+            return
+        if self._conn.notifies:
+            self._conn.notifies.clear()
+            self.on_notify()
+
+    def stop(self):
+        if self._conn is not None:
+            try:
+                if self._loop is not None:
+                    self._loop.remove_reader(self._conn.fileno())
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self._loop = None
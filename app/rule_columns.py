@@ -0,0 +1,219 @@
+# app/rule_columns.py
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .prices import Paise
+
+OP_GT, OP_GE, OP_LT, OP_LE, OP_EQ = range(5)
+OP_CODES = {">": OP_GT, ">=": OP_GE, "<": OP_LT, "<=": OP_LE, "==": OP_EQ}
+
+
+# (symbol id, op code, threshold paise, cross)
+PredicateKey = Tuple[int, int, int, bool]
+
+
+class ColumnarRules:
+    """
+    Rules held as NumPy column arrays (symbol index, op code, threshold in
+    paise, cross flag) so a whole poll-cycle snapshot is evaluated with a few
+    masked comparisons instead of one Python call per rule.
+
+    Each row is a canonical predicate: identical rules from different users
+    share the row and are listed as its subscribers, so the masked pass is
+    over distinct predicates and only firing rows are fanned out to rule ids.
+    The first subscriber of every row is also kept as a column, so rows with
+    a single subscriber fan out without touching Python lists.
+
+    Updates move a rule between rows; a row whose last subscriber leaves
+    becomes a tombstone that is compacted away once more than half the rows
+    are dead.
+    """
+
+    COLUMNS = ("symbol", "op", "threshold", "cross", "live", "first", "shared")
+
+    def __init__(self, capacity: int = 1024):
+        self.symbol_ids: Dict[str, int] = {}
+        self._rows: Dict[PredicateKey, int] = {}
+        self._subscribers: List[List[int]] = []
+        self._rule_rows: Dict[int, int] = {}
+        self._size = 0
+        self._dead = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.symbol = np.zeros(capacity, dtype=np.int32)
+        self.op = np.zeros(capacity, dtype=np.int8)
+        self.threshold = np.zeros(capacity, dtype=np.int64)
+        self.cross = np.zeros(capacity, dtype=np.bool_)
+        self.live = np.zeros(capacity, dtype=np.bool_)
+        self.first = np.zeros(capacity, dtype=np.int64)
+        self.shared = np.zeros(capacity, dtype=np.bool_)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in self.COLUMNS}
+        self._allocate(max(1024, len(self.symbol) * 2))
+        for name, values in old.items():
+            getattr(self, name)[:self._size] = values[:self._size]
+
+    def __len__(self) -> int:
+        return len(self._rule_rows)
+
+    @property
+    def predicates(self) -> int:
+        return len(self._rows)
+
+    def _symbol_id(self, symbol: str) -> int:
+        sid = self.symbol_ids.get(symbol)
+        if sid is None:
+            sid = self.symbol_ids[symbol] = len(self.symbol_ids)
+        return sid
+
+    def _key(self, rule) -> PredicateKey:
+        return (self._symbol_id(rule.symbol), OP_CODES[rule.condition_type],
+                rule.target_paise, rule.trigger_mode == "cross")
+
+    def upsert(self, rule):
+        self.remove(rule.id)
+        key = self._key(rule)
+        pos = self._rows.get(key)
+        if pos is None:
+            if self._size == len(self.symbol):
+                self._grow()
+            pos = self._rows[key] = self._size
+            self._size += 1
+            self._subscribers.append([])
+            self.symbol[pos], self.op[pos], self.threshold[pos], self.cross[pos] = key
+            self.live[pos] = True
+            self.first[pos] = rule.id
+        else:
+            self.shared[pos] = True
+        self._subscribers[pos].append(rule.id)
+        self._rule_rows[rule.id] = pos
+
+    def remove(self, rule_id: int):
+        pos = self._rule_rows.pop(rule_id, None)
+        if pos is None:
+            return
+        subscribers = self._subscribers[pos]
+        subscribers.remove(rule_id)
+        if subscribers:
+            self.first[pos] = subscribers[0]
+            self.shared[pos] = len(subscribers) > 1
+            return
+        self.live[pos] = False
+        del self._rows[(int(self.symbol[pos]), int(self.op[pos]), int(self.threshold[pos]), bool(self.cross[pos]))]
+        self._dead += 1
+        if self._dead > 1024 and self._dead * 2 > self._size:
+            self._compact()
+
+    def load(self, rules: Iterable):
+        """Replace all rows, grouping identical predicates and filling the columns in bulk"""
+        self.symbol_ids.clear()
+        self._rows = {}
+        self._subscribers = []
+        self._rule_rows = {}
+        for rule in rules:
+            key = self._key(rule)
+            pos = self._rows.get(key)
+            if pos is None:
+                pos = self._rows[key] = len(self._subscribers)
+                self._subscribers.append([])
+            self._subscribers[pos].append(rule.id)
+            self._rule_rows[rule.id] = pos
+
+        n = len(self._rows)
+        self._size = self._dead = 0
+        self._allocate(max(1024, n))
+        keys = list(self._rows)
+        self.symbol[:n] = np.fromiter((k[0] for k in keys), dtype=np.int32, count=n)
+        self.op[:n] = np.fromiter((k[1] for k in keys), dtype=np.int8, count=n)
+        self.threshold[:n] = np.fromiter((k[2] for k in keys), dtype=np.int64, count=n)
+        self.cross[:n] = np.fromiter((k[3] for k in keys), dtype=np.bool_, count=n)
+        self.live[:n] = True
+        self.first[:n] = np.fromiter((ids[0] for ids in self._subscribers), dtype=np.int64, count=n)
+        self.shared[:n] = np.fromiter((len(ids) > 1 for ids in self._subscribers), dtype=np.bool_, count=n)
+        self._size = n
+
+    def _compact(self):
+        keep = np.flatnonzero(self.live[:self._size])
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[:len(keep)] = column[keep]
+        self.live[len(keep):] = False
+        self._size = len(keep)
+        self._dead = 0
+        self._subscribers = [self._subscribers[pos] for pos in keep.tolist()]
+        self._rows = {
+            (int(s), int(o), int(t), bool(c)): pos
+            for pos, (s, o, t, c) in enumerate(zip(self.symbol[:self._size], self.op[:self._size],
+                                                   self.threshold[:self._size], self.cross[:self._size]))
+        }
+        self._rule_rows = {rule_id: pos for pos, ids in enumerate(self._subscribers) for rule_id in ids}
+
+    def _price_vector(self, prices: Mapping[str, Paise]):
+        values = np.zeros(len(self.symbol_ids), dtype=np.int64)
+        present = np.zeros(len(self.symbol_ids), dtype=np.bool_)
+        for symbol, price in prices.items():
+            sid = self.symbol_ids.get(symbol)
+            if sid is not None and price is not None:
+                values[sid] = price
+                present[sid] = True
+        return values, present
+
+    def _holds(self, price, op, threshold):
+        return (
+            ((op == OP_GT) & (price > threshold))
+            | ((op == OP_GE) & (price >= threshold))
+            | ((op == OP_LT) & (price < threshold))
+            | ((op == OP_LE) & (price <= threshold))
+            | ((op == OP_EQ) & (price == threshold))
+        )
+
+    def evaluate_predicates(self, prices: Mapping[str, Paise],
+                            previous: Optional[Mapping[str, Paise]] = None) -> np.ndarray:
+        """Return row numbers of predicates firing for a {symbol: paise} snapshot
+
+        Level predicates fire when their condition holds; cross predicates only
+        when it did not hold at `previous[symbol]` (and a previous price exists).
+        """
+        n = self._size
+        if n == 0 or not prices:
+            return np.empty(0, dtype=np.int64)
+
+        cur, has_cur = self._price_vector(prices)
+        symbol = self.symbol[:n]
+        op = self.op[:n]
+        threshold = self.threshold[:n]
+        cross = self.cross[:n]
+
+        fire = self.live[:n] & has_cur[symbol] & self._holds(cur[symbol], op, threshold)
+        if cross.any():
+            if previous:
+                prev, has_prev = self._price_vector(previous)
+                was = has_prev[symbol] & self._holds(prev[symbol], op, threshold)
+                fire &= ~cross | (has_prev[symbol] & ~was)
+            else:
+                fire &= ~cross
+        return np.flatnonzero(fire)
+
+    def _fan_out(self, fire: np.ndarray):
+        """First subscribers of the firing rows (array) plus the remaining ones of shared rows"""
+        rest: List[int] = []
+        subscribers = self._subscribers
+        for pos in fire[self.shared[fire]].tolist():
+            rest.extend(subscribers[pos][1:])
+        return self.first[fire], rest
+
+    def evaluate(self, prices: Mapping[str, Paise],
+                 previous: Optional[Mapping[str, Paise]] = None) -> np.ndarray:
+        """Ids of rules firing for a snapshot (firing predicates fanned out to subscribers)"""
+        first, rest = self._fan_out(self.evaluate_predicates(prices, previous))
+        return np.concatenate((first, np.asarray(rest, dtype=np.int64))) if rest else first
+
+    def evaluate_ids(self, prices: Mapping[str, Paise],
+                     previous: Optional[Mapping[str, Paise]] = None) -> List[int]:
+        first, rest = self._fan_out(self.evaluate_predicates(prices, previous))
+        return first.tolist() + rest
@@ -0,0 +1,356 @@
+# app/rule_index.py
+from __future__ import annotations
+
+import logging
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from operator import attrgetter
+from decimal import Decimal
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from .bars import COLUMN_ALIASES
+from .prices import Paise, to_paise
+from .rule_columns import ColumnarRules
+
+logger = logging.getLogger(__name__)
+
+# Tolerance for "==" conditions, in paise (0.01 rupee)
+EQUALITY_TOLERANCE = 1
+
+
+@dataclass
+class CachedRule:
+    """Worker-side snapshot of an active AlertRule (no DB session attached)"""
+    id: int
+    user_id: int
+    email: str
+    symbol: str
+    condition_type: str
+    target_price: Decimal
+    alert_type: str = "one_shot"
+    cooldown_minutes: int = 0
+    data_source: str = "tick"
+    column_name: str = "price"
+    ohlcv_timeframe_minutes: int = 1
+    trigger_mode: str = "level"
+    # Fixed-point copy of target_price used by every comparison
+    target_paise: Paise = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.target_paise = to_paise(self.target_price)
+
+    @property
+    def is_ohlcv(self) -> bool:
+        return self.data_source == "ohlcv"
+
+    @classmethod
+    def from_model(cls, rule) -> "CachedRule":
+        """Build from an AlertRule ORM row (user relationship must be loadable)"""
+        return cls(
+            id=rule.id,
+            user_id=rule.user_id,
+            email=rule.user.email if rule.user else "",
+            symbol=rule.symbol,
+            condition_type=rule.condition_type,
+            target_price=Decimal(str(rule.target_price)),
+            alert_type=rule.alert_type or "one_shot",
+            cooldown_minutes=rule.cooldown_minutes or 0,
+            data_source=rule.data_source or "tick",
+            column_name=rule.column_name or "price",
+            ohlcv_timeframe_minutes=rule.ohlcv_timeframe_minutes or 1,
+            trigger_mode=rule.trigger_mode or "level",
+        )
+
+
+def condition_holds(condition: str, target: Paise, current_price: Paise) -> bool:
+    """Evaluate a single comparison (both sides in paise)"""
+    if condition == ">" and current_price > target:
+        return True
+    elif condition == ">=" and current_price >= target:
+        return True
+    elif condition == "<" and current_price < target:
+        return True
+    elif condition == "<=" and current_price <= target:
+        return True
+    elif condition == "==" and abs(current_price - target) < EQUALITY_TOLERANCE:
+        return True
+    
+    return False
+
+
+class _ThresholdBook:
+    """Thresholds for one (symbol, condition) pair, kept sorted for bisect
+
+    Rules sharing a threshold (many users asking for the same
+    "RELIANCE > 3000") sit next to each other, so each distinct threshold is
+    one canonical predicate: a single bisect boundary decides it and its
+    subscribers fan out as one contiguous slice. `distinct` counts them.
+    """
+
+    __slots__ = ("thresholds", "rule_ids", "distinct")
+
+    def __init__(self):
+        self.thresholds: List[Paise] = []
+        self.rule_ids: List[int] = []
+        self.distinct = 0
+
+    def add(self, threshold: Paise, rule_id: int):
+        i = bisect_right(self.thresholds, threshold)
+        if i == 0 or self.thresholds[i - 1] != threshold:
+            self.distinct += 1
+        self.thresholds.insert(i, threshold)
+        self.rule_ids.insert(i, rule_id)
+
+    def remove(self, threshold: Paise, rule_id: int) -> bool:
+        i = bisect_left(self.thresholds, threshold)
+        while i < len(self.thresholds) and self.thresholds[i] == threshold:
+            if self.rule_ids[i] == rule_id:
+                del self.thresholds[i]
+                del self.rule_ids[i]
+                if threshold not in self.thresholds[max(0, i - 1):i + 1]:
+                    self.distinct -= 1
+                return True
+            i += 1
+        return False
+
+    def __len__(self) -> int:
+        return len(self.thresholds)
+
+
+# Tick rules are booked under their symbol, OHLCV rules under (symbol, timeframe, column)
+BookKey = Union[str, Tuple[str, int, str]]
+
+
+def ohlcv_key(symbol: str, timeframe_minutes: int, column: str) -> Tuple[str, int, str]:
+    return symbol, timeframe_minutes, COLUMN_ALIASES.get(column, column)
+
+
+def book_key(rule: CachedRule) -> BookKey:
+    if rule.is_ohlcv:
+        return ohlcv_key(rule.symbol, rule.ohlcv_timeframe_minutes, rule.column_name)
+    return rule.symbol
+
+
+def _holding_range(condition: str, thresholds: List[Paise], price: Paise) -> Tuple[int, int]:
+    """Slice [lo, hi) of sorted `thresholds` whose condition holds at `price`"""
+    if condition == ">":
+        return 0, bisect_left(thresholds, price)
+    if condition == ">=":
+        return 0, bisect_right(thresholds, price)
+    if condition == "<":
+        return bisect_right(thresholds, price), len(thresholds)
+    if condition == "<=":
+        return bisect_left(thresholds, price), len(thresholds)
+    # "=="
+    return (
+        bisect_right(thresholds, price - EQUALITY_TOLERANCE),
+        bisect_left(thresholds, price + EQUALITY_TOLERANCE),
+    )
+
+
+class RuleIndex:
+    """
+    Resident index of active alert rules.
+    Per symbol, thresholds are held (as integer paise) in sorted arrays split by condition type so
+    a tick is matched with a couple of bisects plus the rules that actually fire:
+      >   price > target   -> targets[:bisect_left(price)]
+      >=  price >= target  -> targets[:bisect_right(price)]
+      <   price < target   -> targets[bisect_right(price):]
+      <=  price <= target  -> targets[bisect_left(price):]
+      ==  |price - target| < 1 paisa -> targets in (price - 1, price + 1)
+
+    Identical rules from different users form one canonical predicate
+    (key, trigger mode, condition, threshold) that is evaluated once and fans
+    out to its subscribers, so evaluation cost follows the number of distinct
+    predicates rather than total rules (see `stats()`).
+
+    Rules with trigger_mode "cross" live in separate books and only match when
+    the condition flips from false at the previous price to true at the
+    current one, i.e. thresholds inside the (prev, current] interval. That is
+    the difference of two holding slices, so the cost is O(log n + crossings).
+
+    With `columnar=True` the index also mirrors every tick rule into NumPy
+    column arrays so a whole poll-cycle snapshot can be evaluated in one pass.
+
+    OHLCV rules (data_source "ohlcv") are booked under
+    (symbol, timeframe, column) and matched against bar values instead of
+    raw tick prices.
+    """
+
+    CONDITIONS = (">", ">=", "<", "<=", "==")
+    TRIGGER_MODES = ("level", "cross")
+
+    def __init__(self, columnar: bool = False):
+        self.rules: Dict[int, CachedRule] = {}
+        # symbol -> trigger_mode -> condition -> book
+        self._books: Dict[BookKey, Dict[str, Dict[str, _ThresholdBook]]] = {}
+        # symbol -> its book keys (the tick key and any OHLCV keys)
+        self._symbol_keys: Dict[str, Set[BookKey]] = {}
+        self.columns: Optional[ColumnarRules] = ColumnarRules() if columnar else None
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __contains__(self, rule_id: int) -> bool:
+        return rule_id in self.rules
+
+    def get(self, rule_id: int) -> Optional[CachedRule]:
+        return self.rules.get(rule_id)
+
+    def stats(self) -> Dict[str, float]:
+        """Rules vs distinct predicates they collapse into"""
+        predicates = sum(
+            book.distinct for modes in self._books.values() for books in modes.values() for book in books.values()
+        )
+        rules = len(self.rules)
+        stats = {
+            "rules": rules,
+            "predicates": predicates,
+            "dedup_ratio": round(rules / predicates, 2) if predicates else 1.0,
+        }
+        if self.columns is not None:
+            stats["columnar_predicates"] = self.columns.predicates
+        return stats
+
+    def _live_keys(self) -> List[BookKey]:
+        return [
+            key for key, modes in self._books.items()
+            if any(book for books in modes.values() for book in books.values())
+        ]
+
+    def symbols(self) -> List[str]:
+        return sorted({key[0] if isinstance(key, tuple) else key for key in self._live_keys()})
+
+    def ohlcv_series(self) -> Set[Tuple[str, int]]:
+        """Distinct (symbol, timeframe) pairs referenced by OHLCV rules"""
+        return {(key[0], key[1]) for key in self._live_keys() if isinstance(key, tuple)}
+
+    def clear(self):
+        self.rules.clear()
+        self._books.clear()
+        self._symbol_keys.clear()
+        if self.columns is not None:
+            self.columns.load([])
+
+    def load(self, rules: Iterable[CachedRule]):
+        """Replace the whole index contents (bulk: sort each book once instead of n inserts)"""
+        self.clear()
+        valid: List[CachedRule] = []
+        groups: Dict[Tuple[BookKey, str, str], List[CachedRule]] = {}
+        for rule in rules:
+            if self._accepts(rule):
+                valid.append(rule)
+                groups.setdefault((book_key(rule), rule.trigger_mode, rule.condition_type), []).append(rule)
+
+        for (key, mode, condition), members in groups.items():
+            members.sort(key=attrgetter("target_paise"))
+            book = self._books.setdefault(key, {}).setdefault(mode, {})[condition] = _ThresholdBook()
+            self._symbol_keys.setdefault(members[0].symbol, set()).add(key)
+            book.thresholds = [rule.target_paise for rule in members]
+            book.rule_ids = [rule.id for rule in members]
+            book.distinct = len(set(book.thresholds))
+        self.rules = {rule.id: rule for rule in valid}
+        if self.columns is not None:
+            self.columns.load(rule for rule in valid if not rule.is_ohlcv)
+
+    def _accepts(self, rule: CachedRule) -> bool:
+        """Rules the index cannot evaluate are left out, loudly (they would never fire)"""
+        if rule.condition_type in self.CONDITIONS and rule.trigger_mode in self.TRIGGER_MODES:
+            return True
+        logger.warning("Alert rule %s not indexed: unsupported condition %r / trigger mode %r",
+                       rule.id, rule.condition_type, rule.trigger_mode)
+        return False
+
+    def upsert(self, rule: CachedRule):
+        """Insert a rule, replacing any previous version with the same id"""
+        self.remove(rule.id)
+        if not self._accepts(rule):
+            return
+        self.rules[rule.id] = rule
+        key = book_key(rule)
+        self._symbol_keys.setdefault(rule.symbol, set()).add(key)
+        books = self._books.setdefault(key, {}).setdefault(rule.trigger_mode, {})
+        book = books.get(rule.condition_type)
+        if book is None:
+            book = books[rule.condition_type] = _ThresholdBook()
+        book.add(rule.target_paise, rule.id)
+        if self.columns is not None and not rule.is_ohlcv:
+            self.columns.upsert(rule)
+
+    def remove(self, rule_id: int) -> Optional[CachedRule]:
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return None
+        book = self._books.get(book_key(rule), {}).get(rule.trigger_mode, {}).get(rule.condition_type)
+        if book is not None:
+            book.remove(rule.target_paise, rule.id)
+        if self.columns is not None:
+            self.columns.remove(rule_id)
+        return rule
+
+    def threshold_distance(self, symbol: str, price: Paise) -> Optional[Paise]:
+        """Paise between `price` and the nearest threshold of any rule on `symbol` (None without rules)
+
+        OHLCV rules count too, with their bar value approximated by the price.
+        """
+        nearest = None
+        for key in self._symbol_keys.get(symbol, ()):
+            for books in self._books[key].values():
+                for book in books.values():
+                    thresholds = book.thresholds
+                    i = bisect_left(thresholds, price)
+                    for j in (i - 1, i):
+                        if 0 <= j < len(thresholds):
+                            gap = abs(thresholds[j] - price)
+                            if nearest is None or gap < nearest:
+                                nearest = gap
+        return nearest
+
+    def match_ids(self, symbol: BookKey, price: Paise) -> List[int]:
+        """Return ids of level rules on `symbol` (or an ohlcv_key) whose condition holds at `price`"""
+        books = self._books.get(symbol, {}).get("level")
+        if not books:
+            return []
+
+        hits: List[int] = []
+        for condition, book in books.items():
+            if book:
+                lo, hi = _holding_range(condition, book.thresholds, price)
+                hits.extend(book.rule_ids[lo:hi])
+        return hits
+
+    def match_crossing_ids(self, symbol: BookKey, previous: Paise, price: Paise) -> List[int]:
+        """Return ids of cross rules whose condition became true moving previous -> price"""
+        books = self._books.get(symbol, {}).get("cross")
+        if not books or previous == price:
+            return []
+
+        hits: List[int] = []
+        for condition, book in books.items():
+            if not book:
+                continue
+            lo, hi = _holding_range(condition, book.thresholds, price)
+            was_lo, was_hi = _holding_range(condition, book.thresholds, previous)
+            # [lo, hi) minus [was_lo, was_hi): at most two contiguous pieces
+            hits.extend(book.rule_ids[lo:min(hi, was_lo)])
+            hits.extend(book.rule_ids[max(lo, was_hi):hi])
+        return hits
+
+    def match(self, symbol: BookKey, price: Paise, previous: Optional[Paise] = None) -> List[CachedRule]:
+        rule_ids = self.match_ids(symbol, price)
+        if previous is not None:
+            rule_ids += self.match_crossing_ids(symbol, previous, price)
+        return [self.rules[rule_id] for rule_id in rule_ids]
+
+    def match_snapshot_ids(self, prices: Mapping[str, Paise],
+                           previous: Optional[Mapping[str, Paise]] = None) -> List[int]:
+        """Evaluate every rule against a {symbol: paise} snapshot at once"""
+        if self.columns is None:
+            hits: List[int] = []
+            for symbol, price in prices.items():
+                hits.extend(self.match_ids(symbol, price))
+                prev = (previous or {}).get(symbol)
+                if prev is not None:
+                    hits.extend(self.match_crossing_ids(symbol, prev, price))
+            return hits
+        return self.columns.evaluate_ids(prices, previous)
@@ -1,9 +1,13 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from decimal import Decimal
 
 
+# level: fires on every qualifying tick; cross: only when the condition turns true
+TriggerMode = Literal["level", "cross"]
+
+
 class UserBase(BaseModel):
     email: EmailStr
 
@@ -29,6 +33,7 @@ class AlertRuleBase(BaseModel):
     data_source: str = "tick"  # tick or ohlcv
     column_name: str = "price"  # price, volume, open_price, high_price, low_price, close_price
     ohlcv_timeframe_minutes: int = 1
+    trigger_mode: TriggerMode = "level"
 
 
 class AlertRuleCreate(AlertRuleBase):
@@ -45,6 +50,7 @@ class AlertRuleUpdate(BaseModel):
     data_source: Optional[str] = None
     column_name: Optional[str] = None
     ohlcv_timeframe_minutes: Optional[int] = None
+    trigger_mode: Optional[TriggerMode] = None
 
 
 class AlertRule(AlertRuleBase):
@@ -78,6 +84,15 @@ class PriceData(BaseModel):
     exchange: str
 
 
+class SymbolDetails(BaseModel):
+    symbol: str
+    exchange: str
+    first_seen: datetime
+    last_seen: datetime
+    stored_ticks: int  # ticks kept in history; repeats collapsed by the change-only filter are not counted
+    last_price: Decimal
+
+
 class OHLCVData(BaseModel):
     symbol: str
     open_price: Decimal
@@ -87,6 +102,7 @@ class OHLCVData(BaseModel):
     volume: int
     timestamp: datetime
     exchange: str
+    timeframe_minutes: int = 1
 
 
 class Token(BaseModel):
@@ -0,0 +1,179 @@
+# app/sharding.py
+"""
+Symbol sharding for horizontally scaled AlertWorkers.
+
+Symbols hash into a fixed number of shards. Every worker keeps a
+'worker:<id>' lease alive in the primary database; the live leases form the
+member list of a consistent-hash ring that decides which worker should own
+each shard, so a join or leave only moves the shards next to that worker's
+points on the ring. Ownership itself is a 'shard:<n>' lease that must be
+claimed (or renewed) before a worker polls and evaluates those symbols, and
+which stops counting once it expires, so two workers never act on the same
+shard at the same time.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import socket
+import time
+import zlib
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .config import settings
+from .database import Base, engine as default_engine, insert_ignoring_conflicts
+from .models import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+_leases = WorkerLease.__table__
+
+
+def default_worker_id() -> str:
+    return settings.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_of(symbol: str, num_shards: int) -> int:
+    """Stable across processes (unlike hash())"""
+    return zlib.crc32(symbol.encode("utf-8")) % num_shards
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, members: Iterable[str], vnodes: int = 64):
+        ring = sorted((_point(f"{member}#{i}"), member) for member in members for i in range(vnodes))
+        self._points = [point for point, _ in ring]
+        self._members = [member for _, member in ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        i = bisect_right(self._points, _point(key)) % len(self._points)
+        return self._members[i]
+
+
+def ensure_lease_table(bind=None):
+    """Create worker_leases on databases initialised before it existed"""
+    try:
+        Base.metadata.create_all(bind=bind or default_engine, tables=[_leases])
+    except Exception as e:
+        logger.error("Could not create %s: %s", _leases.name, e)
+
+
+class ShardCoordinator:
+    """Claims, renews and releases this worker's symbol shards"""
+
+    def __init__(self, worker_id: Optional[str] = None, engine=None,
+                 num_shards: Optional[int] = None, lease_seconds: Optional[int] = None):
+        self.worker_id = worker_id or default_worker_id()
+        self.engine = engine or default_engine
+        self.num_shards = num_shards or settings.shard_count
+        self.lease_seconds = lease_seconds or settings.shard_lease_seconds
+        self.owned: Set[int] = set()
+        self.members: List[str] = []
+        # Ownership is only trusted while the last successful renewal is valid
+        self._valid_until = 0.0
+
+    def owns(self, symbol: str) -> bool:
+        if time.time() >= self._valid_until:
+            return False
+        return shard_of(symbol, self.num_shards) in self.owned
+
+    def owned_symbols(self, symbols: Iterable[str]) -> List[str]:
+        return [symbol for symbol in symbols if self.owns(symbol)]
+
+    def _desired(self, members: List[str]) -> Set[int]:
+        ring = HashRing(members)
+        return {s for s in range(self.num_shards) if ring.owner(f"shard:{s}") == self.worker_id}
+
+    def _insert_missing(self, conn, keys: Iterable[str], owner: str, expires: datetime):
+        """INSERT lease rows that do not exist yet, ignoring ones another worker just created"""
+        rows = [{"lease_key": key, "owner": owner, "expires_at": expires} for key in keys]
+        if not rows:
+            return
+        statement = insert_ignoring_conflicts(conn.dialect.name, _leases, ["lease_key"])
+        if statement is None:
+            for row in rows:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(_leases).values(**row))
+                except IntegrityError:
+                    pass
+            return
+        conn.execute(statement, rows)
+
+    def _claim(self, conn, keys: List[str], owner: str, now: datetime, expires: datetime) -> Set[str]:
+        """Renew our leases, take over expired ones and create missing ones; returns keys we hold"""
+        if not keys:
+            return set()
+        conn.execute(
+            update(_leases)
+            .where(and_(_leases.c.lease_key.in_(keys),
+                        or_(_leases.c.owner == owner, _leases.c.expires_at < now)))
+            .values(owner=owner, expires_at=expires)
+        )
+        existing = dict(conn.execute(
+            select(_leases.c.lease_key, _leases.c.owner).where(_leases.c.lease_key.in_(keys))
+        ).all())
+        missing = [key for key in keys if key not in existing]
+        if missing:
+            self._insert_missing(conn, missing, owner, expires)
+            existing = dict(conn.execute(
+                select(_leases.c.lease_key, _leases.c.owner).where(_leases.c.lease_key.in_(keys))
+            ).all())
+        return {key for key, holder in existing.items() if holder == owner}
+
+    def heartbeat(self) -> bool:
+        """Renew membership, rebalance and claim shards; True if ownership changed"""
+        started = time.time()
+        now = datetime.now(timezone.utc)
+        expires = now + timedelta(seconds=self.lease_seconds)
+        me = self.worker_id
+
+        with self.engine.begin() as conn:
+            self._claim(conn, [f"worker:{me}"], me, now, expires)
+            members = sorted(conn.execute(
+                select(_leases.c.owner).where(and_(
+                    _leases.c.lease_key.like("worker:%"), _leases.c.expires_at >= now
+                ))
+            ).scalars())
+            if me not in members:
+                members.append(me)
+            desired = self._desired(members)
+
+            # Hand back shards the ring moved elsewhere so the new owner can claim them now
+            released = [f"shard:{s}" for s in self.owned - desired]
+            if released:
+                conn.execute(delete(_leases).where(and_(
+                    _leases.c.lease_key.in_(released), _leases.c.owner == me
+                )))
+
+            held = self._claim(conn, [f"shard:{s}" for s in sorted(desired)], me, now, expires)
+
+        owned = {int(key.split(":", 1)[1]) for key in held}
+        changed = owned != self.owned
+        self.owned = owned
+        self.members = members
+        self._valid_until = started + self.lease_seconds
+        return changed
+
+    def release_all(self):
+        """Drop every lease held by this worker (clean shutdown)"""
+        self.owned = set()
+        self._valid_until = 0.0
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(delete(_leases).where(_leases.c.owner == self.worker_id))
+        except Exception as e:
+            logger.error("Could not release leases for %s: %s", self.worker_id, e)
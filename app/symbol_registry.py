@@ -0,0 +1,115 @@
+# app/symbol_registry.py
+"""
+Registry of every symbol seen on ingest.
+
+The DuckDB `symbols` table holds one row per symbol (exchange, first/last
+seen, stored tick count, last price). It is upserted from each tick batch inside
+the same writer job that inserts the ticks, aggregated per symbol, so it
+never needs a scan of `ticks`. `SymbolRegistry` keeps the same data in
+memory: the ingesting process updates it per tick in O(1), other processes
+reload the table (O(symbols)) when their copy is older than
+`refresh_seconds`. Either way `/symbols` costs O(symbols), not O(history).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+from .prices import Paise
+
+
+@dataclass
+class SymbolInfo:
+    __slots__ = ("symbol", "exchange", "first_seen", "last_seen", "stored_ticks", "last_price")
+
+    symbol: str
+    exchange: str
+    first_seen: datetime
+    last_seen: datetime
+    # Rows in tick history: repeats the change-only filter collapsed are not counted
+    stored_ticks: int
+    last_price: Paise
+
+
+# Upsert from a registered tick batch (`view` has the ticks columns, price in paise)
+UPSERT_SQL = """
+    INSERT INTO symbols (symbol, exchange, first_seen, last_seen, stored_ticks, last_price)
+    SELECT symbol, arg_max(exchange, timestamp), min(timestamp), max(timestamp), count(*),
+           arg_max(price, timestamp) * 0.01
+    FROM {view}
+    GROUP BY symbol
+    ON CONFLICT (symbol) DO UPDATE SET
+        exchange = excluded.exchange,
+        first_seen = least(symbols.first_seen, excluded.first_seen),
+        last_seen = greatest(symbols.last_seen, excluded.last_seen),
+        stored_ticks = symbols.stored_ticks + excluded.stored_ticks,
+        last_price = CASE WHEN excluded.last_seen >= symbols.last_seen
+                          THEN excluded.last_price ELSE symbols.last_price END
+"""
+
+
+class SymbolRegistry:
+    """In-memory copy of the `symbols` table, kept current on ingest"""
+
+    def __init__(self, db, refresh_seconds: float = 5.0):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self._symbols: Dict[str, SymbolInfo] = {}
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        # Set once this process records ticks itself; its copy is then authoritative
+        self.live = False
+
+    def load(self, backfill_sources: List[str] = ()):
+        """Read the table; an empty table is first rebuilt from the given tick sources (one-time)"""
+        if backfill_sources and not self.db.fetchone("SELECT count(*) FROM symbols")[0]:
+            union = " UNION ALL ".join(
+                f"SELECT symbol, exchange, timestamp, price FROM {source}" for source in backfill_sources
+            )
+            self.db.execute(f"""
+                INSERT INTO symbols
+                SELECT symbol, arg_max(exchange, timestamp), min(timestamp), max(timestamp), count(*),
+                       arg_max(price, timestamp)
+                FROM ({union})
+                GROUP BY symbol
+            """)
+        rows = self.db.fetchall("""
+            SELECT symbol, exchange, first_seen, last_seen, stored_ticks, CAST(last_price * 100 AS BIGINT)
+            FROM symbols
+        """)
+        with self._lock:
+            for row in rows:
+                current = self._symbols.get(row[0])
+                # Ticks recorded here but not flushed yet are newer than the table
+                if current is None or not self.live:
+                    self._symbols[row[0]] = SymbolInfo(*row)
+            self._loaded_at = time.monotonic()
+
+    def record(self, symbol: str, price: Paise, timestamp: datetime, exchange: str):
+        """Account one stored tick (the table catches up when the batch is flushed)"""
+        self.live = True
+        info = self._symbols.get(symbol)
+        if info is None:
+            with self._lock:
+                self._symbols[symbol] = SymbolInfo(symbol, exchange, timestamp, timestamp, 1, price)
+            return
+        info.exchange = exchange
+        info.last_seen = timestamp
+        info.stored_ticks += 1
+        info.last_price = price
+
+    def _fresh(self):
+        if not self.live and time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.load()
+
+    def symbols(self) -> List[str]:
+        self._fresh()
+        return list(self._symbols)
+
+    def infos(self) -> List[SymbolInfo]:
+        self._fresh()
+        with self._lock:
+            return sorted(self._symbols.values(), key=lambda info: info.symbol)
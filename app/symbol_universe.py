@@ -0,0 +1,104 @@
+# app/symbol_universe.py
+"""
+The set of symbols the market feeds subscribe to.
+
+Feeds no longer poll a fixed list. The worker subscribes them to the union of
+the symbols its active alert rules reference, the symbols open UI sessions
+watch, and `watch_symbols` from the config. The API process collects UI
+watches from WebSocket "watch" messages (`WatchRegistry`) and serves them on
+/_internal/watched. Whenever rules or watches change, `SymbolUniverse` works
+out the difference and the feeds apply it: new names are fetched from the
+next poll, and names nothing references any more are dropped. Feed cost
+therefore follows demand.
+"""
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# NSE/BSE tickers, Yahoo suffixes (.NS/.BO) and indices (^NSEI); anything else is ignored
+SYMBOL_PATTERN = re.compile(r"^\^?[A-Z0-9&_\-]{1,24}(\.[A-Z]{1,3})?$")
+MAX_WATCHED_PER_CLIENT = 200
+
+
+def normalize_symbols(symbols: Iterable[str]) -> List[str]:
+    """Upper-cased, de-duplicated, well-formed symbols in their given order"""
+    names = (str(symbol).strip().upper() for symbol in symbols)
+    return list(dict.fromkeys(name for name in names if SYMBOL_PATTERN.match(name)))
+
+
+def parse_symbol_list(value: Optional[str]) -> List[str]:
+    """Comma-separated config value -> symbols"""
+    return normalize_symbols(value.split(",")) if value else []
+
+
+def diff_symbols(current: Dict[str, str], names: Iterable[str],
+                 to_feed: Callable[[str], str]) -> Tuple[Dict[str, str], List[str], List[str]]:
+    """New friendly -> feed symbol map for `names`, plus the names added and removed
+
+    Mappings already in `current` are kept; new names go through `to_feed`.
+    """
+    mapping = {name: current.get(name) or to_feed(name) for name in names}
+    added = sorted(mapping.keys() - current.keys())
+    removed = sorted(current.keys() - mapping.keys())
+    return mapping, added, removed
+
+
+class WatchRegistry:
+    """Symbols watched by each connected UI client (API process)"""
+
+    def __init__(self, limit: int = MAX_WATCHED_PER_CLIENT):
+        self.limit = limit
+        self._watches: Dict[Hashable, List[str]] = {}
+
+    def watch(self, client: Hashable, symbols: Iterable[str]) -> List[str]:
+        """Replace what `client` watches; returns the accepted symbols"""
+        accepted = normalize_symbols(symbols)[:self.limit]
+        if accepted:
+            self._watches[client] = accepted
+        else:
+            self._watches.pop(client, None)
+        return accepted
+
+    def forget(self, client: Hashable):
+        self._watches.pop(client, None)
+
+    def symbols(self) -> List[str]:
+        return sorted({symbol for symbols in self._watches.values() for symbol in symbols})
+
+
+class SymbolUniverse:
+    """Union of rule symbols, UI watches and configured symbols (worker process)"""
+
+    def __init__(self, static: Iterable[str] = ()):
+        self.static: Set[str] = set(normalize_symbols(static))
+        self.rule_symbols: Set[str] = set()
+        self.watched: Set[str] = set()
+        self.current: Set[str] = set()
+        self.changes = 0
+
+    def update(self, rule_symbols: Optional[Iterable[str]] = None,
+               watched: Optional[Iterable[str]] = None) -> Tuple[List[str], List[str]]:
+        """Replace either source (None keeps it); returns (added, removed) since the last update"""
+        if rule_symbols is not None:
+            self.rule_symbols = set(rule_symbols)
+        if watched is not None:
+            self.watched = set(normalize_symbols(watched))
+        universe = self.static | self.rule_symbols | self.watched
+        added, removed = sorted(universe - self.current), sorted(self.current - universe)
+        if added or removed:
+            self.current = universe
+            self.changes += 1
+        return added, removed
+
+    def symbols(self) -> List[str]:
+        return sorted(self.current)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "symbols": len(self.current),
+            "from_rules": len(self.rule_symbols),
+            "watched": len(self.watched),
+            "static": len(self.static),
+            "changes": self.changes,
+        }
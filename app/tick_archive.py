@@ -0,0 +1,216 @@
+# app/tick_archive.py
+"""
+Parquet archive for tick history.
+
+Closed trading days are copied out of the DuckDB `ticks` table into a
+Hive-partitioned Parquet tree (`<root>/date=YYYY-MM-DD/symbol=XYZ/*.parquet`)
+and deleted from the hot table in the same transaction, so the DuckDB file
+only holds the last `hot_days` days. Ticks flushed late for an archived day
+land in the same partition as an extra file; `compact()` merges such
+partitions back into one file. Readers union the hot table with
+`scan_sql(...)` and filter on the partition columns, which DuckDB uses to
+skip every other date/symbol directory. Moving a day runs as one job on the
+DuckDB writer thread.
+
+Files are ZSTD-compressed and sorted by time, and store price (paise) and
+volume as the difference from the previous row of the same file (the first
+row holds the absolute values). Consecutive ticks differ by a few paise, so
+those columns shrink to almost nothing; `scan_sql` sums the deltas back per
+file.
+"""
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DELTA_PREFIX = "delta_"
+
+
+def _encode_sql(source: str) -> str:
+    """Contents of one delta-encoded file from `source` (price in paise, volume, timestamp, exchange)"""
+    # Ties on time are broken by the values, so equal keys carry a zero delta whichever comes first
+    return f"""
+        SELECT price - lag(price, 1, 0) OVER w AS price_delta,
+               volume - lag(volume, 1, 0) OVER w AS volume_delta,
+               timestamp, exchange
+        FROM {source}
+        WINDOW w AS (ORDER BY timestamp, price, volume)
+        ORDER BY timestamp, price, volume
+    """
+
+
+def _decode_sql(files: str, where: str = "") -> str:
+    """Subquery over `files` (a read_parquet path or list) with plain ticks columns"""
+    # The filter only touches partition columns, so it is applied before the sums and still prunes files
+    return f"""(
+        SELECT symbol, date,
+               CAST(sum(price_delta) OVER file * 0.01 AS DECIMAL(10, 2)) AS price,
+               CAST(sum(volume_delta) OVER file AS BIGINT) AS volume,
+               timestamp, exchange
+        FROM read_parquet({files}, hive_partitioning = 1, filename = 1, file_row_number = 1)
+        {f"WHERE {where}" if where else ""}
+        WINDOW file AS (PARTITION BY filename ORDER BY file_row_number ROWS UNBOUNDED PRECEDING)
+    )"""
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class TickArchive:
+    """Rolls closed days of ticks out to partitioned Parquet and answers queries over them"""
+
+    def __init__(self, db, root: str, hot_days: int = 1, compact_files: int = 2):
+        self.db = db
+        self.root = root
+        self.hot_days = max(1, hot_days)
+        self.compact_files = max(2, compact_files)
+        # One archive/compaction pass at a time (background loop vs shutdown)
+        self._lock = threading.Lock()
+
+        self.archived_rows = 0
+        self.archived_days = 0
+        self.compacted_partitions = 0
+        self.last_run_ms = 0.0
+
+    @property
+    def pattern(self) -> str:
+        return os.path.join(self.root, "date=*", "symbol=*", "*.parquet")
+
+    def has_files(self) -> bool:
+        return bool(glob.glob(self.pattern))
+
+    def scan_sql(self, where: str = "") -> str:
+        """FROM-clause subquery over every archived file: symbol, date, price, volume, timestamp, exchange
+
+        `where` may only use the partition columns (`symbol`, `date`); other
+        filters go on the outer query. Only call this when `has_files()`.
+        """
+        return _decode_sql(f"'{self.pattern}'", where)
+
+    def cutoff(self, today: Optional[date] = None) -> datetime:
+        """Ticks before this instant belong to closed days that are archived"""
+        today = today or date.today()
+        first_hot = today - timedelta(days=self.hot_days - 1)
+        return datetime(first_hot.year, first_hot.month, first_hot.day)
+
+    def symbols(self) -> Set[str]:
+        """Symbols with archived ticks (from the partition directory names)"""
+        return {
+            os.path.basename(path).split("=", 1)[1]
+            for path in glob.glob(os.path.join(self.root, "date=*", "symbol=*"))
+        }
+
+    def latest_date(self, symbol: str) -> Optional[date]:
+        """Most recent archived day for `symbol`, without opening any file"""
+        days = sorted(
+            os.path.basename(os.path.dirname(path)).split("=", 1)[1]
+            for path in glob.glob(os.path.join(self.root, "date=*", f"symbol={symbol}"))
+        )
+        return date.fromisoformat(days[-1]) if days else None
+
+    def run(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Archive closed days, then compact partitions that collected several files"""
+        with self._lock:
+            started = time.perf_counter()
+            rows = self.archive(today)
+            compacted = self.compact()
+            self.last_run_ms = (time.perf_counter() - started) * 1000
+            return {"archived_rows": rows, "compacted_partitions": compacted}
+
+    def archive(self, today: Optional[date] = None) -> int:
+        """Move every closed day still in the hot table to Parquet; returns the rows moved"""
+        cutoff = self.cutoff(today)
+        days = [row[0] for row in self.db.fetchall("""
+            SELECT DISTINCT CAST(timestamp AS DATE) FROM ticks WHERE timestamp < ? ORDER BY 1
+        """, [cutoff])]
+        moved = 0
+        for day in days:
+            moved += self.db.write(lambda cursor: self._archive_day(cursor, day))
+        if moved:
+            # Let DuckDB reuse the freed blocks so the file stops growing
+            self.db.execute("CHECKPOINT")
+        return moved
+
+    def _archive_day(self, cursor, day: date) -> int:
+        start = datetime(day.year, day.month, day.day)
+        end = start + timedelta(days=1)
+        written = []
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            cursor.execute("""
+                CREATE OR REPLACE TEMP TABLE archive_day AS
+                SELECT symbol, CAST(price * 100 AS BIGINT) AS price, volume, timestamp, exchange
+                FROM ticks
+                WHERE timestamp >= ? AND timestamp < ?
+                ORDER BY symbol, timestamp
+            """, [start, end])
+            rows = cursor.execute("SELECT count(*) FROM archive_day").fetchone()[0]
+            # One plain COPY per symbol: a partitioned COPY may split a partition across
+            # files, which would break the running deltas
+            symbols = [row[0] for row in cursor.execute("SELECT DISTINCT symbol FROM archive_day").fetchall()]
+            for symbol in symbols:
+                partition = os.path.join(self.root, f"date={day.isoformat()}", f"symbol={symbol}")
+                os.makedirs(partition, exist_ok=True)
+                path = os.path.join(partition, f"{DELTA_PREFIX}{uuid.uuid4()}.parquet")
+                source = f"(SELECT * FROM archive_day WHERE symbol = {_sql_string(symbol)})"
+                cursor.execute(f"COPY ({_encode_sql(source)}) TO {_sql_string(path)} (FORMAT PARQUET, COMPRESSION ZSTD)")
+                written.append(path)
+            cursor.execute("DELETE FROM ticks WHERE timestamp >= ? AND timestamp < ?", [start, end])
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            # The rows stay in the hot table; don't leave a second copy in the archive
+            for path in written:
+                os.remove(path)
+            raise
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS archive_day")
+        self.archived_rows += rows
+        self.archived_days += 1
+        logger.info("Archived %d ticks for %s", rows, day)
+        return rows
+
+    def compact(self) -> int:
+        """Merge partitions holding `compact_files` or more files into one file each"""
+        compacted = 0
+        for partition in glob.glob(os.path.join(self.root, "date=*", "symbol=*")):
+            files = sorted(glob.glob(os.path.join(partition, "*.parquet")))
+            if len(files) < self.compact_files:
+                continue
+            try:
+                self._compact_partition(partition, files)
+                compacted += 1
+            except Exception as e:
+                logger.error("Compacting %s failed: %s", partition, e)
+        self.compacted_partitions += compacted
+        return compacted
+
+    def _compact_partition(self, partition: str, files: List[str]):
+        # Written under a name the read glob does not match, then swapped in
+        staging = os.path.join(partition, f"{DELTA_PREFIX}{uuid.uuid4()}.parquet.tmp")
+        decoded = _decode_sql(f"[{', '.join(_sql_string(path) for path in files)}]")
+        source = f"(SELECT CAST(price * 100 AS BIGINT) AS price, volume, timestamp, exchange FROM {decoded})"
+        # Only reads Parquet, so it runs on this thread's cursor rather than the writer
+        self.db.cursor().execute(
+            f"COPY ({_encode_sql(source)}) TO {_sql_string(staging)} (FORMAT PARQUET, COMPRESSION ZSTD)"
+        )
+        os.replace(staging, staging[:-len(".tmp")])
+        for path in files:
+            os.remove(path)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "archived_rows": self.archived_rows,
+            "archived_days": self.archived_days,
+            "compacted_partitions": self.compacted_partitions,
+            "last_run_ms": round(self.last_run_ms, 1),
+        }
@@ -0,0 +1,73 @@
+# app/tick_filter.py
+"""
+Change-only tick ingest.
+
+Polling feeds re-emit a symbol's last trade on every poll while it does not
+trade, so for illiquid names most ticks are copies of the one before. The
+filter stores a tick only when its price, volume or exchange differs from
+the symbol's previous tick. A run of repeats keeps its two endpoints: the
+first tick is stored when it arrives, the latest repeat is held and stored
+just before the next change (or on shutdown), so the stored series still
+shows how long the price stood. Repeats in between are only counted.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .prices import Paise
+
+# (price paise, volume, timestamp, exchange); same shape as MarketDataManager quotes
+Quote = Tuple[Paise, int, datetime, str]
+
+
+def _same_tick(a: Quote, b: Quote) -> bool:
+    return a[0] == b[0] and a[1] == b[1] and a[3] == b[3]
+
+
+class ChangeOnlyFilter:
+    """Decides which ticks reach storage; everything else is a repeat of the previous tick"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        # Last tick offered per symbol, and the latest repeat of its open run (not stored yet)
+        self._last: Dict[str, Quote] = {}
+        self._held: Dict[str, Quote] = {}
+        self._lock = threading.Lock()
+
+        self.offered = 0
+        self.collapsed = 0
+
+    def offer(self, symbol: str, quote: Quote) -> List[Quote]:
+        """Ticks to store for this one, oldest first (empty while it repeats the previous tick)"""
+        if not self.enabled:
+            return [quote]
+        with self._lock:
+            self.offered += 1
+            previous = self._last.get(symbol)
+            self._last[symbol] = quote
+            if previous is not None and _same_tick(previous, quote):
+                if self._held.get(symbol) is not None:
+                    self.collapsed += 1
+                self._held[symbol] = quote
+                return []
+            held = self._held.pop(symbol, None)
+            return [quote] if held is None else [held, quote]
+
+    def held(self, symbol: str) -> Optional[Quote]:
+        """Latest repeat of `symbol`'s open run, not stored yet"""
+        return self._held.get(symbol)
+
+    def drain(self) -> List[Tuple[str, Quote]]:
+        """Take every held run end (shutdown); the runs stay open for further repeats"""
+        with self._lock:
+            held, self._held = self._held, {}
+        return list(held.items())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "offered_ticks": self.offered,
+            "collapsed_ticks": self.collapsed,
+            "held_runs": len(self._held),
+        }
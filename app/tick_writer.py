@@ -0,0 +1,274 @@
+# app/tick_writer.py
+"""
+Buffered bulk writer for DuckDB market data.
+
+`append()` (ticks) and `append_bar()` (closed 1-minute and rollup bars) only push rows
+onto in-memory column buffers, so callers on the event loop never wait on
+DuckDB. A background thread swaps the buffers out once `flush_rows` ticks
+are waiting or `flush_seconds` have passed and hands them to the DuckDB
+writer thread, which loads each table with one DataFrame INSERT ... SELECT. `close()` stops
+the thread and flushes whatever is still buffered; MarketDataManager.close()
+calls it at shutdown, after queueing the open bars and held ticks.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .bars import OHLCV_TABLES, Bar
+from .prices import Paise
+
+logger = logging.getLogger(__name__)
+
+_OHLCV_COLUMNS = (
+    ("symbol", "open_price", "high_price", "low_price", "close_price", "volume", "timestamp", "exchange"),
+    ("open_price", "high_price", "low_price", "close_price"),
+)
+# table -> (columns, columns holding paise that are scaled to DECIMAL on insert)
+TABLES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "ticks": (
+        ("symbol", "price", "volume", "timestamp", "exchange"),
+        ("price",),
+    ),
+    **{table: _OHLCV_COLUMNS for table in OHLCV_TABLES.values()},
+}
+_INT_COLUMNS = {"price", "open_price", "high_price", "low_price", "close_price", "volume"}
+
+
+class _Columns:
+    """Column-wise row buffer for one table (one list per column)"""
+
+    __slots__ = ("table", "data")
+
+    def __init__(self, table: str):
+        self.table = table
+        self.data: Dict[str, list] = {name: [] for name in TABLES[table][0]}
+
+    def __len__(self) -> int:
+        return len(self.data["symbol"])
+
+    def extend(self, other: "_Columns"):
+        for name, values in self.data.items():
+            values.extend(other.data[name])
+
+    def rows_for(self, symbol: str) -> List[dict]:
+        names = list(self.data)
+        return [
+            dict(zip(names, row)) for row in zip(*self.data.values()) if row[0] == symbol
+        ]
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            name: (
+                pd.array(values, dtype="int64") if name in _INT_COLUMNS
+                else pd.to_datetime(values) if name == "timestamp"
+                else values
+            )
+            for name, values in self.data.items()
+        })
+
+    def insert_sql(self, view: str) -> str:
+        columns, scaled = TABLES[self.table]
+        select = ", ".join(f"{name} * 0.01" if name in scaled else name for name in columns)
+        return f"INSERT INTO {self.table} ({', '.join(columns)}) SELECT {select} FROM {view}"
+
+
+class TickWriter:
+    """Accumulates ticks and closed bars in columnar buffers and bulk-loads them on a background thread"""
+
+    def __init__(self, db, flush_rows: int = 5000, flush_seconds: float = 1.0):
+        self.db = db
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._buffers = {table: _Columns(table) for table in TABLES}
+        # Batch being written right now (still visible to readers via pending())
+        self._inflight: Dict[str, _Columns] = {}
+        self._lock = threading.Lock()
+        # Serialises flushes between the background thread and explicit flush()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        # Called at the start of every flush (e.g. to close bars whose minute elapsed)
+        self.before_flush: List[Callable[[], None]] = []
+        # Called on the writer thread as fn(cursor, table, view) after each table's insert,
+        # while the batch is still registered as `view` (same job, so it commits with the rows)
+        self.after_load: List[Callable[[object, str, str], None]] = []
+
+        self.flushes = 0
+        self.flushed_rows = {table: 0 for table in TABLES}
+        self.failed_flushes = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name="tick-writer", daemon=True)
+            self._thread.start()
+
+    def append(self, symbol: str, price: Paise, volume: int, timestamp: datetime, exchange: str = "NSE"):
+        with self._lock:
+            data = self._buffers["ticks"].data
+            data["symbol"].append(symbol)
+            data["price"].append(price)
+            data["volume"].append(volume)
+            data["timestamp"].append(timestamp)
+            data["exchange"].append(exchange)
+            depth = len(data["symbol"])
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self._thread is None:
+            self._ensure_thread()
+        if depth >= self.flush_rows:
+            self._wake.set()
+
+    def append_bar(self, symbol: str, bar: Bar, exchange: str = "NSE", table: str = "ohlcv_1min"):
+        """Queue a closed bar for `table` (ohlcv_1min or one of the rollup tables)"""
+        with self._lock:
+            data = self._buffers[table].data
+            data["symbol"].append(symbol)
+            data["open_price"].append(bar.open_price)
+            data["high_price"].append(bar.high_price)
+            data["low_price"].append(bar.low_price)
+            data["close_price"].append(bar.close_price)
+            data["volume"].append(bar.volume)
+            data["timestamp"].append(bar.start)
+            data["exchange"].append(exchange)
+        if self._thread is None:
+            self._ensure_thread()
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffers["ticks"])
+
+    @property
+    def bar_depth(self) -> int:
+        return len(self._buffers["ohlcv_1min"])
+
+    def pending(self, table: str, symbol: str) -> List[dict]:
+        """Rows for `symbol` not yet visible in DuckDB (buffered or being written)"""
+        with self._lock:
+            rows = []
+            inflight = self._inflight.get(table)
+            if inflight is not None:
+                rows.extend(inflight.rows_for(symbol))
+            rows.extend(self._buffers[table].rows_for(symbol))
+            return rows
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Tick flush failed: %s", e)
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            for hook in self.before_flush:
+                try:
+                    hook()
+                except Exception as e:
+                    logger.error("before_flush hook failed: %s", e)
+
+            with self._lock:
+                batches = {table: buffer for table, buffer in self._buffers.items() if len(buffer)}
+                for table in batches:
+                    self._buffers[table] = _Columns(table)
+                self._inflight = dict(batches)
+            if not batches:
+                return 0
+
+            started = time.perf_counter()
+            written = {}
+            try:
+                self.db.write(lambda cursor: self._load(cursor, batches, written))
+            except Exception:
+                self.failed_flushes += 1
+                # Put unwritten rows back in front of anything appended meanwhile
+                with self._lock:
+                    for table, batch in batches.items():
+                        if table not in written:
+                            batch.extend(self._buffers[table])
+                            self._buffers[table] = batch
+                    self._inflight = {}
+                raise
+            finally:
+                for table, rows in written.items():
+                    self.flushed_rows[table] += rows
+
+            with self._lock:
+                self._inflight = {}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            total = sum(written.values())
+            logger.debug("Flushed %s in %.1fms", written, elapsed_ms)
+            return total
+
+    def _load(self, cursor, batches: Dict[str, _Columns], written: Dict[str, int]):
+        """Writer-thread job: one INSERT ... SELECT per table from a registered DataFrame"""
+        for table, batch in batches.items():
+            view = f"{table}_batch"
+            cursor.register(view, batch.frame())
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                try:
+                    cursor.execute(batch.insert_sql(view))
+                    for hook in self.after_load:
+                        hook(cursor, table, view)
+                    cursor.execute("COMMIT")
+                    # Readers find the rows in DuckDB from here on
+                    with self._lock:
+                        self._inflight.pop(table, None)
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+            finally:
+                cursor.unregister(view)
+            written[table] = len(batch)
+
+    def close(self):
+        """Stop the background thread and flush the remaining rows"""
+        self._stopping = True
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(5.0, self.flush_seconds * 2))
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("Final flush failed, %d ticks / %d bars lost: %s", self.depth, self.bar_depth, e)
+        finally:
+            # A later append starts a fresh thread (worker restarted in-process)
+            self._stopping = False
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "buffer_depth": self.depth,
+            "max_buffer_depth": self.max_depth,
+            "bar_buffer_depth": self.bar_depth,
+            "flushes": self.flushes,
+            "flushed_ticks": self.flushed_rows["ticks"],
+            "flushed_bars": self.flushed_rows["ohlcv_1min"],
+            "flushed_rollups": sum(
+                rows for table, rows in self.flushed_rows.items() if table not in ("ticks", "ohlcv_1min")
+            ),
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+            "max_flush_ms": round(self.max_flush_ms, 1),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 1) if self.flushes else 0.0,
+        }
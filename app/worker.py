@@ -2,27 +2,300 @@
 from __future__ import annotations
 
 import asyncio
+import time
+import uuid
 from decimal import Decimal
 from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import aiohttp
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 
-from .database import SessionLocal
-from .market_feed import start_market_feeds
+from .database import SessionLocal, insert_ignoring_conflicts
+from .market_feed import start_market_feeds, set_feed_symbols
+from .rule_index import RuleIndex, CachedRule, condition_holds, ohlcv_key
+from .bars import BarBook
+from .prices import Paise, to_paise, from_paise, format_paise
+from .sharding import ShardCoordinator, ensure_lease_table
+from .quote_table import QuoteTable
+from .cooldown import CooldownWheel
+from .symbol_universe import SymbolUniverse, parse_symbol_list
+from .rule_changes import (
+    RuleChangeListener, RuleSyncStats, ensure_change_table, latest_version,
+    fetch_changes, change_lag_seconds, record_rule_changes
+)
 from .config import settings
 
+# (symbol, matched rule ids, current value, previous value) for one evaluation
+FireGroup = Tuple[str, List[int], Paise, Optional[Paise]]
+
 
 class AlertWorker:
     """AlertWorker with WORKING alert processing and email sending"""
     
     def __init__(self):
         self.is_running = False
+        self.rule_index = RuleIndex(columnar=settings.batch_evaluation)
+        # Last evaluated price per symbol, used by edge-triggered ("cross") rules
+        self.last_prices: Dict[str, Paise] = {}
+        # Recurring rules that fired recently and must stay quiet for cooldown_minutes
+        self.cooldowns = CooldownWheel()
+        # In-memory OHLCV bars, one aggregator per (symbol, timeframe) used by rules
+        self.bars = BarBook()
+        # Symbol-shard leases when several workers run side by side
+        self.shards = ShardCoordinator() if settings.worker_sharding else None
+        self.rule_sync_stats = RuleSyncStats()
+        # Change ids inside the overlap window that were already applied
+        self._applied_changes: set = set()
+        # Symbols the feed polls: those our rules reference plus what the UI watches
+        self.universe = SymbolUniverse(parse_symbol_list(settings.watch_symbols)) if settings.dynamic_symbols else None
 
     def _new_db_session(self) -> Session:
         """Create fresh DB session"""
         return SessionLocal()
 
+    def _owns(self, symbol: str) -> bool:
+        """True when this worker is responsible for `symbol` (always, unsharded)"""
+        return self.shards is None or self.shards.owns(symbol)
+
+    def _build_rule_index(self):
+        """Load every active rule of our shards (one query) into a fresh RuleIndex
+
+        Returns (index, version). The version is read first so changes that
+        race with the load are replayed by the change stream, never lost.
+        """
+        db = self._new_db_session()
+        try:
+            from .models import AlertRule, User
+
+            version = latest_version(db)
+            rows = db.query(AlertRule).join(User).options(
+                contains_eager(AlertRule.user)
+            ).filter(AlertRule.is_active == True).all()
+
+            index = RuleIndex(columnar=settings.batch_evaluation)
+            index.load(CachedRule.from_model(row) for row in rows if self._owns(row.symbol))
+            return index, version
+        finally:
+            db.close()
+
+    def _install_rule_index(self, index: RuleIndex, version: int):
+        self.rule_index, self.rule_sync_stats.version = index, version
+        self._applied_changes.clear()
+        self.bars.sync(self.rule_index.ohlcv_series())
+        self._sync_universe()
+
+    def _sync_universe(self, watched: Optional[List[str]] = None):
+        """Point the feed at the symbols our rules and the UI need (only the difference is applied)"""
+        if self.universe is None:
+            return
+        self.universe.update(self.rule_index.symbols(), watched)
+        # Shard ownership can move without the universe changing, so always re-filter
+        added, removed = set_feed_symbols(s for s in self.universe.symbols() if self._owns(s))
+        if added or removed:
+            print(f"🔭 Feed symbols: +{len(added)} -{len(removed)} {self.universe.stats()}")
+
+    def load_rules(self):
+        """Replace the resident rule index with the current DB state"""
+        ensure_change_table()
+        self._install_rule_index(*self._build_rule_index())
+        stats = self.rule_index.stats()
+        print(f"📚 Loaded {stats['rules']} active alert rules into memory as {stats['predicates']} "
+              f"distinct predicates (x{stats['dedup_ratio']} dedup, version {self.rule_sync_stats.version})")
+
+    def _stored_prices(self, symbols: Iterable[str]) -> Dict[str, Paise]:
+        """Last known price per symbol: the shared quote table, else our quote cache / stored ticks"""
+        from .market_data import market_data
+        prices = {}
+        for symbol in symbols:
+            shared = market_data.shared_quotes.get(symbol)
+            latest = shared[0] if shared is not None else market_data.get_latest_price_paise(symbol)
+            if latest is not None:
+                prices[symbol] = latest
+        return prices
+
+    def _seed_last_prices(self, prices: Optional[Dict[str, Paise]] = None):
+        """Restore previous prices so crossings survive restarts and shard moves
+
+        Prices already seen live are kept.
+        """
+        try:
+            if prices is None:
+                prices = self._stored_prices(self.rule_index.symbols())
+            for symbol, price in prices.items():
+                self.last_prices.setdefault(symbol, price)
+        except Exception as e:
+            print(f"⚠️ Could not seed last prices: {e}")
+
+    def _restore_cooldowns(self):
+        """Rebuild cooldowns from the last trigger of each rule (the durable checkpoint)"""
+        cooling = {
+            rule.id: rule.cooldown_minutes
+            for rule in self.rule_index.rules.values()
+            if rule.alert_type == "recurring" and rule.cooldown_minutes > 0
+        }
+        if not cooling:
+            return
+
+        db = self._new_db_session()
+        try:
+            from sqlalchemy import func
+            from .models import AlertTrigger
+
+            now = time.time()
+            horizon = datetime.fromtimestamp(now - max(cooling.values()) * 60, timezone.utc)
+            rows = db.query(
+                AlertTrigger.alert_rule_id, func.max(AlertTrigger.triggered_at)
+            ).filter(
+                AlertTrigger.alert_rule_id.in_(cooling.keys()),
+                AlertTrigger.triggered_at >= horizon
+            ).group_by(AlertTrigger.alert_rule_id).all()
+
+            for rule_id, triggered_at in rows:
+                if triggered_at.tzinfo is None:
+                    triggered_at = triggered_at.replace(tzinfo=timezone.utc)
+                until = triggered_at.timestamp() + cooling[rule_id] * 60
+                if until > now:
+                    self.cooldowns.start(rule_id, until)
+            print(f"⏳ Restored {len(self.cooldowns)} rule cooldowns")
+        except Exception as e:
+            print(f"⚠️ Could not restore cooldowns: {e}")
+        finally:
+            db.close()
+
+    def _fetch_rule_deltas(self, version: int):
+        """Read changes newer than `version` plus the rows they touch (worker thread)
+
+        Returns a list of (change_id, lag_seconds, rule_id, CachedRule or None);
+        None means the rule is gone or inactive and must leave the index.
+        """
+        db = self._new_db_session()
+        try:
+            from .models import AlertRule, User
+
+            # Ids below `version` can still appear when transactions commit out of order
+            late = fetch_changes(db, max(0, version - settings.rule_sync_overlap), upto=version)
+            changes = [c for c in late if c.id not in self._applied_changes]
+            changes.extend(fetch_changes(db, version))
+            if not changes:
+                return []
+
+            rule_ids = {c.alert_rule_id for c in changes}
+            rows = db.query(AlertRule).join(User).options(
+                contains_eager(AlertRule.user)
+            ).filter(AlertRule.id.in_(rule_ids)).all()
+            current = {
+                row.id: CachedRule.from_model(row)
+                for row in rows if row.is_active and self._owns(row.symbol)
+            }
+            return [
+                (c.id, change_lag_seconds(c), c.alert_rule_id, current.get(c.alert_rule_id))
+                for c in changes
+            ]
+        finally:
+            db.close()
+
+    def _apply_rule_deltas(self, deltas) -> int:
+        """Apply row-level deltas to the rule index (event loop thread)"""
+        stats = self.rule_sync_stats
+        for change_id, lag, rule_id, rule in deltas:
+            if rule is None:
+                self.rule_index.remove(rule_id)
+                self.cooldowns.cancel(rule_id)
+            else:
+                self.rule_index.upsert(rule)
+            self._applied_changes.add(change_id)
+            stats.version = max(stats.version, change_id)
+            stats.record(lag)
+
+        self.bars.sync(self.rule_index.ohlcv_series())
+        self._sync_universe()
+
+        # Forget applied ids that fell out of the overlap window
+        floor = stats.version - settings.rule_sync_overlap
+        self._applied_changes = {i for i in self._applied_changes if i > floor}
+        return len(deltas)
+
+    async def _rule_sync_loop(self):
+        """Follow the alert_rule_changes stream (NOTIFY wake-ups on PostgreSQL)"""
+        wake = asyncio.Event()
+        listener = RuleChangeListener(wake.set)
+        if listener.start(asyncio.get_running_loop()):
+            print("👂 Listening for alert rule changes via PostgreSQL NOTIFY")
+        try:
+            while self.is_running:
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=settings.rule_sync_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+                try:
+                    deltas = await asyncio.to_thread(
+                        self._fetch_rule_deltas, self.rule_sync_stats.version
+                    )
+                    if deltas and self._apply_rule_deltas(deltas):
+                        print(f"🔁 Applied {len(deltas)} rule changes: {self.rule_sync_stats.snapshot()} "
+                              f"{self.rule_index.stats()}")
+                except Exception as e:
+                    print(f"❌ Rule change sync failed: {e}")
+        finally:
+            listener.stop()
+
+    async def _watch_loop(self):
+        """Follow the symbols open UI sessions watch (collected by the API process)"""
+        reachable = True
+        while self.is_running:
+            try:
+                timeout = aiohttp.ClientTimeout(total=3)
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.get("http://127.0.0.1:8000/_internal/watched") as response:
+                        response.raise_for_status()
+                        watched = (await response.json()).get("symbols", [])
+                self._sync_universe(watched)
+                reachable = True
+            except Exception as e:
+                # Keep the last known watches until the API answers again
+                if reachable:
+                    print(f"⚠️ Could not fetch UI watched symbols: {e}")
+                reachable = False
+            await asyncio.sleep(settings.symbol_watch_seconds)
+
+    async def _metrics_loop(self):
+        """Log tick writer buffer depth and flush latency, and the feeds' request metrics"""
+        from .market_data import market_data
+        from .yahoo_feed import yahoo_feed
+        while self.is_running:
+            await asyncio.sleep(settings.metrics_log_seconds)
+            print(f"📦 Tick writer: {market_data.tick_writer.stats()} Filter: {market_data.tick_filter.stats()} "
+                  f"DuckDB: {market_data.db.stats()}")
+            print(f"🌐 Yahoo: batch {yahoo_feed.quote_client.stats()} tiers {yahoo_feed.tier_memo.stats()}")
+            if yahoo_feed.router is not None:
+                print(f"🛰️ Feed providers: {yahoo_feed.router.stats()}")
+            if yahoo_feed.scheduler is not None:
+                print(f"⏱️ Poll scheduler: {yahoo_feed.scheduler.stats()}")
+            if self.universe is not None:
+                print(f"🔭 Symbol universe: {self.universe.stats()}")
+
+    async def _quote_heartbeat_loop(self):
+        """Keep the shared quote table marked alive, also while no ticks arrive"""
+        from .market_data import market_data
+        while self.is_running:
+            await asyncio.sleep(settings.quote_table_heartbeat_seconds)
+            if market_data.quote_publisher is not None:
+                market_data.quote_publisher.beat()
+
+    async def _archive_loop(self):
+        """Move closed trading days of ticks from DuckDB to the Parquet archive"""
+        from .market_data import market_data
+        while self.is_running:
+            try:
+                result = await asyncio.to_thread(market_data.archive_ticks)
+                if result["archived_rows"] or result["compacted_partitions"]:
+                    print(f"🗄️ Tick archive: {result} {market_data.tick_archive.stats()}")
+            except Exception as e:
+                print(f"❌ Tick archive failed: {e}")
+            await asyncio.sleep(settings.tick_archive_interval_seconds)
+
     async def _broadcast_price_update(self, message: dict):
         """Broadcast to WebSocket clients"""
         try:
@@ -31,126 +304,310 @@ class AlertWorker:
                 async with session.post("http://127.0.0.1:8000/_internal/broadcast", 
                                        json=message) as response:
                     if response.status == 200:
-                        print(f"📡 Broadcasted {message['symbol']} to WebSocket clients")
+                        what = message.get("symbol") or f"{len(message.get('updates', []))} quotes"
+                        print(f"📡 Broadcasted {what} to WebSocket clients")
         except Exception as e:
             print(f"WebSocket broadcast error: {e}")
 
-    async def price_update_callback(self, symbol: str, price, volume, exchange="NSE"):
-        """Handle price updates AND process alerts - THIS IS THE KEY!"""
+    def _store_tick(self, symbol: str, price: Paise, volume_int: int, exchange: str) -> dict:
+        """Store a tick; returns the price_update message for the UI"""
+        try:
+            from .market_data import market_data
+            market_data.store_tick(symbol, price, volume_int, exchange)
+            market_data.update_ohlcv_1min(symbol, price, volume_int, exchange)
+        except Exception as e:
+            print(f"❌ Market data storage error: {e}")
+        return {
+            "type": "price_update",
+            "symbol": symbol,
+            "price": price / 100,
+            "volume": volume_int,
+            "exchange": exchange,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def _ingest_tick(self, symbol: str, price: Paise, volume_int: int, exchange: str):
+        """Store a tick and push it to the UI"""
+        # 1) Store market data
+        message = self._store_tick(symbol, price, volume_int, exchange)
+        # 2) Broadcast to WebSocket (for live UI updates)
+        await self._broadcast_price_update(message)
+
+    async def price_update_callback(self, symbol: str, price: Paise, volume, exchange="NSE"):
+        """Handle price updates AND process alerts - THIS IS THE KEY!
+
+        Feeds deliver `price` as Paise; rupees (float/Decimal) are converted once
+        here, and a bare int is rejected since its unit is unknown.
+        """
         try:
-            price_decimal = Decimal(str(price))
+            price = to_paise(price)
             volume_int = int(volume or 0)
             
-            print(f"📈 Price update: {symbol} = ₹{price_decimal}")
+            print(f"📈 Price update: {symbol} = ₹{format_paise(price)}")
             
-            # 1) Store market data
-            try:
-                from .market_data import market_data
-                market_data.store_tick(symbol, price_decimal, volume_int, exchange)
-                market_data.update_ohlcv_1min(symbol, price_decimal, volume_int, exchange)
-            except Exception as e:
-                print(f"❌ Market data storage error: {e}")
-
-            # 2) Broadcast to WebSocket (for live UI updates)
-            await self._broadcast_price_update({
-                "type": "price_update",
-                "symbol": symbol,
-                "price": float(price_decimal),
-                "volume": volume_int,
-                "exchange": exchange,
-                "timestamp": datetime.now().isoformat()
-            })
+            await self._ingest_tick(symbol, price, volume_int, exchange)
 
             # 3) PROCESS ALERTS - This was completely missing!
-            await self._process_alerts_for_symbol(symbol, price_decimal)
+            await self._process_alerts_for_symbol(symbol, price)
+            await self._process_bar_alerts(symbol, price, volume_int)
 
         except Exception as e:
             print(f"❌ Price callback error: {e}")
 
-    async def _process_alerts_for_symbol(self, symbol: str, current_price: Decimal):
-        """Process all alerts for a symbol - MAIN ALERT LOGIC"""
+    async def price_batch_callback(self, quotes: List[Tuple[str, Paise, int, str]]):
+        """Handle a whole poll cycle: ingest every quote, then evaluate all rules in one pass
+
+        The cycle's price updates reach the UI as one batched broadcast.
+        """
+        snapshot: Dict[str, Paise] = {}
+        volumes: Dict[str, int] = {}
+        updates: List[dict] = []
+        for symbol, price, volume, exchange in quotes:
+            try:
+                price = to_paise(price)
+                print(f"📈 Price update: {symbol} = ₹{format_paise(price)}")
+                updates.append(self._store_tick(symbol, price, int(volume or 0), exchange))
+                snapshot[symbol] = price
+                volumes[symbol] = int(volume or 0)
+            except Exception as e:
+                print(f"❌ Price callback error for {symbol}: {e}")
+        if updates:
+            await self._broadcast_price_update({"type": "price_batch", "updates": updates})
+
+        try:
+            # Tick and bar rules of the whole cycle are fired (and persisted) as one batch
+            groups = self._match_snapshot(snapshot)
+            for symbol, price in snapshot.items():
+                groups += self._match_bars(symbol, price, volumes[symbol])
+            await self._fire_batch(groups)
+        except Exception as e:
+            print(f"❌ Batch alert evaluation error: {e}")
+
+    def _match_snapshot(self, snapshot: Dict[str, Paise]) -> List[FireGroup]:
+        """Evaluate every active rule against one poll cycle's quotes at once"""
+        previous = {s: self.last_prices[s] for s in snapshot if s in self.last_prices}
+        self.last_prices.update(snapshot)
+
+        hits = self.rule_index.match_snapshot_ids(snapshot, previous)
+        by_symbol: Dict[str, List[int]] = {}
+        for rule_id in hits:
+            rule = self.rule_index.get(rule_id)
+            if rule is not None:
+                by_symbol.setdefault(rule.symbol, []).append(rule_id)
+        return [
+            (symbol, rule_ids, snapshot[symbol], previous.get(symbol))
+            for symbol, rule_ids in by_symbol.items()
+        ]
+
+    async def _process_alert_snapshot(self, snapshot: Dict[str, Paise]):
+        await self._fire_batch(self._match_snapshot(snapshot))
+
+    async def _process_alerts_for_symbol(self, symbol: str, current_price: Paise):
+        """Process alerts for a symbol - MAIN ALERT LOGIC
+
+        Matching runs against the in-memory RuleIndex; the database is only
+        touched when at least one rule fires.
+        """
+        previous_price = self.last_prices.get(symbol)
+        self.last_prices[symbol] = current_price
+
+        hits = self.rule_index.match_ids(symbol, current_price)
+        if previous_price is not None:
+            hits += self.rule_index.match_crossing_ids(symbol, previous_price, current_price)
+        if not hits:
+            return
+
+        await self._fire_rules(symbol, hits, current_price, previous_price)
+
+    def _match_bars(self, symbol: str, price: Paise, volume: int) -> List[FireGroup]:
+        """Evaluate OHLCV rules against in-memory bars (no DuckDB reads per tick)
+
+        high/low rules run intra-bar whenever the extreme moves; open/close/
+        volume rules run once when the bar closes.
+        """
+        groups: List[FireGroup] = []
+        for timeframe, column, value, previous in self.bars.update(symbol, price, volume):
+            key = ohlcv_key(symbol, timeframe, column)
+            hits = self.rule_index.match_ids(key, value)
+            if previous is not None:
+                hits += self.rule_index.match_crossing_ids(key, previous, value)
+            if hits:
+                groups.append((symbol, hits, value, previous))
+        return groups
+
+    async def _process_bar_alerts(self, symbol: str, price: Paise, volume: int):
+        await self._fire_batch(self._match_bars(symbol, price, volume))
+
+    async def _fire_rules(self, symbol: str, hits: List[int], current_price: Paise,
+                          previous_price: Optional[Paise]):
+        """Send emails / record triggers for rules the index matched"""
+        await self._fire_batch([(symbol, hits, current_price, previous_price)])
+
+    async def _fire_batch(self, groups: List[FireGroup]):
+        """Fire every rule matched in one evaluation batch
+
+        The database sees one SELECT of the matched rules, one transaction with
+        a multi-row trigger INSERT plus a single one-shot UPDATE ... IN (...),
+        and one UPDATE marking the emails sent, however many rules fire.
+        """
+        if not groups:
+            return
+        now = time.time()
+        for rule_id in self.cooldowns.advance(now):
+            print(f"   🔔 Alert {rule_id} re-armed after cooldown")
+
+        pending: Dict[int, Tuple[Paise, Optional[Paise]]] = {}
+        for symbol, hits, current_price, previous_price in groups:
+            if not self._owns(symbol):
+                # Shard lease lost or moved since the tick was fetched
+                continue
+            for rule_id in hits:
+                if not self.cooldowns.active(rule_id, now):
+                    pending[rule_id] = (current_price, previous_price)
+        if not pending:
+            return
+
         db = self._new_db_session()
         try:
-            from .models import AlertRule, AlertTrigger, User
-            
-            # Get all active alerts for this symbol
-            alerts = db.query(AlertRule).join(User).filter(
-                AlertRule.symbol == symbol,
+            from .models import AlertRule, User
+
+            # Re-read only the rules that fired
+            alerts = db.query(AlertRule).join(User).options(
+                contains_eager(AlertRule.user)
+            ).filter(
+                AlertRule.id.in_(list(pending)),
                 AlertRule.is_active == True
             ).all()
-            
-            if len(alerts) == 0:
-                return
-                
-            print(f"🔍 Checking {len(alerts)} alerts for {symbol} at ₹{current_price}")
-            
+
+            # Rules deleted/deactivated since the index was built
+            for stale_id in set(pending) - {alert.id for alert in alerts}:
+                self.rule_index.remove(stale_id)
+
+            # Detached snapshots: committing below expires the ORM rows
+            fired: List[Tuple[CachedRule, Paise]] = []
             for alert in alerts:
-                try:
-                    # Check if alert condition is met
-                    should_trigger = self._check_alert_condition(alert, current_price)
-                    
-                    if should_trigger:
-                        print(f"🚨 ALERT TRIGGERED: {alert.symbol} {alert.condition_type} ₹{alert.target_price}")
-                        print(f"   Current price: ₹{current_price}")
-                        print(f"   Sending email to: {alert.user.email}")
-                        
-                        # Send email and create trigger record
-                        await self._send_alert_email(alert, current_price, db)
-                        
-                        # Disable one-shot alerts after triggering
-                        if alert.alert_type == "one_shot":
-                            alert.is_active = False
-                            db.commit()
-                            print(f"   🔄 One-shot alert disabled")
-                            
-                except Exception as e:
-                    print(f"❌ Error processing alert {alert.id}: {e}")
-                    db.rollback()
-                    
+                current_price, previous_price = pending[alert.id]
+                rule = CachedRule.from_model(alert)
+                # Check against the DB row in case the cached copy is stale
+                if self._check_alert_condition(alert, current_price, previous_price):
+                    fired.append((rule, current_price))
+                else:
+                    self.rule_index.upsert(rule)
+            if not fired:
+                return
+
+            print(f"🔍 {len(fired)} alerts triggered across {len({a.symbol for a, _ in fired})} symbols")
+            batch_id = uuid.uuid4().hex
+            self._persist_triggers(db, fired, batch_id)
+
+            for alert, current_price in fired:
+                # Recurring alerts go quiet for cooldown_minutes
+                if alert.alert_type == "recurring" and (alert.cooldown_minutes or 0) > 0:
+                    self.cooldowns.start(alert.id, now + alert.cooldown_minutes * 60)
+                # One-shot alerts were disabled in the same transaction as their trigger
+                if alert.alert_type == "one_shot":
+                    self.rule_index.remove(alert.id)
+
+            sent = []
+            for alert, current_price in fired:
+                print(f"🚨 ALERT TRIGGERED: {alert.symbol} {alert.condition_type} ₹{alert.target_price}")
+                print(f"   Current price: ₹{format_paise(current_price)}")
+                if await self._send_alert_email(alert, from_paise(current_price)):
+                    sent.append(alert.id)
+            self._mark_emails_sent(db, batch_id, sent, all_sent=len(sent) == len(fired))
+
         except Exception as e:
             print(f"❌ Error in alert processing: {e}")
+            db.rollback()
         finally:
             db.close()
 
-    def _check_alert_condition(self, alert, current_price: Decimal) -> bool:
-        """Check if alert condition is triggered"""
-        target = alert.target_price
-        condition = alert.condition_type
-        
-        if condition == ">" and current_price > target:
-            return True
-        elif condition == ">=" and current_price >= target:
-            return True
-        elif condition == "<" and current_price < target:
-            return True
-        elif condition == "<=" and current_price <= target:
-            return True
-        elif condition == "==" and abs(current_price - target) < Decimal("0.01"):
-            return True
-        
-        return False
+    def _persist_triggers(self, db: Session, fired, batch_id: str):
+        """Write one batch's trigger rows and one-shot deactivations in a single transaction
+
+        Rows carry the batch id under a unique (alert_rule_id, batch_id) index
+        and are inserted with ON CONFLICT DO NOTHING, so retrying the batch
+        after a failed or unacknowledged commit never duplicates triggers.
+        """
+        from sqlalchemy import insert, update
+        from .models import AlertRule, AlertTrigger
+
+        triggered_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "alert_rule_id": alert.id,
+                "triggered_price": from_paise(current_price),
+                "triggered_at": triggered_at,
+                "email_sent": False,
+                "batch_id": batch_id,
+            }
+            for alert, current_price in fired
+        ]
+        one_shots = [alert.id for alert, _ in fired if alert.alert_type == "one_shot"]
+        statement = insert_ignoring_conflicts(
+            db.get_bind().dialect.name, AlertTrigger.__table__, ["alert_rule_id", "batch_id"]
+        )
+        if statement is None:
+            statement = insert(AlertTrigger.__table__)
 
-    async def _send_alert_email(self, alert, triggered_price: Decimal, db: Session):
-        """Send alert email with full error handling"""
+        attempts = max(1, settings.trigger_write_attempts)
+        for attempt in range(1, attempts + 1):
+            try:
+                db.execute(statement, rows)
+                if one_shots:
+                    db.execute(
+                        update(AlertRule.__table__)
+                        .where(AlertRule.__table__.c.id.in_(one_shots))
+                        .values(is_active=False)
+                    )
+                    record_rule_changes(db, one_shots)
+                db.commit()
+                break
+            except Exception as e:
+                db.rollback()
+                if attempt == attempts:
+                    raise
+                print(f"⚠️ Trigger batch {batch_id} write failed ({e}), retrying {attempt}/{attempts - 1}")
+        print(f"💾 Recorded {len(rows)} triggers, disabled {len(one_shots)} one-shot alerts")
+
+    def _mark_emails_sent(self, db: Session, batch_id: str, rule_ids: List[int], all_sent: bool):
+        """Flag the batch's delivered emails with one UPDATE"""
+        if not rule_ids:
+            return
+        from sqlalchemy import update
+        from .models import AlertTrigger
+
+        triggers = AlertTrigger.__table__
+        statement = update(triggers).where(triggers.c.batch_id == batch_id)
+        if not all_sent:
+            statement = statement.where(triggers.c.alert_rule_id.in_(rule_ids))
+        db.execute(statement.values(email_sent=True, email_sent_at=datetime.now(timezone.utc)))
+        db.commit()
+
+    def _check_alert_condition(self, alert, current_price: Paise, previous_price: Optional[Paise] = None) -> bool:
+        """Check if alert condition is triggered (prices in paise)
+
+        Level rules fire whenever the condition holds; "cross" rules only when
+        it was false at the previous price and is true now.
+        """
+        target = to_paise(alert.target_price)
+        if not condition_holds(alert.condition_type, target, current_price):
+            return False
+        if (getattr(alert, "trigger_mode", None) or "level") == "cross":
+            return previous_price is not None and not condition_holds(
+                alert.condition_type, target, previous_price
+            )
+        return True
+
+    async def _send_alert_email(self, alert: CachedRule, triggered_price: Decimal) -> bool:
+        """Send alert email with full error handling; True when delivered"""
         try:
             from .email_service import send_alert_email
-            from .models import AlertTrigger
             
-            print(f"📧 SENDING ALERT EMAIL to {alert.user.email}...")
+            print(f"📧 SENDING ALERT EMAIL to {alert.email}...")
             
-            # Create trigger record first
-            trigger = AlertTrigger(
-                alert_rule_id=alert.id,
-                triggered_price=triggered_price,
-                triggered_at=datetime.now(timezone.utc),
-                email_sent=False
-            )
-            db.add(trigger)
-            db.flush()  # Get trigger ID
-            
-            # Send the email
             send_alert_email(
-                to_email=alert.user.email,
+                to_email=alert.email,
                 symbol=alert.symbol,
                 condition_type=alert.condition_type,
                 target_price=alert.target_price,
@@ -161,31 +618,74 @@ class AlertWorker:
                 ohlcv_timeframe_minutes=alert.ohlcv_timeframe_minutes or 1
             )
             
-            # Mark as sent
-            trigger.email_sent = True
-            trigger.email_sent_at = datetime.now(timezone.utc)
-            db.commit()
-            
             print(f"✅ ALERT EMAIL SENT SUCCESSFULLY!")
-            print(f"   To: {alert.user.email}")
+            print(f"   To: {alert.email}")
             print(f"   Alert: {alert.symbol} {alert.condition_type} ₹{alert.target_price}")
             print(f"   Triggered at: ₹{triggered_price}")
+            return True
             
         except Exception as e:
             print(f"❌ EMAIL SEND FAILED: {e}")
-            print(f"   Alert ID: {alert.id}, User: {alert.user.email}")
-            
-            # Still commit trigger record even if email fails
+            print(f"   Alert ID: {alert.id}, User: {alert.email}")
+            # The trigger row is already committed (email_sent stays False)
+            return False
+
+    def _join_shards(self):
+        """Register this worker and claim its first shards before loading rules"""
+        if self.shards is None:
+            return
+        ensure_lease_table()
+        self.shards.heartbeat()
+        print(f"🧩 Worker {self.shards.worker_id} owns {len(self.shards.owned)}/"
+              f"{self.shards.num_shards} shards ({len(self.shards.members)} workers)")
+
+    def _open_quote_table(self):
+        """Publish latest quotes to the memory-mapped table the API processes read"""
+        from .market_data import market_data
+        path = settings.quote_table_path
+        if self.shards is not None:
+            # One writer per file; readers merge <path>* and keep the newest quote
+            path = f"{path}.{self.shards.worker_id}"
+        try:
+            market_data.publish_quotes(path, settings.quote_table_capacity)
+            print(f"🗂️ Publishing latest quotes to {path}")
+            # Files of workers that exited without cleaning up
+            for stale in QuoteTable.remove_stale(settings.quote_table_path, settings.quote_table_stale_seconds, path):
+                print(f"🧹 Removed stale quote table {stale}")
+        except Exception as e:
+            print(f"❌ Shared quote table unavailable ({e}); API falls back to broadcasts")
+
+    async def _shard_loop(self):
+        """Renew shard leases; reload our slice of the rules when ownership moves"""
+        while self.is_running:
+            await asyncio.sleep(settings.shard_heartbeat_seconds)
             try:
-                db.commit()
-            except:
-                db.rollback()
+                if not await asyncio.to_thread(self.shards.heartbeat):
+                    continue
+                print(f"🧩 Rebalanced: {len(self.shards.owned)}/{self.shards.num_shards} shards "
+                      f"across {len(self.shards.members)} workers")
+                self._install_rule_index(*await asyncio.to_thread(self._build_rule_index))
+                self._restore_cooldowns()
+                # A released symbol's price goes stale; an acquired one needs its previous price
+                for symbol in [s for s in self.last_prices if not self._owns(s)]:
+                    del self.last_prices[symbol]
+                acquired = [s for s in self.rule_index.symbols() if s not in self.last_prices]
+                self._seed_last_prices(await asyncio.to_thread(self._stored_prices, acquired))
+            except Exception as e:
+                print(f"❌ Shard heartbeat failed: {e}")
+
+    def _threshold_distance(self, symbol: str, price: Paise) -> Optional[Paise]:
+        """Distance to the nearest active rule threshold (drives the feed's poll scheduler)"""
+        return self.rule_index.threshold_distance(symbol, price)
 
     async def start_market_feed(self):
         """Start market data feed"""
         print("🚀 Starting market data feed with alert processing...")
         try:
-            await start_market_feeds(self.price_update_callback)
+            batch_callback = self.price_batch_callback if settings.batch_evaluation else None
+            symbol_filter = self._owns if self.shards is not None else None
+            await start_market_feeds(self.price_update_callback, batch_callback, symbol_filter,
+                                     self._threshold_distance)
         except Exception as e:
             print(f"❌ Market feed startup failed: {e}")
             raise
@@ -195,17 +695,46 @@ class AlertWorker:
         self.is_running = True
         print("🎯 Starting AlertWorker with FULL ALERT PROCESSING + EMAIL SENDING")
         
+        tasks = []
         try:
+            self._join_shards()
+            self._open_quote_table()
+            # Bars a previous run left open, in one job before the first tick arrives
+            from .market_data import market_data
+            await asyncio.to_thread(market_data.resume_bars)
+            self.load_rules()
+            self._seed_last_prices()
+            self._restore_cooldowns()
+            tasks.append(asyncio.create_task(self._rule_sync_loop()))
+            tasks.append(asyncio.create_task(self._metrics_loop()))
+            tasks.append(asyncio.create_task(self._archive_loop()))
+            tasks.append(asyncio.create_task(self._quote_heartbeat_loop()))
+            if self.universe is not None:
+                tasks.append(asyncio.create_task(self._watch_loop()))
+            if self.shards is not None:
+                tasks.append(asyncio.create_task(self._shard_loop()))
             await self.start_market_feed()
         except Exception as e:
             print(f"❌ AlertWorker error: {e}")
         finally:
+            for task in tasks:
+                task.cancel()
             self.stop()
 
     def stop(self):
         """Stop the worker"""
         print("🛑 Stopping AlertWorker...")
         self.is_running = False
+        try:
+            # Nothing buffered may be lost on shutdown: open bars, held run ends, then the writer
+            from .market_data import market_data
+            market_data.close()
+            print(f"💾 Tick writer flushed: {market_data.tick_writer.stats()}")
+        except Exception as e:
+            print(f"❌ Final tick flush failed: {e}")
+        if self.shards is not None and self.shards.owned:
+            # Let the remaining workers pick up our shards right away
+            self.shards.release_all()
 
 
 # Global worker instance
@@ -3,34 +3,60 @@ from __future__ import annotations
 import asyncio
 import inspect
 import logging
+import time
 from datetime import datetime, timezone
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Callable, Dict, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import yfinance as yf
 
-logger = logging.getLogger(__name__)
-
+from .config import settings
+from .feed_providers import FeedQuote, FeedRouter
+from .fetch_tiers import FetchTierMemo
+from .market_calendar import MarketCalendar
+from .poll_scheduler import PollScheduler
+from .prices import Paise, format_paise, optional_paise
+from .symbol_universe import diff_symbols
+from .yahoo_quotes import YahooQuoteClient
 
-def _q2(value) -> Optional[Decimal]:
-    if value is None:
-        return None
-    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+logger = logging.getLogger(__name__)
 
 
 def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def yahoo_symbol(name: str) -> str:
+    """Yahoo ticker for an NSE symbol; names with a suffix or index names pass through"""
+    return name if "." in name or name.startswith("^") else f"{name}.NS"
+
+
 class YahooFinanceFeed:
     """
-    Robust Yahoo Finance poller with freshness checks:
+    Robust Yahoo Finance poller with freshness checks.
+
+    By default a poll cycle is a few multi-symbol quote requests (see
+    YahooQuoteClient). Symbols whose request failed, or every symbol when
+    batching is off, go through the per-symbol path:
       1) fast_info.last_price (or dict keys)
       2) info['regularMarketPrice'] / 'currentPrice'
       3) last 1m bar Close if bar is fresh (<= freshness_secs)
-    Emits only fresh prices to avoid stale updates.
+    Emits only fresh prices to avoid stale updates. `tier_memo` remembers
+    which of these works per symbol and breaks circuits on failing ones.
+
+    With adaptive polling each symbol is polled when `scheduler` says it is
+    due (sooner near an alert threshold or when volatile), and with
+    `calendar` set nothing is polled outside NSE sessions.
+
+    `symbols` starts as a fixed NIFTY list; the worker replaces it through
+    set_symbols() with the symbols its rules and the UI need.
+
+    The poll loop lives here whatever the data comes from: with a `router`
+    installed, each cycle is fetched from all configured providers (this
+    feed's own fetch_quotes() being one of them), see app.feed_providers.
     """
 
+    name = "yahoo"
+
     def __init__(self):
         self.symbols: Dict[str, str] = {
             "RELIANCE": "RELIANCE.NS",
@@ -45,14 +71,55 @@ class YahooFinanceFeed:
             "KOTAKBANK": "KOTAKBANK.NS",
         }
         self.price_callback: Optional[Callable] = None
+        # Receives the whole poll cycle as [(symbol, price_paise, volume, exchange), ...]
+        self.batch_callback: Optional[Callable] = None
+        # Optional predicate restricting which symbols this process polls (worker shards)
+        self.symbol_filter: Optional[Callable[[str], bool]] = None
         self.is_running = False
         self.poll_seconds = 30
         # Treat bars newer than this threshold as “live enough”
         self.freshness_secs = 90
+        self.batch_fetch = settings.yahoo_batch_fetch
+        self.quote_client = YahooQuoteClient(
+            settings.yahoo_batch_size, settings.yahoo_max_connections, settings.yahoo_timeout_seconds
+        )
+        self._tiers = {
+            "fast_info": self._from_fast_info,
+            "info": self._from_info,
+            "minute_bar": self._from_minute_bar,
+        }
+        self.tier_memo = FetchTierMemo(
+            self._tiers, settings.yahoo_breaker_failures,
+            settings.yahoo_breaker_open_seconds, settings.yahoo_breaker_max_open_seconds,
+        )
+        self.scheduler: Optional[PollScheduler] = None
+        if settings.adaptive_polling:
+            self.scheduler = PollScheduler(
+                settings.poll_min_seconds, settings.poll_base_seconds, settings.poll_max_seconds,
+                settings.poll_volatility_z,
+            )
+        self.calendar: Optional[MarketCalendar] = (
+            MarketCalendar.nse(settings.nse_holidays_file) if settings.market_hours_only else None
+        )
+        self.router: Optional[FeedRouter] = None
 
     def set_price_callback(self, callback: Callable):
         self.price_callback = callback
 
+    def set_batch_callback(self, callback: Callable):
+        self.batch_callback = callback
+
+    def set_symbol_filter(self, symbol_filter: Optional[Callable[[str], bool]]):
+        self.symbol_filter = symbol_filter
+
+    def set_symbols(self, names: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Poll exactly `names` from the next cycle on; returns (added, removed)"""
+        # Swapped whole, so a poll cycle in flight keeps iterating the old map
+        self.symbols, added, removed = diff_symbols(self.symbols, names, yahoo_symbol)
+        for name in removed:
+            self.tier_memo.forget(name)
+        return added, removed
+
     async def _invoke_callback(self, *args):
         if not self.price_callback:
             return
@@ -63,99 +130,203 @@ class YahooFinanceFeed:
             loop = asyncio.get_running_loop()
             await loop.run_in_executor(None, cb, *args)
 
-    def _fetch_sync(self, friendly: str, y_sym: str) -> Tuple[str, Optional[Decimal], int]:
-        """
-        Return (name, price_decimal_or_None, volume_int).
-        Only returns a value considered 'fresh'; otherwise (name, None, 0).
-        """
-        t = yf.Ticker(y_sym)
-
-        # 1) fast_info
-        price = None
-        volume = 0
+    def _from_fast_info(self, t, y_sym: str) -> Optional[Tuple[float, int]]:
+        """Tier 1: fast_info.last_price (one chart request)"""
         fi = getattr(t, "fast_info", None)
-        if fi is not None:
-            try:
-                # attribute-style
-                price = getattr(fi, "last_price", None)
-                if price is None and isinstance(fi, dict):
-                    # dict-style across yfinance versions
-                    price = fi.get("last_price") or fi.get("lastPrice")
-                if isinstance(fi, dict):
-                    volume = int(fi.get("last_volume") or fi.get("lastVolume") or 0)
-                else:
-                    volume = int(getattr(fi, "last_volume", 0) or 0)
-            except Exception:
-                price = None
-                volume = 0
-
-        # 2) info fallback (may be delayed)
+        if fi is None:
+            return None
+        # attribute-style
+        price = getattr(fi, "last_price", None)
+        if price is None and isinstance(fi, dict):
+            # dict-style across yfinance versions
+            price = fi.get("last_price") or fi.get("lastPrice")
         if price is None:
-            try:
-                info = t.info or {}
-                price = info.get("regularMarketPrice") or info.get("currentPrice")
-                volume = int(info.get("regularMarketVolume") or info.get("volume") or 0)
-            except Exception:
-                price = None
+            return None
+        if isinstance(fi, dict):
+            volume = int(fi.get("last_volume") or fi.get("lastVolume") or 0)
+        else:
+            volume = int(getattr(fi, "last_volume", 0) or 0)
+        return price, volume
 
-        # If we got a number, emit it; still may be delayed but better than nothing
-        if price is not None:
-            return friendly, _q2(price), volume
+    def _from_info(self, t, y_sym: str) -> Optional[Tuple[float, int]]:
+        """Tier 2: info['regularMarketPrice'] / 'currentPrice' (heavy, may be delayed)"""
+        info = t.info or {}
+        price = info.get("regularMarketPrice") or info.get("currentPrice")
+        if price is None:
+            return None
+        return price, int(info.get("regularMarketVolume") or info.get("volume") or 0)
 
-        # 3) last 1-minute bar as a fresh snapshot
-        try:
-            # Include pre/post in case of extended sessions; NSE typically regular
-            df = yf.download(y_sym, period="1d", interval="1m", prepost=True, progress=False)
-            if df is not None and not df.empty and "Close" in df.columns:
-                last_ts = df.index[-1].to_pydatetime()
-                # Ensure timezone-aware comparison
-                if last_ts.tzinfo is None:
-                    last_ts = last_ts.replace(tzinfo=timezone.utc)
-                age = (_utc_now() - last_ts).total_seconds()
-                if age <= self.freshness_secs:
-                    last_close = float(df["Close"].iloc[-1])
-                    last_vol = int(df["Volume"].iloc[-1] if "Volume" in df.columns else 0)
-                    return friendly, _q2(last_close), last_vol
-                else:
-                    logger.debug("Stale 1m bar for %s (age=%.1fs), suppressing", friendly, age)
-        except Exception as e:
-            logger.error("1m fallback error for %s: %s", friendly, e)
+    def _from_minute_bar(self, t, y_sym: str) -> Optional[Tuple[float, int]]:
+        """Tier 3: last 1-minute bar as a fresh snapshot, if no older than freshness_secs"""
+        # Include pre/post in case of extended sessions; NSE typically regular
+        df = yf.download(y_sym, period="1d", interval="1m", prepost=True, progress=False)
+        if df is None or df.empty or "Close" not in df.columns:
+            return None
+        last_ts = df.index[-1].to_pydatetime()
+        # Ensure timezone-aware comparison
+        if last_ts.tzinfo is None:
+            last_ts = last_ts.replace(tzinfo=timezone.utc)
+        age = (_utc_now() - last_ts).total_seconds()
+        if age > self.freshness_secs:
+            logger.debug("Stale 1m bar for %s (age=%.1fs), suppressing", y_sym, age)
+            return None
+        last_close = float(df["Close"].iloc[-1])
+        last_vol = int(df["Volume"].iloc[-1] if "Volume" in df.columns else 0)
+        return last_close, last_vol
+
+    def _fetch_sync(self, friendly: str, y_sym: str) -> FeedQuote:
+        """
+        Return (name, price_paise_or_None, volume_int, "NSE", None).
+        Only returns a value considered 'fresh'; otherwise (name, None, 0, ...).
+        Tiers are tried in the order `tier_memo` gives for the symbol.
+        """
+        t = yf.Ticker(y_sym)
+        for tier in self.tier_memo.order(friendly):
+            started = time.perf_counter()
+            try:
+                result = self._tiers[tier](t, y_sym)
+            except Exception as e:
+                logger.debug("%s failed for %s: %s", tier, friendly, e)
+                result = None
+            if self.tier_memo.record(friendly, tier, result is not None, time.perf_counter() - started):
+                logger.warning("Yahoo %s keeps failing for %s; skipping it for now", tier, friendly)
+            if result is not None:
+                price, volume = result
+                return friendly, optional_paise(price), volume, "NSE", None
 
         # Nothing fresh
-        return friendly, None, 0
+        return friendly, None, 0, "NSE", None
 
     async def _fetch_one(self, friendly: str, y_sym: str):
         try:
             return await asyncio.to_thread(self._fetch_sync, friendly, y_sym)
         except Exception as e:
             logger.error("Fetch error for %s: %s", friendly, e)
-            return friendly, None, 0
+            return friendly, None, 0, "NSE", None
+
+    async def _fetch_batched(self, wanted: Dict[str, str]) -> List[FeedQuote]:
+        """Whole-universe fetch in chunked quote requests; failed chunks fall back per symbol"""
+        try:
+            quotes, failed = await self.quote_client.fetch(list(wanted.values()))
+        except Exception as e:
+            logger.error("Batched Yahoo fetch failed: %s", e)
+            return await asyncio.gather(*(self._fetch_one(f, y) for f, y in wanted.items()))
+        friendly = {y: f for f, y in wanted.items()}
+        quotes = quotes[quotes.index.isin(list(friendly))]
+        # tolist() hands back plain ints; the int64 column is paise already
+        results = [
+            (name, Paise(price), volume, "NSE", datetime.fromtimestamp(at, timezone.utc) if at else None)
+            for name, price, volume, at in zip(
+                quotes.index.map(friendly).tolist(), quotes["price"].tolist(),
+                quotes["volume"].tolist(), quotes["time"].tolist(),
+            )
+        ]
+        if failed:
+            results += await asyncio.gather(*(self._fetch_one(friendly[y], y) for y in failed))
+        return results
+
+    def _wanted(self, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """friendly -> Yahoo symbol for `names` (default: all) this process polls"""
+        if names is None:
+            names = self.symbols
+        return {
+            f: self.symbols[f] for f in names
+            if f in self.symbols and (self.symbol_filter is None or self.symbol_filter(f))
+        }
 
     async def fetch_all_prices(self):
-        tasks = [self._fetch_one(f, y) for f, y in self.symbols.items()]
-        results = await asyncio.gather(*tasks, return_exceptions=False)
-        for friendly, price, volume in results:
-            if price is None:
-                # Explicitly skip stale values to avoid “wrong” price updates
-                continue
+        await self.fetch_prices()
+
+    async def fetch_quotes(self, names: Optional[Iterable[str]] = None) -> List[FeedQuote]:
+        """Quotes for `names` (default: every symbol) straight from Yahoo; None price when not fresh"""
+        wanted = self._wanted(names)
+        if self.batch_fetch:
+            return await self._fetch_batched(wanted)
+        return list(await asyncio.gather(*(self._fetch_one(f, y) for f, y in wanted.items())))
+
+    async def fetch_prices(self, names: Optional[Iterable[str]] = None) -> List[FeedQuote]:
+        """Fetch `names` (default: every symbol), hand fresh quotes to the callbacks, return all results"""
+        if self.router is not None:
+            results = await self.router.fetch(list(self._wanted(names)))
+            # Same exchange tick from two providers (or two polls) is delivered once
+            fresh = self.router.unseen(results)
+        else:
+            results = await self.fetch_quotes(names)
+            fresh = [quote for quote in results if quote[1] is not None]
+
+        if self.batch_callback is not None:
+            # Explicitly skip stale values to avoid “wrong” price updates
+            quotes = [
+                (friendly, price, int(volume or 0), exchange)
+                for friendly, price, volume, exchange, _ in fresh
+            ]
+            if quotes:
+                try:
+                    await self.batch_callback(quotes)
+                except Exception as e:
+                    logger.error("batch_callback error: %s", e)
+                logger.info("Yahoo fresh: %d/%d symbols", len(quotes), len(results))
+            return results
+
+        # Explicitly skip stale values to avoid “wrong” price updates
+        for friendly, price, volume, exchange, _ in fresh:
             try:
-                await self._invoke_callback(friendly, price, int(volume or 0), "NSE")
+                await self._invoke_callback(friendly, price, int(volume or 0), exchange)
             except Exception as e:
                 logger.error("price_callback error for %s: %s", friendly, e)
-            logger.info("Yahoo fresh: %s = ₹%s", friendly, price)
+            logger.info("Yahoo fresh: %s = ₹%s", friendly, format_paise(price))
+        return results
+
+    async def _poll_due(self) -> float:
+        """Poll the symbols the scheduler says are due; returns seconds until the next one is"""
+        scheduler = self.scheduler
+        scheduler.sync(self._wanted())
+        due = scheduler.due(fill_to=self.quote_client.chunk_size if self.batch_fetch else 1)
+        if due:
+            fetched: Dict[str, Optional[Paise]] = {}
+            try:
+                fetched = {quote[0]: quote[1] for quote in await self.fetch_prices(due)}
+            finally:
+                # Every symbol handed out must be rescheduled, fetched or not
+                for friendly in due:
+                    scheduler.observe(friendly, fetched.get(friendly))
+        next_due = scheduler.next_due()
+        if next_due is None:
+            return self.poll_seconds
+        # due() already pulled in everything within min_seconds, so cycles never run closer than that
+        return max(scheduler.min_seconds, next_due - time.monotonic())
 
     async def start_feed(self, poll_seconds: int = 30, freshness_secs: int = 90):
         self.is_running = True
         self.poll_seconds = poll_seconds
         self.freshness_secs = freshness_secs
-        logger.info("Starting Yahoo Finance feed (poll=%ss, freshness=%ss)...", poll_seconds, freshness_secs)
-        while self.is_running:
-            try:
-                await self.fetch_all_prices()
-                await asyncio.sleep(self.poll_seconds)
-            except Exception as e:
-                logger.error("Yahoo feed loop error: %s", e)
-                await asyncio.sleep(max(30, self.poll_seconds))
+        logger.info("Starting Yahoo Finance feed (poll=%ss, freshness=%ss, adaptive=%s, market hours only=%s)...",
+                    poll_seconds, freshness_secs, self.scheduler is not None, self.calendar is not None)
+        paused = False
+        try:
+            while self.is_running:
+                try:
+                    closed_for = self.calendar.seconds_until_open() if self.calendar is not None else 0.0
+                    if closed_for > 0:
+                        if not paused:
+                            logger.info("NSE closed; polling paused until %s", self.calendar.next_open())
+                            paused = True
+                        # Wake up now and then so stop_feed() is noticed
+                        await asyncio.sleep(min(closed_for, 60))
+                        continue
+                    paused = False
+                    if self.scheduler is None:
+                        await self.fetch_all_prices()
+                        await asyncio.sleep(self.poll_seconds)
+                    else:
+                        await asyncio.sleep(await self._poll_due())
+                except Exception as e:
+                    logger.error("Yahoo feed loop error: %s", e)
+                    await asyncio.sleep(max(30, self.poll_seconds))
+        finally:
+            await self.quote_client.close()
+            if self.router is not None:
+                await self.router.close()
 
     def stop_feed(self):
         self.is_running = False
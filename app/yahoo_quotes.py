@@ -0,0 +1,134 @@
+# app/yahoo_quotes.py
+"""
+Batched Yahoo Finance quotes.
+
+One `v7/finance/quote?symbols=A,B,...` request returns the latest quote of up
+to `chunk_size` symbols, so a poll cycle over N symbols costs
+ceil(N / chunk_size) requests instead of up to three per symbol. The chunks
+go out concurrently over one keep-alive aiohttp session whose connection
+pool is reused across poll cycles, and the JSON results are parsed into a
+DataFrame and converted to paise column-wise.
+
+Yahoo wants a session cookie plus a matching "crumb" on this endpoint; both
+are fetched once per session and again when a request is rejected with 401.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from .prices import to_paise_array
+
+logger = logging.getLogger(__name__)
+
+QUOTE_FIELDS = ("symbol", "regularMarketPrice", "regularMarketVolume", "regularMarketTime")
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+
+
+def parse_quotes(results: List[dict]) -> pd.DataFrame:
+    """quoteResponse.result -> DataFrame indexed by Yahoo symbol: price (paise), volume, time (epoch s)
+
+    Quotes without a price are dropped.
+    """
+    frame = pd.DataFrame.from_records(results, columns=QUOTE_FIELDS)
+    frame = frame[frame["regularMarketPrice"].notna()]
+    return pd.DataFrame({
+        "price": to_paise_array(frame["regularMarketPrice"].to_numpy(np.float64)),
+        "volume": frame["regularMarketVolume"].fillna(0).to_numpy(np.float64).astype(np.int64),
+        "time": frame["regularMarketTime"].fillna(0).to_numpy(np.float64).astype(np.int64),
+    }, index=pd.Index(frame["symbol"], name="symbol"))
+
+
+class YahooQuoteClient:
+    """Multi-symbol quote requests over a pooled HTTP session"""
+
+    def __init__(self, chunk_size: int = 100, max_connections: int = 4, timeout_seconds: float = 10.0,
+                 host: str = "https://query1.finance.yahoo.com", cookie_url: str = "https://fc.yahoo.com"):
+        self.chunk_size = max(1, chunk_size)
+        self.max_connections = max(1, max_connections)
+        self.timeout_seconds = timeout_seconds
+        self.host = host
+        self.cookie_url = cookie_url
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._crumb: Optional[str] = None
+        self._crumb_lock: Optional[asyncio.Lock] = None
+
+        self.requests = 0
+        self.failed_requests = 0
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                headers={"User-Agent": USER_AGENT},
+            )
+            self._crumb = None
+            self._crumb_lock = asyncio.Lock()
+        return self._session
+
+    async def _get_crumb(self, stale: Optional[str] = None) -> str:
+        async with self._crumb_lock:
+            # Another chunk may have refreshed it while this one waited
+            if self._crumb is not None and self._crumb != stale:
+                return self._crumb
+            session = self._ensure_session()
+            self.requests += 2
+            # Only sets the cookie; the response itself is usually a 404
+            async with session.get(self.cookie_url, allow_redirects=True) as response:
+                await response.read()
+            async with session.get(f"{self.host}/v1/test/getcrumb") as response:
+                response.raise_for_status()
+                self._crumb = (await response.text()).strip()
+            return self._crumb
+
+    async def _fetch_chunk(self, symbols: Sequence[str]) -> List[dict]:
+        session = self._ensure_session()
+        crumb = self._crumb or await self._get_crumb()
+        for attempt in range(2):
+            params = {"symbols": ",".join(symbols), "fields": ",".join(QUOTE_FIELDS), "crumb": crumb}
+            self.requests += 1
+            async with session.get(f"{self.host}/v7/finance/quote", params=params) as response:
+                if response.status in (401, 403) and attempt == 0:
+                    await response.read()
+                    crumb = await self._get_crumb(stale=crumb)
+                    continue
+                response.raise_for_status()
+                payload = await response.json(content_type=None)
+            return (payload.get("quoteResponse") or {}).get("result") or []
+        return []
+
+    async def fetch(self, symbols: Sequence[str]) -> Tuple[pd.DataFrame, List[str]]:
+        """Quotes for `symbols` (see parse_quotes), plus the symbols of chunks whose request failed
+
+        Symbols Yahoo does not know, or has no price for, are simply absent.
+        """
+        chunks = [symbols[i:i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+        responses = await asyncio.gather(*(self._fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        results, failed = [], []
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, BaseException):
+                self.failed_requests += 1
+                reason = response.status if isinstance(response, aiohttp.ClientResponseError) else repr(response)
+                logger.warning("Yahoo quote request for %d symbols failed: %s", len(chunk), reason)
+                failed.extend(chunk)
+            else:
+                results.extend(response)
+        return parse_quotes(results), failed
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "failed_requests": self.failed_requests}
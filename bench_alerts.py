@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Alert evaluation benchmark for QuantAlert
+Compares rule-evaluations/sec for one poll-cycle snapshot:
+  - per-rule loop   : one comparison per rule (the original worker path)
+  - bisect index    : RuleIndex per-symbol sorted thresholds
+  - numpy snapshot  : ColumnarRules masked comparisons over all rules at once
+
+Usage: python bench_alerts.py [--rules 1000000] [--symbols 500] [--rounds 5]
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from app.rule_index import RuleIndex, CachedRule, condition_holds
+
+CONDITIONS = (">", ">=", "<", "<=", "==")
+
+
+def build_rules(n_rules: int, n_symbols: int, seed: int = 42):
+    rng = random.Random(seed)
+    symbols = [f"SYM{i:04d}" for i in range(n_symbols)]
+    base = {s: rng.randint(10_000, 500_000) for s in symbols}  # paise
+    rules = []
+    for rule_id in range(n_rules):
+        symbol = symbols[rng.randrange(n_symbols)]
+        target = base[symbol] + rng.randint(-5_000, 5_000)
+        rules.append(CachedRule(
+            id=rule_id,
+            user_id=rule_id % 1000,
+            email="",
+            symbol=symbol,
+            condition_type=rng.choice(CONDITIONS),
+            target_price=Decimal(target) / 100,
+        ))
+    snapshot = {s: base[s] + rng.randint(-2_000, 2_000) for s in symbols}  # paise
+    return rules, snapshot
+
+
+def timed(fn, rounds: int):
+    best = float("inf")
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=1_000_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"🔧 Building {args.rules:,} rules over {args.symbols} symbols...")
+    rules, snapshot = build_rules(args.rules, args.symbols)
+
+    by_symbol = {}
+    for rule in rules:
+        by_symbol.setdefault(rule.symbol, []).append(rule)
+
+    def per_rule_loop():
+        hits = []
+        for symbol, price in snapshot.items():
+            for rule in by_symbol.get(symbol, ()):
+                if condition_holds(rule.condition_type, rule.target_paise, price):
+                    hits.append(rule.id)
+        return hits
+
+    index = RuleIndex(columnar=True)
+    start = time.perf_counter()
+    index.load(rules)
+    print(f"📚 Index build: {time.perf_counter() - start:.2f}s")
+
+    def bisect_index():
+        hits = []
+        for symbol, price in snapshot.items():
+            hits.extend(index.match_ids(symbol, price))
+        return hits
+
+    def numpy_snapshot():
+        return index.columns.evaluate(snapshot)
+
+    print("")
+    print(f"{'path':<16}{'seconds':>12}{'evals/sec':>18}{'hits':>12}")
+    expected = None
+    for name, fn, rounds in (
+        ("per-rule loop", per_rule_loop, 1),
+        ("bisect index", bisect_index, args.rounds),
+        ("numpy snapshot", numpy_snapshot, args.rounds),
+    ):
+        seconds, hits = timed(fn, rounds)
+        hit_set = {int(h) for h in hits}
+        if expected is None:
+            expected = hit_set
+        status = "✅" if hit_set == expected else "❌ mismatch"
+        print(f"{name:<16}{seconds:>12.4f}{args.rules / seconds:>18,.0f}{len(hit_set):>12} {status}")
+
+
+if __name__ == "__main__":
+    main()
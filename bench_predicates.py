@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Shared-predicate benchmark for QuantAlert
+Builds rule sets of the same size whose symbols, conditions and target
+levels follow Zipf distributions (many users pick the same popular stock and
+the same round-number level), then times one poll-cycle snapshot:
+  - bisect index    : RuleIndex books (a shared threshold is one bisect boundary + one slice)
+  - numpy predicates: ColumnarRules masked pass over distinct predicates
+  - numpy + fan-out : the same pass expanded to the subscribed rule ids
+A larger level exponent concentrates rules on fewer predicates; the masked
+pass should follow the predicate count, not the rule count (ns/predicate
+stays flat), while fan-out cost follows the number of rules that fire.
+
+Usage: python bench_predicates.py [--rules 500000] [--symbols 500] [--rounds 5]
+"""
+
+import argparse
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from app.rule_index import RuleIndex, CachedRule
+
+CONDITIONS = (">", "<", ">=", "<=", "==")
+# Candidate targets per symbol: round levels every ₹0.05 within ±₹100 of the price
+LEVEL_STEP = 5
+LEVELS = 4_000
+
+
+def zipf_weights(n: int, s: float):
+    return list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+
+
+def build_rules(n_rules: int, n_symbols: int, level_s: float, seed: int = 42):
+    rng = random.Random(seed)
+    symbols = [f"SYM{i:04d}" for i in range(n_symbols)]
+    base = {s: rng.randint(10_000, 500_000) // 100 * 100 for s in symbols}  # paise
+    # Level ranks alternate around the price: nearest round numbers are most popular
+    offsets = [(k // 2 + 1) * LEVEL_STEP * (1 if k % 2 else -1) for k in range(LEVELS)]
+    symbol_cum = zipf_weights(n_symbols, 1.1)
+    condition_cum = zipf_weights(len(CONDITIONS), 1.0)
+    level_cum = zipf_weights(LEVELS, level_s)
+
+    picked_symbols = rng.choices(symbols, cum_weights=symbol_cum, k=n_rules)
+    picked_conditions = rng.choices(CONDITIONS, cum_weights=condition_cum, k=n_rules)
+    picked_offsets = rng.choices(offsets, cum_weights=level_cum, k=n_rules)
+    rules = [
+        CachedRule(
+            id=rule_id, user_id=rule_id, email="", symbol=symbol, condition_type=condition,
+            target_price=Decimal(base[symbol] + offset) / 100,
+        )
+        for rule_id, (symbol, condition, offset) in enumerate(
+            zip(picked_symbols, picked_conditions, picked_offsets)
+        )
+    ]
+    snapshot = {s: base[s] + rng.randint(-2_000, 2_000) for s in symbols}
+    return rules, snapshot
+
+
+def timed(fn, rounds: int):
+    best = float("inf")
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=500_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"🔧 {args.rules:,} rules over {args.symbols} symbols per run (times are per snapshot)")
+    print("")
+    print(f"{'level s':>8}{'predicates':>12}{'dedup':>8}{'bisect ms':>11}"
+          f"{'numpy ms':>10}{'+fan-out ms':>13}{'hits':>10}{'ns/predicate':>14}")
+    for level_s in (0.0, 0.8, 1.1, 1.5, 2.0, 3.0):
+        rules, snapshot = build_rules(args.rules, args.symbols, level_s)
+        bisect_index = RuleIndex()
+        bisect_index.load(rules)
+        columnar = RuleIndex(columnar=True)
+        columnar.load(rules)
+        del rules
+
+        stats = columnar.stats()
+        bisect_s, bisect_hits = timed(lambda: bisect_index.match_snapshot_ids(snapshot), args.rounds)
+        numpy_s, _ = timed(lambda: columnar.columns.evaluate_predicates(snapshot), args.rounds)
+        fan_out_s, hits = timed(lambda: columnar.columns.evaluate_ids(snapshot), args.rounds)
+        status = "✅" if sorted(bisect_hits) == sorted(hits) else "❌ mismatch"
+        print(f"{level_s:>8.1f}{stats['predicates']:>12,}{stats['dedup_ratio']:>8.1f}"
+              f"{bisect_s * 1000:>11.2f}{numpy_s * 1000:>10.2f}{fan_out_s * 1000:>13.2f}"
+              f"{len(hits):>10,}{numpy_s / stats['predicates'] * 1e9:>14.1f} {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tick callback benchmark for QuantAlert
+Drives the worker's real ingest path - AlertWorker.price_update_callback
+(one tick) and price_batch_callback (one poll cycle) into MarketDataManager
+(last-quote cache, change-only filter, bar builder, buffered tick writer),
+then rule matching against a loaded RuleIndex - and reports CPU per tick.
+
+Prices go in twice: as Paise, the way the feeds hand them over, and as
+Decimal rupees, which the callback converts once at the boundary. Rules are
+placed outside the price range so nothing fires and no alert e-mail or SQL
+write is timed; the UI broadcast is replaced by a no-op. DuckDB runs in
+memory unless DUCKDB_PATH is set.
+
+Usage: python bench_ticks.py [--ticks 50000] [--rules 2000] [--symbols 500]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+
+def build_rules(n_rules: int, symbols):
+    """Rules over the benchmark's symbols that the 900-1100 rupee prices never satisfy"""
+    from app.rule_index import CachedRule
+
+    rng = random.Random(7)
+    rules = []
+    for rule_id in range(n_rules):
+        above = rng.random() < 0.5
+        rules.append(CachedRule(
+            id=rule_id,
+            user_id=rule_id % 100,
+            email="",
+            symbol=symbols[rng.randrange(len(symbols))],
+            condition_type=">" if above else "<",
+            target_price=Decimal(rng.randint(110_100, 120_000) if above else rng.randint(80_000, 89_900)) / 100,
+        ))
+    return rules
+
+
+async def run_ticks(worker, quotes):
+    began = time.process_time()
+    for symbol, price in quotes:
+        await worker.price_update_callback(symbol, price, 10, "NSE")
+    return time.process_time() - began
+
+
+async def run_cycles(worker, quotes, cycle_size):
+    began = time.process_time()
+    for i in range(0, len(quotes), cycle_size):
+        await worker.price_batch_callback([(s, p, 10, "NSE") for s, p in quotes[i:i + cycle_size]])
+    return time.process_time() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=50_000)
+    parser.add_argument("--rules", type=int, default=2_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    args = parser.parse_args()
+
+    # Before the first app import, which opens the DuckDB database named by the settings
+    os.environ.setdefault("DUCKDB_PATH", ":memory:")
+    os.environ.setdefault("QUOTE_TABLE_PATH", os.path.join(tempfile.gettempdir(), "quantalert_bench_quotes.shm"))
+    from app.market_data import market_data
+    from app.prices import Paise, to_paise
+    from app.worker import AlertWorker
+
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    worker = AlertWorker()
+    worker.rule_index.load(build_rules(args.rules, symbols))
+
+    async def no_broadcast(message):
+        pass
+
+    worker._broadcast_price_update = no_broadcast
+
+    rng = random.Random(42)
+    rupees = [
+        (symbols[i % len(symbols)], Decimal(rng.randint(90_000, 110_000)) / 100)
+        for i in range(args.ticks)
+    ]
+    paise = [(symbol, to_paise(price)) for symbol, price in rupees]
+
+    results = []
+    # The callbacks print every tick; the formatting is timed, the terminal output is not
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, quotes in (("paise", paise), ("decimal", rupees)):
+            results.append((f"tick/{name}", asyncio.run(run_ticks(worker, quotes))))
+            results.append((f"cycle/{name}", asyncio.run(run_cycles(worker, quotes, args.symbols))))
+    market_data.flush_ticks()
+
+    print(f"🔧 {args.ticks:,} ticks per run, {args.rules:,} rules, {args.symbols} symbols per poll cycle")
+    print("")
+    print(f"{'path':<16}{'µs/tick':>10}{'ticks/sec':>14}")
+    for name, cpu in results:
+        print(f"{name:<16}{cpu / args.ticks * 1e6:>10.2f}{args.ticks / cpu:>14,.0f}")
+    print("")
+    print(f"bytes per price: Paise {sys.getsizeof(Paise(100_050))}, Decimal {sys.getsizeof(Decimal('1000.50'))}")
+    stats = market_data.tick_writer.stats()
+    print(f"✅ {stats['flushed_ticks']:,} ticks reached DuckDB in {stats['flushes']} flushes")
+
+
+if __name__ == "__main__":
+    main()
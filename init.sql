@@ -19,6 +19,7 @@ CREATE TABLE IF NOT EXISTS alert_rules (
     data_source VARCHAR(20) NOT NULL DEFAULT 'tick',
     column_name VARCHAR(20) NOT NULL DEFAULT 'price',
     ohlcv_timeframe_minutes INTEGER NOT NULL DEFAULT 1,
+    trigger_mode VARCHAR(10) NOT NULL DEFAULT 'level' CHECK (trigger_mode IN ('level', 'cross')),
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -31,7 +32,23 @@ CREATE TABLE IF NOT EXISTS alert_triggers (
     triggered_price DECIMAL(10, 2) NOT NULL,
     triggered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     email_sent BOOLEAN DEFAULT FALSE,
-    email_sent_at TIMESTAMP
+    email_sent_at TIMESTAMP,
+    batch_id VARCHAR(32)
+);
+
+-- Create alert_rule_changes table (change stream consumed by workers)
+CREATE TABLE IF NOT EXISTS alert_rule_changes (
+    id SERIAL PRIMARY KEY,
+    alert_rule_id INTEGER NOT NULL,
+    op VARCHAR(10) NOT NULL DEFAULT 'upsert' CHECK (op IN ('upsert', 'delete')),
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create worker_leases table (worker membership + symbol shard ownership)
+CREATE TABLE IF NOT EXISTS worker_leases (
+    lease_key VARCHAR(64) PRIMARY KEY,
+    owner VARCHAR(64) NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
 );
 
 -- Create indexes for better performance
@@ -40,6 +57,10 @@ CREATE INDEX IF NOT EXISTS idx_alert_rules_symbol ON alert_rules(symbol);
 CREATE INDEX IF NOT EXISTS idx_alert_rules_active ON alert_rules(is_active);
 CREATE INDEX IF NOT EXISTS idx_alert_triggers_rule_id ON alert_triggers(alert_rule_id);
 CREATE INDEX IF NOT EXISTS idx_alert_triggers_triggered_at ON alert_triggers(triggered_at);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_alert_triggers_rule_batch ON alert_triggers(alert_rule_id, batch_id);
+CREATE INDEX IF NOT EXISTS idx_alert_rule_changes_rule_id ON alert_rule_changes(alert_rule_id);
+CREATE INDEX IF NOT EXISTS idx_worker_leases_owner ON worker_leases(owner);
+CREATE INDEX IF NOT EXISTS idx_worker_leases_expires_at ON worker_leases(expires_at);
 
 -- Create function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Bar builder test for QuantAlert's OHLCV alerts
+Feeds timed ticks through BarAggregator / BarBook and checks that:
+  - bars start on timeframe boundaries aligned to local midnight
+  - high/low events fire intra-bar, only when the extreme moves
+  - open/close/volume events fire once, when the next bar's first tick arrives
+  - a minute and a 5-minute series of one symbol roll over independently
+  - BarBook.sync keeps open bars of series still referenced by rules
+No running API, database or market feed is required.
+"""
+
+from datetime import datetime
+
+from app.bars import PRICE_SCALE, BarAggregator, BarBook, bar_start, parse_timeframe
+
+
+def _at(hour, minute, second=0):
+    return datetime(2024, 3, 14, hour, minute, second)
+
+
+def test_bar_start_alignment():
+    """Every timeframe starts at midnight-aligned multiples of its length"""
+    print("Testing bar alignment...")
+    ts = _at(9, 17, 42)
+    assert bar_start(ts, 1) == _at(9, 17)
+    assert bar_start(ts, 5) == _at(9, 15)
+    assert bar_start(ts, 15) == _at(9, 15)
+    assert bar_start(ts, 60) == _at(9, 0)
+    assert bar_start(ts, 1440) == _at(0, 0)
+    assert bar_start(_at(9, 15), 5) == _at(9, 15)
+    assert [parse_timeframe(v) for v in ("1m", "5M", "1h", "1d", "15", "7m")] == [1, 5, 60, 1440, 15, None]
+    print("✅ 1m/5m/15m/1h/1d bars aligned")
+
+
+def test_intrabar_events():
+    """A new bar reports its high/low; later ticks report only the extreme that moved"""
+    print("Testing intra-bar events...")
+    agg = BarAggregator("TCS", 1)
+    assert agg.update(10_000, 5, _at(9, 15, 1)) == [(1, "high_price", 10_000, None), (1, "low_price", 10_000, None)]
+    assert agg.update(10_050, 5, _at(9, 15, 2)) == [(1, "high_price", 10_050, 10_000)]
+    assert agg.update(10_020, 5, _at(9, 15, 3)) == []
+    assert agg.update(9_990, 5, _at(9, 15, 59)) == [(1, "low_price", 9_990, 10_000)]
+    bar = agg.current
+    assert (bar.open_price, bar.high_price, bar.low_price, bar.close_price, bar.volume) == \
+        (10_000, 10_050, 9_990, 9_990, 20)
+    print("✅ Only moving extremes reported inside the bar")
+
+
+def test_minute_rollover():
+    """The first tick of the next minute closes the bar: final open/close/volume, then the new bar"""
+    print("Testing minute rollover...")
+    agg = BarAggregator("TCS", 1)
+    agg.update(10_000, 5, _at(9, 15, 1))
+    agg.update(10_050, 5, _at(9, 15, 30))
+
+    events = agg.update(10_070, 2, _at(9, 16, 0))
+    assert events == [
+        (1, "open_price", 10_000, None),
+        (1, "close_price", 10_050, None),
+        (1, "volume", 10 * PRICE_SCALE, None),
+        (1, "high_price", 10_070, 10_050),
+        (1, "low_price", 10_070, 10_000),
+    ], events
+    # The next close compares with the bar before it
+    events = agg.update(10_080, 1, _at(9, 18, 5))
+    assert events[:3] == [
+        (1, "open_price", 10_070, 10_000),
+        (1, "close_price", 10_070, 10_050),
+        (1, "volume", 2 * PRICE_SCALE, 10 * PRICE_SCALE),
+    ], events
+    assert agg.last_closed.start == _at(9, 16) and agg.current.start == _at(9, 18)
+    print("✅ Closed bar final on the next minute's first tick")
+
+
+def test_minute_and_rollup_series():
+    """Ticks at 09:19:59 and 09:20:00 roll the 1m and 5m bars; 09:20:30 only moves intra-bar"""
+    print("Testing minute and 5-minute series side by side...")
+    book = BarBook()
+    book.sync([("TCS", 1), ("TCS", 5)])
+    ticks = [(_at(9, 15, 0), 10_000), (_at(9, 17, 10), 10_100), (_at(9, 19, 59), 9_900),
+             (_at(9, 20, 0), 9_950), (_at(9, 20, 30), 9_960)]
+    closes = []
+    for ts, price in ticks:
+        for timeframe, column, value, _ in book.update("TCS", price, 1, ts):
+            if column == "close_price":
+                closes.append((ts.strftime("%H:%M:%S"), timeframe, value))
+    assert sorted(closes) == [
+        ("09:17:10", 1, 10_000),
+        ("09:19:59", 1, 10_100),
+        ("09:20:00", 1, 9_900),
+        ("09:20:00", 5, 9_900),
+    ], closes
+    five = book.aggregators[("TCS", 5)]
+    closed = five.last_closed
+    assert (closed.start, closed.open_price, closed.high_price, closed.low_price, closed.volume) == \
+        (_at(9, 15), 10_000, 10_100, 9_900, 3)
+    assert five.current.start == _at(9, 20) and five.current.volume == 2
+    print("✅ 5m bar closed at 09:20:00 with the 09:15-09:19 ticks")
+
+
+def test_sync_keeps_open_bars():
+    """Re-syncing keeps bars of series still referenced and drops the rest"""
+    print("Testing BarBook.sync...")
+    book = BarBook()
+    book.sync([("TCS", 1), ("INFY", 5)])
+    book.update("TCS", 10_000, 1, _at(9, 15, 1))
+    kept = book.aggregators[("TCS", 1)]
+
+    book.sync([("TCS", 1), ("TCS", 15)])
+    assert len(book) == 2 and book.aggregators[("TCS", 1)] is kept
+    assert kept.current.open_price == 10_000
+    assert book.update("INFY", 10_000, 1, _at(9, 15, 2)) == []
+    assert {event[0] for event in book.update("TCS", 10_010, 1, _at(9, 15, 3))} == {1, 15}
+    print("✅ Open bars survive a rule reload")
+
+
+def main():
+    """Run bar builder tests"""
+    print("🧪 QuantAlert Bar Builder Test")
+    print("=" * 50)
+    test_bar_start_alignment()
+    test_intrabar_events()
+    test_minute_rollover()
+    test_minute_and_rollup_series()
+    test_sync_keeps_open_bars()
+    print("=" * 50)
+    print("✅ All bar builder tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Cooldown wheel test for QuantAlert's recurring alerts
+Drives CooldownWheel with a simulated clock and checks that:
+  - a rule is cooling until exactly its expiry and re-armed once after it
+  - expiries on both sides of the slot wrap (3600 slots of 1s) are swept in order
+  - cooldowns longer than one revolution survive passes over their slot
+  - a long gap between advances sweeps every elapsed slot once
+  - cooldowns restored at startup (the worker's restart path) expire on time
+No running API, database or market feed is required.
+"""
+
+from app.cooldown import CooldownWheel
+
+# Epoch seconds at a slot boundary: tick % 3600 == 0
+T0 = 1_700_002_800.0
+assert int(T0) % 3600 == 0
+
+
+def _run(wheel, start, end, step=1.0):
+    """Advance second by second; returns {rule_id: time it was re-armed}"""
+    rearmed = {}
+    now = start
+    while now <= end:
+        for rule_id in wheel.advance(now):
+            assert rule_id not in rearmed, f"rule {rule_id} re-armed twice"
+            rearmed[rule_id] = now
+        now += step
+    return rearmed
+
+
+def test_active_until_expiry():
+    """active() is True strictly before the expiry, False from it on"""
+    print("Testing cooldown expiry...")
+    wheel = CooldownWheel()
+    wheel.start(1, T0 + 60)
+    assert wheel.active(1, T0 + 59.999)
+    assert not wheel.active(1, T0 + 60)
+    assert not wheel.active(2, T0)
+    wheel.start(1, T0 + 120)  # restarting replaces the old expiry
+    assert wheel.active(1, T0 + 90) and len(wheel) == 1
+    wheel.cancel(1)
+    assert not wheel.active(1, T0 + 90) and len(wheel) == 0
+    print("✅ Cooling strictly before the expiry; restart and cancel replace it")
+
+
+def test_slot_wrap():
+    """Expiries just before and after slot 3599 -> 0 are re-armed in order, within a tick"""
+    print("Testing slot wrap at 3600...")
+    wheel = CooldownWheel()
+    wheel.advance(T0)
+    expiries = {1: T0 + 3598.5, 2: T0 + 3599.5, 3: T0 + 3600.0, 4: T0 + 3600.5, 5: T0 + 3601.5}
+    for rule_id, until in expiries.items():
+        wheel.start(rule_id, until)
+
+    rearmed = _run(wheel, T0 + 1, T0 + 3605)
+    assert sorted(rearmed) == sorted(expiries), rearmed
+    for rule_id, until in expiries.items():
+        # Swept once the expiry's tick has fully elapsed
+        assert until <= rearmed[rule_id] <= until + 2, (rule_id, until - T0, rearmed[rule_id] - T0)
+    assert len(wheel) == 0
+    print("✅ Expiries around the wrap re-armed in order")
+
+
+def test_longer_than_one_revolution():
+    """A 2.5 hour cooldown passes its slot twice before it expires"""
+    print("Testing cooldowns longer than the wheel...")
+    wheel = CooldownWheel()
+    wheel.advance(T0)
+    wheel.start(1, T0 + 9000)
+    rearmed = _run(wheel, T0 + 1, T0 + 9002)
+    assert 9000 <= rearmed[1] - T0 <= 9002, rearmed
+    print("✅ Re-armed after 9000s, not on the earlier passes")
+
+
+def test_gap_between_advances():
+    """Nothing fired for two hours: one advance sweeps every slot and re-arms each expiry once"""
+    print("Testing a long gap between advances...")
+    wheel = CooldownWheel()
+    wheel.advance(T0)
+    for rule_id in range(100):
+        wheel.start(rule_id, T0 + 30 + rule_id * 70)
+    wheel.start(1000, T0 + 8000)
+    rearmed = wheel.advance(T0 + 7200)
+    assert sorted(rearmed) == list(range(100)), len(rearmed)
+    assert len(wheel) == 1 and wheel.active(1000, T0 + 7200)
+    assert wheel.advance(T0 + 7200.5) == []
+    print("✅ 100 expiries re-armed by one advance; the later one still cooling")
+
+
+def test_restore_after_restart():
+    """Cooldowns restored into a fresh wheel expire on time, even if the first advance comes late"""
+    print("Testing restored cooldowns...")
+    wheel = CooldownWheel()
+    # The worker restores cooldowns (from the last trigger times) before it ever advances
+    wheel.start(1, T0 + 100)
+    wheel.start(2, T0 + 5000)
+    assert wheel.active(1, T0) and wheel.active(2, T0)
+
+    # First alert batch 10 minutes after startup
+    rearmed = wheel.advance(T0 + 600)
+    assert rearmed == [1], rearmed
+    assert len(wheel) == 1 and wheel.active(2, T0 + 600)
+    rearmed = _run(wheel, T0 + 601, T0 + 5002)
+    assert list(rearmed) == [2] and 5000 <= rearmed[2] - T0 <= 5002, rearmed
+    print("✅ Restored cooldowns re-armed on time")
+
+
+def main():
+    """Run cooldown wheel tests"""
+    print("🧪 QuantAlert Cooldown Wheel Test")
+    print("=" * 50)
+    test_active_until_expiry()
+    test_slot_wrap()
+    test_longer_than_one_revolution()
+    test_gap_between_advances()
+    test_restore_after_restart()
+    print("=" * 50)
+    print("✅ All cooldown wheel tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for QuantAlert's DuckDB access layer
+Hammers one MarketDataManager from many threads at once, the way the API
+threadpool, the worker event loop and the tick writer share it:
+  - writer threads ingest ticks (store_tick + update_ohlcv_1min)
+  - reader threads query latest prices, tick ranges, OHLCV bars and symbols
+  - a maintenance thread flushes and resumes bars while both run
+Checks that no call fails, every tick that passes the change-only filter is
+stored exactly once and reads keep flowing while writes are queued to the
+single writer thread; after close() every thread is refused, and cursors of
+finished threads are let go.
+The manager under test is private, on a temporary DuckDB file; the app's
+global one is left alone.
+No running API or market feed is required.
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_duckdb_stress.duckdb")
+ARCHIVE_PATH = os.path.join(tempfile.gettempdir(), "quantalert_stress_archive")
+QUOTE_TABLE_PATH = os.path.join(tempfile.gettempdir(), "quantalert_stress_quotes.shm")
+
+NUM_WRITERS = 4
+NUM_READERS = 8
+DURATION_SECONDS = 5.0
+SYMBOLS = [f"SYM{i:02d}" for i in range(20)]
+
+
+def _manager():
+    """A MarketDataManager of its own on a fresh temporary DuckDB file"""
+    from app.config import Settings
+    from app.market_data import MarketDataManager
+
+    for leftover in (DB_PATH, DB_PATH + ".wal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return MarketDataManager(Settings(
+        duckdb_path=DB_PATH, tick_archive_path=ARCHIVE_PATH, quote_table_path=QUOTE_TABLE_PATH,
+        tick_flush_rows=500, tick_flush_seconds=0.05,
+    ))
+
+
+def _writer(market_data, writer_id, deadline, errors, written):
+    rng = random.Random(writer_id)
+    try:
+        i = 0
+        while time.perf_counter() < deadline:
+            symbol = SYMBOLS[rng.randrange(len(SYMBOLS))]
+            price = rng.randint(10_000, 20_000)
+            market_data.store_tick(symbol, price, 1)
+            market_data.update_ohlcv_1min(symbol, price, 1)
+            written[writer_id] += 1
+            i += 1
+            if i % 500 == 0:
+                time.sleep(0)  # let readers in
+    except Exception as e:
+        errors.append(f"writer {writer_id}: {e!r}")
+
+
+def _reader(market_data, reader_id, stop, errors, reads):
+    rng = random.Random(1000 + reader_id)
+    try:
+        while not stop.is_set():
+            symbol = SYMBOLS[rng.randrange(len(SYMBOLS))]
+            choice = rng.randrange(4)
+            if choice == 0:
+                # Skip the quote cache so the query really hits DuckDB
+                market_data._load_quote(symbol)
+            elif choice == 1:
+                now = datetime.now()
+                market_data.get_ticks(symbol, now - timedelta(minutes=5), now, 200)
+            elif choice == 2:
+                market_data.get_ohlcv(symbol, rng.choice((1, 5, 60)), 120)
+            else:
+                market_data.get_all_symbols()
+            reads[reader_id] += 1
+    except Exception as e:
+        errors.append(f"reader {reader_id}: {e!r}")
+
+
+def _maintenance(market_data, stop, errors):
+    try:
+        while not stop.is_set():
+            market_data.flush_ticks()
+            market_data.close_bars(datetime.now().replace(second=0, microsecond=0))
+            time.sleep(0.01)
+    except Exception as e:
+        errors.append(f"maintenance: {e!r}")
+
+
+def test_mixed_reads_and_writes():
+    """Concurrent ingest, queries and flushes: no errors, no lost or duplicated ticks"""
+    print("Testing concurrent reads and writes on the DuckDB access layer...")
+    market_data = _manager()
+
+    errors, stop = [], threading.Event()
+    written = [0] * NUM_WRITERS
+    reads = [0] * NUM_READERS
+    start = time.perf_counter()
+    deadline = start + DURATION_SECONDS
+    writers = [
+        threading.Thread(target=_writer, args=(market_data, w, deadline, errors, written))
+        for w in range(NUM_WRITERS)
+    ]
+    readers = [threading.Thread(target=_reader, args=(market_data, r, stop, errors, reads)) for r in range(NUM_READERS)]
+    maintenance = threading.Thread(target=_maintenance, args=(market_data, stop, errors))
+
+    for thread in readers + writers + [maintenance]:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers + [maintenance]:
+        thread.join()
+    market_data.flush_ticks()
+    elapsed = time.perf_counter() - start
+
+    assert not errors, f"{len(errors)} failures, first: {errors[0]}"
+    stored = market_data.db.fetchone("SELECT count(*) FROM ticks")[0]
+    # Repeats of a symbol's previous tick are collapsed or held as the end of their run
+    filtered = market_data.tick_filter.stats()
+    expected = sum(written) - filtered["collapsed_ticks"] - filtered["held_runs"]
+    assert stored == expected, f"stored {stored} of {expected} ticks"
+    volume = market_data.db.fetchone("SELECT sum(volume) FROM ticks")[0]
+    assert volume == stored
+
+    stats = market_data.db.stats()
+    print(f"✅ {sum(written):,} ticks from {NUM_WRITERS} writers in {elapsed:.1f}s, "
+          f"{sum(reads):,} reads from {NUM_READERS} readers ({sum(reads) / elapsed:,.0f}/s)")
+    print(f"✅ All ticks stored exactly once; writer thread: {stats['writes']} jobs, "
+          f"max queue depth {stats['max_write_queue_depth']}, max wait {stats['max_write_wait_ms']}ms, "
+          f"{stats['read_cursors']} read cursors")
+    market_data.close()
+
+
+def test_closed_and_finished_threads():
+    """close() refuses threads that already hold a cursor; cursors of finished threads are closed"""
+    print("Testing cursor lifetime...")
+    market_data = _manager()
+    db = market_data.db
+
+    def read():
+        db.fetchone("SELECT count(*) FROM ticks")
+
+    for _ in range(10):
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+    read()
+    # Left: this thread's, the writer's and the last reader's, closed once another thread needs one
+    assert db.stats()["read_cursors"] == 3, db.stats()
+
+    market_data.close()
+    try:
+        read()
+    except RuntimeError as e:
+        assert "closed" in str(e)
+    else:
+        raise AssertionError("read on a closed access layer succeeded")
+    print("✅ Closed layer refuses cached cursors; finished threads' cursors closed")
+
+
+def main():
+    """Run DuckDB concurrency tests"""
+    print("🧪 QuantAlert DuckDB Concurrency Test")
+    print("=" * 50)
+    test_mixed_reads_and_writes()
+    test_closed_and_finished_threads()
+    print("=" * 50)
+    print("✅ All DuckDB concurrency tests completed!")
+
+
+if __name__ == "__main__":
+    main()
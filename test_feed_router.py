@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Hedging and failover test for QuantAlert's FeedRouter
+Routes polls to scripted in-process providers and checks that:
+  - a slow provider is hedged to the next one, and the loser is cancelled
+  - an answer covering only some symbols hands the rest over at once
+  - a failing provider trips its circuit breaker and traffic fails over
+  - valid but stale quotes go to the next provider without counting as failures
+  - unseen() drops repeated quotes, with and without an exchange time
+No running API, network or market feed is required.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.feed_providers import FeedRouter
+
+SYMBOLS = ["AAA", "BBB", "CCC"]
+PRICE = 250000
+
+
+class ScriptedProvider:
+    """Answers every symbol (or `covers`) after `delay`, `age` seconds old; `fail` raises instead"""
+
+    def __init__(self, name, delay=0.0, fail=False, covers=None, age=0.0, price=PRICE):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.covers = covers
+        self.age = age
+        self.price = price
+        self.calls = []
+
+    def set_symbols(self, symbols):
+        pass
+
+    async def fetch_quotes(self, symbols):
+        self.calls.append(list(symbols))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        ts = datetime.now(timezone.utc) - timedelta(seconds=self.age)
+        return [(s, self.price, 5, "NSE", ts) for s in symbols if self.covers is None or s in self.covers]
+
+
+def _prices(quotes):
+    return [quote[1] for quote in quotes]
+
+
+def test_slow_provider_is_hedged():
+    """The next provider is asked after the hedge delay; its answer wins and the slow request is cancelled"""
+    print("Testing hedged requests...")
+    slow, fast = ScriptedProvider("slow", delay=2.0), ScriptedProvider("fast", delay=0.01)
+    router = FeedRouter([slow, fast], hedge_seconds=0.2, timeout_seconds=5)
+
+    started = time.monotonic()
+    quotes = asyncio.run(router.fetch(SYMBOLS))
+    elapsed = time.monotonic() - started
+
+    assert _prices(quotes) == [PRICE] * 3, quotes
+    assert elapsed < 1.0, f"hedged fetch took {elapsed:.2f}s"
+    stats = router.stats()
+    assert stats["fast"]["hedges"] == 1 and stats["fast"]["wins"] == 3, stats
+    assert stats["slow"]["cancelled"] == 1 and stats["slow"]["breaker"] == "closed", stats
+    print(f"✅ Slow provider hedged after {elapsed:.2f}s")
+
+
+def test_partial_answer_hands_over_at_once():
+    """Symbols a provider did not answer go to the next one without waiting for the hedge delay"""
+    print("Testing partial answers...")
+    partial, rest = ScriptedProvider("partial", covers={"AAA", "BBB"}), ScriptedProvider("rest")
+    router = FeedRouter([partial, rest], hedge_seconds=5, timeout_seconds=10)
+
+    started = time.monotonic()
+    quotes = asyncio.run(router.fetch(SYMBOLS))
+
+    assert _prices(quotes) == [PRICE] * 3, quotes
+    assert rest.calls == [["CCC"]], rest.calls
+    assert time.monotonic() - started < 1.0
+    print("✅ Missing symbols handed over immediately")
+
+
+def test_failing_provider_fails_over():
+    """Errors open the provider's breaker; later polls skip it until the half-open probe"""
+    print("Testing failover...")
+    down, backup = ScriptedProvider("down", fail=True), ScriptedProvider("backup")
+    router = FeedRouter([down, backup], hedge_seconds=0.2, timeout_seconds=5, failure_threshold=3,
+                        open_seconds=60)
+
+    async def polls():
+        return [await router.fetch(SYMBOLS) for _ in range(5)]
+
+    for quotes in asyncio.run(polls()):
+        assert _prices(quotes) == [PRICE] * 3, quotes
+    stats = router.stats()
+    assert stats["down"]["breaker"] == "open", stats
+    assert len(down.calls) == 3 and len(backup.calls) == 5, (down.calls, backup.calls)
+    print("✅ Breaker opened after 3 failures; every poll answered by the backup")
+
+
+def test_stale_quotes_are_not_failures():
+    """Old but valid quotes lose to fresh ones elsewhere; only missing prices degrade a provider"""
+    print("Testing stale and invalid answers...")
+    stale, fresh = ScriptedProvider("stale", age=600), ScriptedProvider("fresh")
+    router = FeedRouter([stale, fresh], hedge_seconds=5, timeout_seconds=10, failure_threshold=1)
+
+    quotes = asyncio.run(router.fetch(SYMBOLS))
+
+    assert _prices(quotes) == [PRICE] * 3, quotes
+    stats = router.stats()
+    assert stats["fresh"]["wins"] == 3 and stats["stale"]["wins"] == 0, stats
+    assert stats["stale"]["degraded"] == 0 and stats["stale"]["breaker"] == "closed", stats
+    assert stats["stale"]["stale_rate"] == 1.0, stats
+
+    broken = ScriptedProvider("broken", price=None)
+    router = FeedRouter([broken, ScriptedProvider("backup")], hedge_seconds=5, timeout_seconds=10,
+                        failure_threshold=1)
+    asyncio.run(router.fetch(SYMBOLS))
+    stats = router.stats()
+    assert stats["broken"]["degraded"] == 1 and stats["broken"]["breaker"] == "open", stats
+    print("✅ Stale answers hedged, not penalised; priceless answers trip the breaker")
+
+
+def test_unseen_drops_repeats():
+    """Repeats are dropped by exchange time, or by price and volume when there is none"""
+    print("Testing duplicate suppression...")
+    router = FeedRouter([ScriptedProvider("any")])
+    ts = datetime.now(timezone.utc)
+    timed = [("AAA", PRICE, 5, "NSE", ts)]
+    untimed = [("BBB", PRICE, 5, "NSE", None)]
+
+    assert router.unseen(timed + untimed) == timed + untimed
+    assert router.unseen(timed + untimed) == []
+    assert router.duplicates == 2
+    moved = [("AAA", PRICE, 5, "NSE", ts + timedelta(seconds=1)), ("BBB", PRICE, 6, "NSE", None)]
+    assert router.unseen(moved) == moved
+    assert router.unseen([("CCC", None, 0, "NSE", None)]) == []
+    print("✅ Repeats dropped; new trades and new volume delivered")
+
+
+def main():
+    """Run feed router tests"""
+    print("🧪 QuantAlert Feed Router Test")
+    print("=" * 50)
+    test_slow_provider_is_hedged()
+    test_partial_answer_hands_over_at_once()
+    test_failing_provider_fails_over()
+    test_stale_quotes_are_not_failures()
+    test_unseen_drops_repeats()
+    print("=" * 50)
+    print("✅ All feed router tests completed!")
+
+
+if __name__ == "__main__":
+    main()
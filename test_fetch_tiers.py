@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Fetch tier memo test for QuantAlert's Yahoo per-symbol fallback chain
+Feeds scripted attempt results to FetchTierMemo on a fake clock and checks that:
+  - a symbol answered by a heavier tier skips the failed cheaper ones next poll
+  - a skipped tier is probed once when its breaker turns half-open; success
+    hands the symbol back to it, failure reopens it for twice as long (capped)
+  - a tier failing failure_threshold times in a row opens, and record()
+    reports the trip exactly once
+  - forget() drops a symbol's breakers and preference
+No running API, network or market feed is required.
+"""
+
+from app.fetch_tiers import FetchTierMemo
+
+TIERS = ("fast_info", "info", "minute_bar")
+
+
+def _memo():
+    return FetchTierMemo(TIERS, failure_threshold=3, open_seconds=60, max_open_seconds=200)
+
+
+def _poll(memo, symbol, answers, now):
+    """One poll over the tiers memo.order() gives; `answers` is the set of tiers that work now"""
+    tried = []
+    for tier in memo.order(symbol, now):
+        tried.append(tier)
+        ok = tier in answers
+        memo.record(symbol, tier, ok, 0.01, now)
+        if ok:
+            break
+    return tried
+
+
+def test_steady_state_uses_working_tier():
+    """After one fallback poll the symbol goes straight to the tier that answered"""
+    print("Testing the remembered tier...")
+    memo = _memo()
+    assert _poll(memo, "TCS", {"info"}, now=0) == ["fast_info", "info"]
+    assert memo.preferred("TCS") == "info"
+    assert _poll(memo, "TCS", {"info"}, now=10) == ["info"]
+    assert _poll(memo, "TCS", {"info"}, now=59) == ["info"]
+    # Other symbols are unaffected
+    assert memo.order("INFY", 10) == list(TIERS)
+    stats = memo.stats()
+    assert stats["fast_info"]["breakers_open"] == 1 and stats["info"]["preferred_by"] == 1
+    print("✅ One request per poll once the working tier is known")
+
+
+def test_half_open_probe():
+    """The skipped tier is probed after open_seconds; failures double the wait up to the cap"""
+    print("Testing half-open probes...")
+    memo = _memo()
+    _poll(memo, "TCS", {"info"}, now=0)
+    assert _poll(memo, "TCS", {"info"}, now=60) == ["fast_info", "info"]
+    assert _poll(memo, "TCS", {"info"}, now=119) == ["info"]
+    assert _poll(memo, "TCS", {"info"}, now=180) == ["fast_info", "info"]
+    # 120 s, then 200 s rather than 240 s
+    assert _poll(memo, "TCS", {"info"}, now=379) == ["info"]
+    assert _poll(memo, "TCS", {"info"}, now=380) == ["fast_info", "info"]
+    assert _poll(memo, "TCS", {"info"}, now=579) == ["info"]
+    assert _poll(memo, "TCS", {"fast_info", "info"}, now=580) == ["fast_info"]
+    assert memo.preferred("TCS") == "fast_info"
+    assert _poll(memo, "TCS", {"fast_info", "info"}, now=581) == ["fast_info"]
+    assert memo.stats()["fast_info"]["breakers_open"] == 0
+    print("✅ Probe backs off while failing and restores the cheap tier once it works")
+
+
+def test_failure_threshold_trips_once():
+    """Consecutive failures with nothing answering open each tier at the threshold"""
+    print("Testing the failure threshold...")
+    memo = _memo()
+    trips = []
+    for now in range(3):
+        for tier in memo.order("GONE", now):
+            trips.append(memo.record("GONE", tier, False, 0.5, now))
+    assert trips == [False] * 6 + [True] * 3
+    assert memo.order("GONE", 3) == []
+    assert memo.order("GONE", 60) == []
+    assert memo.order("GONE", 62) == list(TIERS)
+    # A failed probe reopens without reporting another trip
+    assert memo.record("GONE", "fast_info", False, 0.5, 62) is False
+    assert memo.order("GONE", 63) == ["info", "minute_bar"]
+    stats = memo.stats()
+    assert stats["fast_info"]["breakers_opened"] == 2 and stats["fast_info"]["success_rate"] == 0.0
+    assert stats["minute_bar"]["avg_ms"] == 500.0
+    print("✅ Tiers open at the threshold; the trip is reported once")
+
+
+def test_forget():
+    """A symbol dropped from the universe starts from scratch if it comes back"""
+    print("Testing forget()...")
+    memo = _memo()
+    _poll(memo, "TCS", {"minute_bar"}, now=0)
+    assert memo.order("TCS", 1) == ["minute_bar"]
+    memo.forget("TCS")
+    assert memo.preferred("TCS") is None and memo.order("TCS", 1) == list(TIERS)
+    assert memo.stats()["fast_info"]["breakers_open"] == 0
+    print("✅ Forgotten symbol tries every tier again")
+
+
+def main():
+    """Run fetch tier memo tests"""
+    print("🧪 QuantAlert Fetch Tier Test")
+    print("=" * 50)
+    test_steady_state_uses_working_tier()
+    test_half_open_probe()
+    test_failure_threshold_trips_once()
+    test_forget()
+    print("=" * 50)
+    print("✅ All fetch tier tests completed!")
+
+
+if __name__ == "__main__":
+    main()
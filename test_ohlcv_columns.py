@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Columnar OHLCV test for QuantAlert's /ohlcv formats
+Drives a private MarketDataManager (temporary DuckDB file) and checks that:
+  - get_ohlcv_columns returns the same bars as get_ohlcv (persisted and
+    in-memory), newest first, as parallel int64 paise arrays
+  - format=columns encodes them as parallel JSON arrays in rupees
+  - format=arrow (or the Arrow Accept header) returns an IPC stream when
+    pyarrow is installed, and 406 when it is not
+  - unknown formats are rejected and symbols without bars are 404
+No running API or market feed is required.
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import app.api as api
+from app.columnar import ARROW_STREAM_MEDIA_TYPE, ohlcv_arrow_stream, ohlcv_columns_json
+from app.config import Settings
+from app.market_data import MarketDataManager
+from app.prices import Paise
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_ohlcv_columns.duckdb")
+
+
+def _manager():
+    """A MarketDataManager of its own with two persisted minute bars and one open bar"""
+    for leftover in (DB_PATH, DB_PATH + ".wal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    market_data = MarketDataManager(Settings(
+        duckdb_path=DB_PATH,
+        tick_archive_path=os.path.join(tempfile.gettempdir(), "quantalert_ohlcv_columns_archive"),
+        quote_table_path=os.path.join(tempfile.gettempdir(), "quantalert_ohlcv_columns.shm"),
+    ))
+    minute = datetime.now().replace(second=0, microsecond=0)
+    for offset, (o, h, l, c) in ((3, (100.00, 101.50, 99.75, 101.25)), (2, (101.25, 102.00, 100.10, 100.55))):
+        market_data.db.execute(
+            "INSERT INTO ohlcv_1min VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ["COLS", o, h, l, c, 1_000 * offset, minute - timedelta(minutes=offset), "NSE"],
+        )
+    for price in (10_060, 10_080, 10_040):
+        market_data.update_ohlcv_1min("COLS", Paise(price), 7, "NSE")
+    return market_data
+
+
+def _request(accept=""):
+    return Request({"type": "http", "method": "GET", "path": "/ohlcv/COLS", "query_string": b"",
+                    "headers": [(b"accept", accept.encode())]})
+
+
+def _endpoint(market_data, **kwargs):
+    """Call the /ohlcv handler against `market_data` instead of the app's manager"""
+    accept = kwargs.pop("accept", "")
+    saved, api.market_data = api.market_data, market_data
+    try:
+        return api.get_ohlcv_data(_request(accept), kwargs.pop("symbol", "COLS"), minutes=10, **kwargs)
+    finally:
+        api.market_data = saved
+
+
+def test_columns_match_rows():
+    """Arrays carry the same bars as the row API, newest first"""
+    print("Testing get_ohlcv_columns against get_ohlcv...")
+    market_data = _manager()
+    try:
+        rows = market_data.get_ohlcv("COLS", 1, 10)
+        columns = market_data.get_ohlcv_columns("COLS", 1, 10)
+        assert len(rows) == 3 and all(len(values) == 3 for values in columns.values())
+        assert columns["close_price"].dtype == np.int64 and columns["volume"].dtype == np.int64
+        assert columns["timestamp"].astype(datetime).tolist() == [row.timestamp for row in rows]
+        for name in ("open_price", "high_price", "low_price", "close_price"):
+            assert columns[name].tolist() == [int(getattr(row, name) * 100) for row in rows], name
+        assert columns["volume"].tolist() == [21, 2_000, 3_000]
+        assert columns["exchange"].tolist() == ["NSE"] * 3
+        print("✅ Columns and rows agree")
+    finally:
+        market_data.close()
+
+
+def test_columns_json():
+    """format=columns: parallel arrays, rupee prices, ISO timestamps"""
+    print("Testing format=columns...")
+    market_data = _manager()
+    try:
+        response = _endpoint(market_data, timeframe="1m", format="columns")
+        assert response.media_type == "application/json"
+        body = json.loads(response.body)
+        rows = market_data.get_ohlcv("COLS", 1, 10)
+        assert (body["symbol"], body["timeframe_minutes"]) == ("COLS", 1)
+        assert body["timestamp"] == [row.timestamp.isoformat() for row in rows]
+        assert body["high_price"] == [float(row.high_price) for row in rows] == [100.8, 102.0, 101.5]
+        assert body["volume"] == [21, 2_000, 3_000] and body["exchange"] == ["NSE"] * 3
+        print("✅ Columns JSON matches the bars")
+    finally:
+        market_data.close()
+
+
+def test_arrow_stream():
+    """format=arrow or the Accept header: an IPC stream, or 406 without pyarrow"""
+    print("Testing format=arrow...")
+    market_data = _manager()
+    try:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            pa = None
+        for kwargs in ({"format": "arrow"}, {"accept": ARROW_STREAM_MEDIA_TYPE}):
+            try:
+                response = _endpoint(market_data, timeframe="1m", **kwargs)
+            except HTTPException as e:
+                assert pa is None and e.status_code == 406
+                continue
+            assert response.media_type == ARROW_STREAM_MEDIA_TYPE
+            table = pa.ipc.open_stream(response.body).read_all()
+            assert table.column("close_price").to_pylist() == [100.4, 100.55, 101.25]
+            assert table.schema.metadata[b"symbol"] == b"COLS"
+        if pa is None:
+            columns = market_data.get_ohlcv_columns("COLS", 1, 10)
+            try:
+                ohlcv_arrow_stream("COLS", 1, columns)
+            except ImportError:
+                pass
+            else:
+                raise AssertionError("Arrow output without pyarrow did not raise ImportError")
+            print("✅ 406 without pyarrow (not installed here)")
+        else:
+            print("✅ Arrow stream decodes to the same bars")
+    finally:
+        market_data.close()
+
+
+def test_rejected_requests():
+    """Unknown format or timeframe is 400; a symbol without bars is 404 in every format"""
+    print("Testing rejected /ohlcv requests...")
+    market_data = _manager()
+    try:
+        for kwargs, code in (({"timeframe": "1m", "format": "csv"}, 400), ({"timeframe": "7m"}, 400),
+                             ({"timeframe": "1m", "format": "columns", "symbol": "NONE"}, 404),
+                             ({"timeframe": "1m", "format": "rows", "symbol": "NONE"}, 404)):
+            try:
+                _endpoint(market_data, **kwargs)
+            except HTTPException as e:
+                assert e.status_code == code, (kwargs, e.status_code)
+            else:
+                raise AssertionError(f"{kwargs} was not rejected")
+        # No bars at all still encodes
+        empty = market_data.get_ohlcv_columns("NONE", 5, 10)
+        assert json.loads(ohlcv_columns_json("NONE", 5, empty))["timestamp"] == []
+        print("✅ Bad formats 400, unknown symbols 404")
+    finally:
+        market_data.close()
+
+
+def main():
+    """Run columnar OHLCV tests"""
+    print("🧪 QuantAlert OHLCV Columns Test")
+    print("=" * 50)
+    test_columns_match_rows()
+    test_columns_json()
+    test_arrow_stream()
+    test_rejected_requests()
+    print("=" * 50)
+    print("✅ All OHLCV column tests completed!")
+
+
+if __name__ == "__main__":
+    main()
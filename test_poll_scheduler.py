@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Adaptive polling test for QuantAlert's Yahoo feed scheduler and NSE calendar
+Drives PollScheduler on a fake clock and MarketCalendar with fixed instants,
+checking that:
+  - the next interval follows (distance / price / (z * sigma)) ** 2, clamped
+    to [min_seconds, max_seconds]; no rules or a failed fetch use max/base
+  - a volatile symbol is polled sooner than a quiet one at the same distance
+  - symbols due together are handed out together, once, and topped up to fill_to
+  - sync() adds and forgets symbols
+  - sessions skip weekends, built-in holidays and holiday-file dates
+No running API, network or market feed is required.
+"""
+
+import os
+import tempfile
+from datetime import date, datetime, timezone
+
+from app.market_calendar import IST, MarketCalendar, read_holidays
+from app.poll_scheduler import PollScheduler
+
+PRICE = 100_000
+
+
+def _scheduler(distances):
+    # z * sigma floor = 2e-4 per sqrt-second, so a 0.1% distance gives 25 s
+    scheduler = PollScheduler(min_seconds=2, base_seconds=8, max_seconds=60, z=2, min_volatility=1e-4)
+    scheduler.distance = lambda symbol, price: distances.get(symbol)
+    return scheduler
+
+
+def test_interval_clamp():
+    """Near, mid, far, rule-less and failed symbols get their own intervals"""
+    print("Testing poll interval clamping...")
+    scheduler = _scheduler({"NEAR": 10, "MID": 100, "FAR": 10_000})
+    scheduler.sync(["NEAR", "MID", "FAR", "NORULES", "FAILED"], now=0)
+    assert sorted(scheduler.due(now=0)) == ["FAILED", "FAR", "MID", "NEAR", "NORULES"]
+    intervals = {symbol: scheduler.observe(symbol, PRICE, now=0) for symbol in ("NEAR", "MID", "FAR", "NORULES")}
+    intervals["FAILED"] = scheduler.observe("FAILED", None, now=0)
+    assert intervals["NEAR"] == 2 and intervals["FAR"] == 60 and intervals["NORULES"] == 60
+    assert abs(intervals["MID"] - 25) < 1e-6 and intervals["FAILED"] == 8
+    assert scheduler.next_due() == 2
+    stats = scheduler.stats()
+    assert stats["polls"] == 5 and stats["at_min_interval"] == 1 and stats["at_max_interval"] == 2
+    # A symbol that was not handed out is not rescheduled
+    assert scheduler.observe("UNKNOWN", PRICE, now=0) == 0.0
+    print("✅ Intervals clamped to [min_seconds, max_seconds]")
+
+
+def test_volatility_shortens_interval():
+    """Large moves raise sigma, so the same distance is polled sooner"""
+    print("Testing volatility-driven intervals...")
+    scheduler = _scheduler({"QUIET": 100, "WILD": 100})
+    scheduler.sync(["QUIET", "WILD"], now=0)
+    scheduler.due(now=0)
+    scheduler.observe("QUIET", PRICE, now=0)
+    scheduler.observe("WILD", PRICE, now=0)
+    quiet = scheduler.observe("QUIET", PRICE, now=25)
+    wild = scheduler.observe("WILD", PRICE + 300, now=25)
+    assert abs(quiet - 25) < 1e-6 and 2 < wild < 5
+    print(f"✅ Volatile symbol polled every {wild:.1f}s, quiet one every {quiet:.1f}s")
+
+
+def test_due_batches():
+    """Symbols due within min_seconds share a poll; fill_to tops the request up"""
+    print("Testing due() batching...")
+    scheduler = _scheduler({})
+    scheduler.sync(["A", "B", "C", "D"], now=0)
+    for symbol, at in (("A", 0), ("B", 1), ("C", 10), ("D", 20)):
+        scheduler._schedule(symbol, at)
+    assert scheduler.due(now=0) == ["A", "B"]
+    assert scheduler.due(now=0) == []
+    scheduler._schedule("A", 30)
+    scheduler._schedule("B", 40)
+    assert scheduler.due(now=9, fill_to=3) == ["C", "D", "A"]
+    scheduler.sync(["B", "E"], now=50)
+    assert len(scheduler) == 2 and scheduler.due(now=50) == ["B", "E"]
+    # Dropped and re-added at the same instant: handed out once
+    scheduler.sync([], now=60)
+    scheduler.sync(["B"], now=60)
+    scheduler.sync([], now=60)
+    scheduler.sync(["B"], now=60)
+    assert scheduler.due(now=60) == ["B"]
+    print("✅ Due symbols grouped and topped up; sync() tracks the universe")
+
+
+def test_market_calendar():
+    """Weekends, NSE holidays and holiday-file dates are closed"""
+    print("Testing the NSE calendar...")
+    calendar = MarketCalendar.nse()
+    friday_close = datetime(2026, 1, 23, 15, 30, tzinfo=IST)
+    # Monday 26 January is Republic Day
+    assert calendar.next_open(friday_close) == datetime(2026, 1, 27, 9, 15, tzinfo=IST)
+    assert calendar.is_open(datetime(2026, 1, 23, 15, 29, tzinfo=IST))
+    assert not calendar.is_open(friday_close)
+    # 09:15 IST is 03:45 UTC
+    assert calendar.is_open(datetime(2026, 1, 27, 3, 45, tzinfo=timezone.utc))
+    assert calendar.seconds_until_open(datetime(2026, 1, 27, 3, 44, tzinfo=timezone.utc)) == 60
+    assert calendar.seconds_until_open(datetime(2026, 1, 27, 12, 0, tzinfo=IST)) == 0
+
+    path = os.path.join(tempfile.gettempdir(), "quantalert_nse_holidays.txt")
+    with open(path, "w") as handle:
+        handle.write("# NSE circular\n2026-01-27  # extra closure\n\n")
+    assert read_holidays(path) == {date(2026, 1, 27)}
+    extended = MarketCalendar.nse(path)
+    assert extended.next_open(friday_close) == datetime(2026, 1, 28, 9, 15, tzinfo=IST)
+    # An unreadable file keeps the built-in list
+    assert MarketCalendar.nse(path + ".missing").holidays == calendar.holidays
+    os.remove(path)
+    print("✅ Sessions skip weekends and holidays")
+
+
+def main():
+    """Run adaptive polling tests"""
+    print("🧪 QuantAlert Poll Scheduler Test")
+    print("=" * 50)
+    test_interval_clamp()
+    test_volatility_shortens_interval()
+    test_due_batches()
+    test_market_calendar()
+    print("=" * 50)
+    print("✅ All poll scheduler tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Latest-quote cache test for QuantAlert's /price endpoints
+Drives MarketDataManager directly and checks that:
+  - a tick is served from the cache before the tick writer flushed it
+  - repeats that the change-only filter does not store still refresh the quote
+  - broadcast quotes (record_quote) only ever move a symbol's quote forward
+  - a symbol missing from the cache is loaded from DuckDB once, then cached
+  - a newer quote in a worker's shared quote table wins over the local one,
+    also when the data directory's name contains glob characters
+The manager under test is private, on a temporary DuckDB file; the app's
+global one is left alone.
+No running API or market feed is required.
+"""
+
+import os
+import tempfile
+import time
+from functools import lru_cache
+from datetime import datetime, timedelta
+
+from app.config import Settings
+from app.market_data import MarketDataManager
+from app.prices import Paise
+from app.quote_table import QuoteTable, SharedQuoteReader
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_quote_cache.duckdb")
+QUOTE_TABLE_PATH = os.path.join(tempfile.gettempdir(), "quantalert_quote_cache.shm")
+
+
+@lru_cache(maxsize=None)
+def _market_data():
+    """This module's MarketDataManager, on a DuckDB file created fresh for the first test"""
+    for leftover in (DB_PATH, DB_PATH + ".wal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return MarketDataManager(Settings(
+        duckdb_path=DB_PATH,
+        quote_table_path=QUOTE_TABLE_PATH,
+        tick_archive_path=os.path.join(tempfile.gettempdir(), "quantalert_quote_cache_archive"),
+        # Ticks stay buffered unless a test flushes them
+        tick_flush_rows=1_000_000,
+        tick_flush_seconds=3600,
+    ))
+
+
+def _price(symbol):
+    price_data = _market_data().get_latest_price(symbol)
+    return None if price_data is None else int(price_data.price * 100)
+
+
+def test_tick_served_before_flush():
+    """store_tick makes the quote visible at once; nothing has reached DuckDB yet"""
+    print("Testing quotes of buffered ticks...")
+    market_data = _market_data()
+    market_data.store_tick("CACHEA", Paise(123_450), 10, "NSE")
+    assert _price("CACHEA") == 123_450
+    assert market_data.db.fetchone("SELECT count(*) FROM ticks WHERE symbol = 'CACHEA'")[0] == 0
+    print("✅ Latest quote served from the cache")
+
+
+def test_repeats_refresh_quote():
+    """A repeated tick is not stored, but its timestamp is the latest quote time"""
+    print("Testing repeated ticks...")
+    market_data = _market_data()
+    market_data.store_tick("CACHEB", Paise(50_000), 10, "NSE")
+    first = market_data.get_latest_price("CACHEB").timestamp
+    time.sleep(0.01)
+    market_data.store_tick("CACHEB", Paise(50_000), 10, "NSE")
+    assert market_data.get_latest_price("CACHEB").timestamp > first
+    assert market_data.tick_filter.held("CACHEB") is not None
+    print("✅ Repeats refresh the quote time")
+
+
+def test_record_quote_moves_forward():
+    """Out-of-order broadcasts never replace a newer quote"""
+    print("Testing broadcast quotes...")
+    market_data = _market_data()
+    now = datetime.now()
+    market_data.record_quote("CACHEC", Paise(1_000), 1, now)
+    market_data.record_quote("CACHEC", Paise(900), 1, now - timedelta(seconds=5))
+    assert _price("CACHEC") == 1_000
+    market_data.record_quote("CACHEC", Paise(1_100), 1, now + timedelta(seconds=1))
+    assert _price("CACHEC") == 1_100
+    print("✅ Older broadcast ignored, newer one taken")
+
+
+def test_miss_loads_from_duckdb_once():
+    """A cold symbol is read from the ticks table, then answered from the cache"""
+    print("Testing cache misses...")
+    market_data = _market_data()
+    market_data.store_tick("CACHED", Paise(77_700), 3, "BSE")
+    market_data.flush_ticks()
+    del market_data._quotes["CACHED"]
+
+    assert _price("CACHED") == 77_700
+    assert "CACHED" in market_data._quotes
+    assert market_data.get_latest_price("NOSUCH") is None
+    assert [p.symbol for p in market_data.get_latest_prices(["CACHED", "NOSUCH", "CACHED"])] == ["CACHED"]
+    print("✅ Miss loaded once; unknown symbols left out")
+
+
+def test_shared_table_newer_wins():
+    """API side: a worker's newer quote in the shared table beats the local cache, an older one does not"""
+    print("Testing the shared quote table...")
+    market_data = _market_data()
+    writer = QuoteTable.create(f"{QUOTE_TABLE_PATH}.worker1", 16)
+    try:
+        market_data.shared_quotes._scan(force=True)
+        market_data.record_quote("CACHEE", Paise(2_000), 1, datetime.now())
+        writer.publish("CACHEE", 2_100, 1, datetime.now() + timedelta(seconds=1), "NSE")
+        assert _price("CACHEE") == 2_100
+        writer.publish("CACHEE", 1_900, 1, datetime.now() - timedelta(minutes=1), "NSE")
+        assert _price("CACHEE") == 2_000
+    finally:
+        writer.remove()
+    print("✅ Newest of local and shared quote served")
+
+
+def test_reader_path_with_glob_characters():
+    """A data directory named like a glob pattern still finds the worker's table"""
+    print("Testing a quote table path with glob characters...")
+    directory = tempfile.mkdtemp(prefix="quotes[1]*")
+    path = os.path.join(directory, "quotes.shm")
+    writer = QuoteTable.create(f"{path}.worker1", 16)
+    try:
+        writer.publish("CACHEF", 3_000, 1, datetime.now(), "NSE")
+        assert SharedQuoteReader(path).get("CACHEF")[0] == 3_000
+    finally:
+        writer.remove()
+        os.rmdir(directory)
+    print("✅ Path escaped before globbing")
+
+
+def main():
+    """Run latest-quote cache tests"""
+    print("🧪 QuantAlert Latest-Quote Cache Test")
+    print("=" * 50)
+    test_tick_served_before_flush()
+    test_repeats_refresh_quote()
+    test_record_quote_moves_forward()
+    test_miss_loads_from_duckdb_once()
+    test_shared_table_newer_wins()
+    test_reader_path_with_glob_characters()
+    print("=" * 50)
+    print("✅ All latest-quote cache tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+RuleIndex test for QuantAlert's alert evaluation
+Checks the resident threshold index against a plain per-rule evaluation:
+  - every condition at exactly the target, one paisa either side of it
+  - the bisect index, the columnar snapshot pass and condition_holds agree
+  - shared thresholds collapse into one predicate and survive removal
+  - cross rules fire once on the move over the target, level rules on every tick
+No running API, database or market feed is required.
+"""
+
+import random
+from decimal import Decimal
+
+from app.prices import to_paise
+from app.rule_index import CachedRule, RuleIndex, _ThresholdBook, condition_holds
+
+CONDITIONS = (">", ">=", "<", "<=", "==")
+TARGET = Decimal("2500.50")
+TARGET_PAISE = 250050
+
+
+def _rule(rule_id, condition, target=TARGET, symbol="TCS", trigger_mode="level"):
+    return CachedRule(
+        id=rule_id, user_id=rule_id, email="", symbol=symbol, condition_type=condition,
+        target_price=target, trigger_mode=trigger_mode,
+    )
+
+
+def _expected(rules, symbol, price):
+    return sorted(
+        rule.id for rule in rules
+        if rule.symbol == symbol and rule.trigger_mode == "level"
+        and condition_holds(rule.condition_type, rule.target_paise, price)
+    )
+
+
+def test_boundaries_at_target():
+    """`>` vs `>=` and `<` vs `<=` differ exactly at the target; `==` only matches it"""
+    print("Testing condition boundaries at the target price...")
+    index = RuleIndex()
+    index.load([_rule(i, condition) for i, condition in enumerate(CONDITIONS)])
+    ids = {condition: i for i, condition in enumerate(CONDITIONS)}
+
+    expected = {
+        TARGET_PAISE - 1: {"<", "<="},
+        TARGET_PAISE: {">=", "<=", "=="},
+        TARGET_PAISE + 1: {">", ">="},
+    }
+    for price, holding in expected.items():
+        hits = sorted(index.match_ids("TCS", price))
+        assert hits == sorted(ids[c] for c in holding), f"at {price}: {hits}"
+    assert to_paise(TARGET) == TARGET_PAISE
+    print("✅ Boundaries at target - 1, target and target + 1 paisa")
+
+
+def test_index_matches_plain_evaluation():
+    """Random rules and prices: bisect index and columnar pass equal condition_holds per rule"""
+    print("Testing index against per-rule evaluation...")
+    rng = random.Random(1)
+    symbols = ["AAA", "BBB", "CCC"]
+    rules = [
+        _rule(i, rng.choice(CONDITIONS), Decimal(rng.randint(9_990, 10_010)) / 100, rng.choice(symbols))
+        for i in range(400)
+    ]
+    index = RuleIndex()
+    index.load(rules)
+    columnar = RuleIndex(columnar=True)
+    columnar.load(rules)
+
+    for _ in range(200):
+        snapshot = {symbol: rng.randint(9_985, 10_015) for symbol in symbols}
+        expected = []
+        for symbol, price in snapshot.items():
+            hits = sorted(index.match_ids(symbol, price))
+            assert hits == _expected(rules, symbol, price), f"{symbol} at {price}"
+            expected += hits
+        assert sorted(columnar.match_snapshot_ids(snapshot)) == sorted(expected), snapshot
+    print("✅ 200 snapshots x 3 symbols agree with condition_holds")
+
+
+def test_upsert_and_remove():
+    """Moving a rule's target or condition re-books it; removed rules never match"""
+    print("Testing upsert and remove...")
+    index = RuleIndex()
+    index.load([_rule(1, ">"), _rule(2, ">")])
+    index.upsert(_rule(2, "<", Decimal("2400.00")))
+    assert index.match_ids("TCS", TARGET_PAISE + 1) == [1]
+    assert index.match_ids("TCS", 239_999) == [2]
+    index.remove(1)
+    assert index.match_ids("TCS", TARGET_PAISE + 1) == []
+    assert 1 not in index and len(index) == 1
+    print("✅ Updated rules re-booked, removed rules gone")
+
+
+def test_shared_thresholds():
+    """Equal thresholds count as one predicate until their last subscriber leaves"""
+    print("Testing shared thresholds...")
+    book = _ThresholdBook()
+    for rule_id, threshold in enumerate([100, 200, 200, 200, 300]):
+        book.add(threshold, rule_id)
+    assert book.thresholds == [100, 200, 200, 200, 300] and book.distinct == 3
+    assert book.remove(200, 2) and book.distinct == 3
+    assert book.remove(200, 1) and book.distinct == 3
+    assert not book.remove(200, 1)
+    assert book.remove(200, 3) and book.distinct == 2
+    assert book.thresholds == [100, 300] and book.rule_ids == [0, 4]
+
+    index = RuleIndex()
+    index.load([_rule(i, ">") for i in range(50)] + [_rule(50, "<")])
+    assert index.stats()["predicates"] == 2 and index.stats()["rules"] == 51
+    assert sorted(index.match_ids("TCS", TARGET_PAISE + 1)) == list(range(50))
+    print("✅ 51 rules evaluated as 2 predicates")
+
+
+def test_threshold_distance():
+    """Distance in paise from a price to the nearest threshold of the symbol"""
+    print("Testing threshold distance...")
+    index = RuleIndex()
+    index.load([_rule(1, ">", Decimal("100.00")), _rule(2, "<", Decimal("105.00"))])
+    assert index.threshold_distance("TCS", 10_200) == 200
+    assert index.threshold_distance("TCS", 10_499) == 1
+    assert index.threshold_distance("INFY", 10_000) is None
+    print("✅ Nearest threshold found on either side")
+
+
+def _crossings(index, prices, symbol="TCS"):
+    """Rule ids matched per tick of `prices`, each tick compared with the one before"""
+    fired, previous = [], None
+    for price in prices:
+        fired.append(sorted(rule.id for rule in index.match(symbol, price, previous)))
+        previous = price
+    return fired
+
+
+def test_cross_versus_level():
+    """A level rule fires on every tick past the target, a cross rule only on the tick that gets there"""
+    print("Testing cross versus level triggering...")
+    index = RuleIndex()
+    index.load([_rule(1, ">="), _rule(2, ">=", trigger_mode="cross")])
+    prices = [TARGET_PAISE - 5, TARGET_PAISE, TARGET_PAISE + 3, TARGET_PAISE - 1, TARGET_PAISE + 1]
+    assert _crossings(index, prices) == [[], [1, 2], [1], [], [1, 2]], _crossings(index, prices)
+
+    # Landing exactly on the target crosses ">=" but not ">"; "<" crosses on the way down
+    index.load([_rule(3, ">", trigger_mode="cross"), _rule(4, "<", trigger_mode="cross")])
+    assert _crossings(index, [TARGET_PAISE - 1, TARGET_PAISE, TARGET_PAISE + 1]) == [[], [], [3]]
+    assert _crossings(index, [TARGET_PAISE + 1, TARGET_PAISE, TARGET_PAISE - 1]) == [[], [], [4]]
+    # A jump across several thresholds fires each of them once
+    index.load([_rule(i, ">", Decimal(100 + i), trigger_mode="cross") for i in range(5)])
+    assert _crossings(index, [10_000, 10_350, 10_500]) == [[], [0, 1, 2, 3], [4]]
+    print("✅ Cross rules fire on the crossing tick only")
+
+
+def test_cross_needs_previous_price():
+    """Without a previous price (first tick, restart) a cross rule cannot fire; the columnar pass agrees"""
+    print("Testing cross rules without history...")
+    rules = [_rule(1, ">"), _rule(2, ">", trigger_mode="cross"), _rule(3, "<=", trigger_mode="cross")]
+    for index in (RuleIndex(), RuleIndex(columnar=True)):
+        index.load(rules)
+        above = {"TCS": TARGET_PAISE + 1}
+        assert sorted(index.match_snapshot_ids(above)) == [1]
+        assert sorted(index.match_snapshot_ids(above, {"TCS": TARGET_PAISE})) == [1, 2]
+        assert sorted(index.match_snapshot_ids(above, {"TCS": TARGET_PAISE + 2})) == [1]
+        assert sorted(index.match_snapshot_ids({"TCS": TARGET_PAISE}, above)) == [3]
+    print("✅ Cross rules wait for a previous price")
+
+
+def main():
+    """Run rule index tests"""
+    print("🧪 QuantAlert Rule Index Test")
+    print("=" * 50)
+    test_boundaries_at_target()
+    test_index_matches_plain_evaluation()
+    test_upsert_and_remove()
+    test_shared_thresholds()
+    test_threshold_distance()
+    test_cross_versus_level()
+    test_cross_needs_previous_price()
+    print("=" * 50)
+    print("✅ All rule index tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Rule change stream test for QuantAlert's worker rule cache
+Edits rules the way the API does (rule write plus an alert_rule_changes row
+in one transaction) on a temporary SQLite database and checks that the
+worker's delta sync:
+  - adds created rules, re-books updated ones and drops deactivated/deleted ones
+  - cancels the cooldown of a rule that left the index
+  - picks up a change id committed out of order below its version, once
+  - wakes up on a PostgreSQL NOTIFY (listener driven by a stand-in connection)
+No running API, PostgreSQL or market feed is required.
+"""
+
+import os
+import tempfile
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import AlertRule, AlertRuleChange, User
+from app.rule_changes import RuleChangeListener, record_rule_change
+from app.worker import AlertWorker
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_rule_sync.db")
+
+
+def _setup():
+    """Fresh database with one user, and a worker reading from it"""
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(User(id=1, email="sync@example.com", password_hash="x"))
+    db.commit()
+    worker = AlertWorker()
+    worker._new_db_session = Session
+    return db, worker
+
+
+def _sync(worker):
+    deltas = worker._fetch_rule_deltas(worker.rule_sync_stats.version)
+    return worker._apply_rule_deltas(deltas) if deltas else 0
+
+
+def _add_rule(db, rule_id, target, symbol="TCS"):
+    db.add(AlertRule(id=rule_id, user_id=1, symbol=symbol, condition_type=">", target_price=Decimal(target)))
+    db.flush()
+    record_rule_change(db, rule_id)
+    db.commit()
+
+
+def test_create_update_delete():
+    """API edits reach the index as row-level deltas"""
+    print("Testing rule deltas...")
+    db, worker = _setup()
+    _add_rule(db, 1, "100.00")
+    _add_rule(db, 2, "200.00", "INFY")
+    assert _sync(worker) == 2
+    assert worker.rule_index.match_ids("TCS", 10_001) == [1]
+
+    rule = db.get(AlertRule, 1)
+    rule.target_price = Decimal("150.00")
+    record_rule_change(db, 1)
+    db.commit()
+    assert _sync(worker) == 1
+    assert worker.rule_index.match_ids("TCS", 10_001) == []
+    assert worker.rule_index.match_ids("TCS", 15_001) == [1]
+
+    worker.cooldowns.start(2, 4_000_000_000)
+    db.get(AlertRule, 2).is_active = False
+    record_rule_change(db, 2)
+    db.delete(db.get(AlertRule, 1))
+    record_rule_change(db, 1, "delete")
+    db.commit()
+    assert _sync(worker) == 2
+    assert len(worker.rule_index) == 0 and len(worker.cooldowns) == 0
+    assert _sync(worker) == 0
+    assert worker.rule_sync_stats.snapshot()["applied"] == 5
+    db.close()
+    print("✅ Created, updated, deactivated and deleted rules applied")
+
+
+def test_out_of_order_commit():
+    """A change id below the applied version (slow transaction) is applied once, not skipped"""
+    print("Testing change ids committed out of order...")
+    db, worker = _setup()
+    _add_rule(db, 1, "100.00")
+    _add_rule(db, 2, "200.00")
+    db.query(AlertRuleChange).filter(AlertRuleChange.id == 1).delete()
+    db.commit()
+    # Only change 2 is visible yet; change 1's transaction "commits" afterwards
+    assert _sync(worker) == 1 and worker.rule_sync_stats.version == 2
+    assert sorted(worker.rule_index.match_ids("TCS", 30_000)) == [2]
+    db.add(AlertRuleChange(id=1, alert_rule_id=1, op="upsert"))
+    db.commit()
+    assert _sync(worker) == 1
+    assert sorted(worker.rule_index.match_ids("TCS", 30_000)) == [1, 2]
+    assert _sync(worker) == 0
+    db.close()
+    print("✅ Late change picked up from the overlap window, once")
+
+
+class _NotifyingConnection:
+    """Stands in for a psycopg2 connection in autocommit LISTEN mode"""
+
+    def __init__(self):
+        self.notifies = []
+        self.polls = 0
+
+    def poll(self):
+        self.polls += 1
+
+
+def test_notify_wakes_worker():
+    """Each readable NOTIFY batch calls on_notify once and is consumed"""
+    print("Testing NOTIFY wake-ups...")
+    woken = []
+    listener = RuleChangeListener(lambda: woken.append(True))
+    listener._conn = _NotifyingConnection()
+    listener._conn.notifies.extend(["alert_rule_changes", "alert_rule_changes"])
+    listener._on_readable()
+    assert woken == [True] and listener._conn.notifies == []
+    listener._on_readable()
+    assert woken == [True] and listener._conn.polls == 2
+    # The app database here is SQLite, which keeps to polling
+    assert RuleChangeListener(lambda: None).start(None) is False
+    print("✅ NOTIFY batches wake the sync loop once each")
+
+
+def main():
+    """Run rule change stream tests"""
+    print("🧪 QuantAlert Rule Sync Test")
+    print("=" * 50)
+    test_create_update_delete()
+    test_out_of_order_commit()
+    test_notify_wakes_worker()
+    print("=" * 50)
+    print("✅ All rule sync tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script for QuantAlert worker sharding
+Runs N local worker processes against a shared SQLite lease table and checks that:
+  - every symbol shard is owned by exactly one worker
+  - a joining worker only moves a small share of the shards
+  - per-worker symbol/rule load (and evaluation CPU) shrinks roughly as 1/N
+No running API or market feed is required.
+"""
+
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_sharding_test.db")
+# Passed to every worker explicitly, never through the environment other tests share
+DATABASE_URL = f"sqlite:///{DB_PATH}"
+
+NUM_SHARDS = 64
+NUM_SYMBOLS = 400
+NUM_RULES = 100_000
+HEARTBEAT_SECONDS = 0.3
+LEASE_SECONDS = 15
+EVAL_ROUNDS = 5
+
+
+def _symbols():
+    return [f"SYM{i:04d}" for i in range(NUM_SYMBOLS)]
+
+
+def _rules():
+    from app.rule_index import CachedRule
+
+    rng = random.Random(7)
+    symbols = _symbols()
+    return [
+        CachedRule(
+            id=i, user_id=i % 100, email="", symbol=symbols[rng.randrange(NUM_SYMBOLS)],
+            condition_type=rng.choice((">", ">=", "<", "<=")),
+            target_price=Decimal(rng.randint(10_000, 20_000)) / 100,
+        )
+        for i in range(NUM_RULES)
+    ]
+
+
+def _worker(worker_id, database_url, states, stop, evaluate, results):
+    """One local worker process: heartbeat leases, then evaluate its own slice on request"""
+    from sqlalchemy import create_engine
+    from app.sharding import ShardCoordinator, shard_of
+    from app.rule_index import RuleIndex
+
+    rules = _rules()
+    engine = create_engine(database_url, connect_args={"timeout": 30})
+    coordinator = ShardCoordinator(worker_id, engine, num_shards=NUM_SHARDS, lease_seconds=LEASE_SECONDS)
+    evaluated = False
+    while not stop.is_set():
+        coordinator.heartbeat()
+        states[worker_id] = sorted(coordinator.owned)
+        if evaluate.is_set() and not evaluated:
+            owned = set(coordinator.owned)
+            mine = [rule for rule in rules if shard_of(rule.symbol, NUM_SHARDS) in owned]
+            index = RuleIndex()
+            index.load(mine)
+            snapshot = {s: 15_000 for s in _symbols() if shard_of(s, NUM_SHARDS) in owned}
+            start = time.process_time()
+            for _ in range(EVAL_ROUNDS):
+                for symbol, price in snapshot.items():
+                    index.match_ids(symbol, price)
+            results[worker_id] = (len(snapshot), len(mine), (time.process_time() - start) / EVAL_ROUNDS)
+            evaluated = True
+        time.sleep(HEARTBEAT_SECONDS)
+    coordinator.release_all()
+
+
+def _settle(states, worker_ids, timeout=30.0):
+    """Wait until the given workers own disjoint shards covering all of them"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        owned = [set(states.get(w, ())) for w in worker_ids]
+        union = set().union(*owned)
+        settled = all(owned) and sum(len(o) for o in owned) == NUM_SHARDS
+        if settled and len(union) == NUM_SHARDS:
+            return {w: o for w, o in zip(worker_ids, owned)}
+        time.sleep(HEARTBEAT_SECONDS)
+    raise AssertionError(f"shards did not settle: { {w: len(states.get(w, ())) for w in worker_ids} }")
+
+
+def _fresh_db():
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    from sqlalchemy import create_engine
+    from app.sharding import ensure_lease_table
+    ensure_lease_table(create_engine(DATABASE_URL))
+
+
+def _run_cluster(n_workers, ctx):
+    """Start n workers, let them settle, measure their slices, then add one more"""
+    _fresh_db()
+    manager = ctx.Manager()
+    states, results = manager.dict(), manager.dict()
+    stop, evaluate = ctx.Event(), ctx.Event()
+    worker_ids = [f"w{i}" for i in range(n_workers)]
+    procs = [ctx.Process(target=_worker, args=(w, DATABASE_URL, states, stop, evaluate, results)) for w in worker_ids]
+    for p in procs:
+        p.start()
+    try:
+        before = _settle(states, worker_ids)
+        evaluate.set()
+        deadline = time.time() + 120
+        while len(results) < n_workers and time.time() < deadline:
+            time.sleep(0.2)
+        measured = dict(results)
+
+        # Join: one more worker should only take over roughly 1/(n+1) of the shards
+        joiner = f"w{n_workers}"
+        idle = ctx.Event()
+        extra = ctx.Process(target=_worker, args=(joiner, DATABASE_URL, states, stop, idle, results))
+        extra.start()
+        procs.append(extra)
+        after = _settle(states, worker_ids + [joiner])
+        moved = sum(len(before[w] - after[w]) for w in worker_ids)
+        return before, measured, moved
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(timeout=10)
+        manager.shutdown()
+
+
+def test_sharding_scales_with_processes():
+    """Shard ownership is exclusive, rebalancing is cheap and load per worker drops ~1/N"""
+    print("Testing symbol-sharded workers with local processes...")
+    ctx = mp.get_context("spawn")
+    baseline_cpu = None
+    for n in (1, 2, 4):
+        owned, measured, moved = _run_cluster(n, ctx)
+        assert set().union(*owned.values()) == set(range(NUM_SHARDS))
+        assert len(measured) == n, f"only {len(measured)}/{n} workers reported"
+
+        symbols = [m[0] for m in measured.values()]
+        rules = [m[1] for m in measured.values()]
+        cpu = max(m[2] for m in measured.values())
+        baseline_cpu = baseline_cpu or cpu
+        assert sum(symbols) == NUM_SYMBOLS and sum(rules) == NUM_RULES
+        # Consistent hashing is not perfectly even; allow generous slack
+        assert max(rules) <= NUM_RULES / n * 1.8
+
+        # Ideal is NUM_SHARDS/(n+1); a modulo assignment would move most shards
+        assert moved <= NUM_SHARDS / (n + 1) * 2.0, f"join moved {moved} shards"
+
+        print(f"✅ {n} worker(s): max {max(symbols)} symbols / {max(rules):,} rules per worker, "
+              f"slowest slice {cpu * 1000:.1f}ms CPU, capacity x{baseline_cpu / cpu:.2f}, "
+              f"join moved {moved}/{NUM_SHARDS} shards")
+
+
+def main():
+    """Run sharding tests"""
+    print("🧪 QuantAlert Worker Sharding Test")
+    print("=" * 50)
+    test_sharding_scales_with_processes()
+    print("=" * 50)
+    print("✅ All sharding tests completed!")
+
+
+if __name__ == "__main__":
+    main()
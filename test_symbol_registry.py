@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Symbol registry test for QuantAlert's /symbols metadata
+Drives a private MarketDataManager (temporary DuckDB file) and checks that:
+  - the `symbols` table is upserted with each tick flush, and stored_ticks
+    matches the rows in tick history, not the ticks offered (change-only
+    filter repeats are not counted)
+  - the in-memory registry, a fresh load of the table and
+    get_symbol_details agree
+  - a late batch moves first_seen back without replacing the last price
+  - an empty table is rebuilt from tick history on load
+No running API or market feed is required.
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app.config import Settings
+from app.market_data import MarketDataManager
+from app.prices import Paise
+from app.symbol_registry import UPSERT_SQL, SymbolRegistry
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_symbol_registry.duckdb")
+
+
+def _manager():
+    """A MarketDataManager of its own; ticks stay buffered until a test flushes them"""
+    for leftover in (DB_PATH, DB_PATH + ".wal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return MarketDataManager(Settings(
+        duckdb_path=DB_PATH,
+        tick_archive_path=os.path.join(tempfile.gettempdir(), "quantalert_symbol_registry_archive"),
+        quote_table_path=os.path.join(tempfile.gettempdir(), "quantalert_symbol_registry.shm"),
+        tick_flush_rows=1_000_000,
+        tick_flush_seconds=3600,
+    ))
+
+
+def _table(market_data, symbol):
+    return market_data.db.fetchone("""
+        SELECT exchange, first_seen, last_seen, stored_ticks, CAST(last_price * 100 AS BIGINT)
+        FROM symbols WHERE symbol = ?
+    """, [symbol])
+
+
+def _history_rows(market_data, symbol):
+    return market_data.db.fetchone("SELECT count(*) FROM ticks WHERE symbol = ?", [symbol])[0]
+
+
+def test_upsert_counts_stored_ticks():
+    """Each flush adds the stored rows of its batch; memory, table and API agree"""
+    print("Testing the symbols upsert...")
+    market_data = _manager()
+    try:
+        offered = [10_000, 10_000, 10_000, 10_000, 10_050, 10_050, 10_100]
+        for price in offered:
+            market_data.store_tick("REGA", Paise(price), 5, "NSE")
+        market_data.store_tick("REGB", Paise(50_000), 1, "BSE")
+        market_data.flush_ticks()
+        stored = _history_rows(market_data, "REGA")
+        assert 0 < stored < len(offered)
+        exchange, first_seen, last_seen, stored_ticks, last_price = _table(market_data, "REGA")
+        assert (exchange, stored_ticks, last_price) == ("NSE", stored, 10_100)
+        assert {i.symbol: i.stored_ticks for i in market_data.symbol_registry.infos()}["REGA"] == stored
+
+        # Second flush goes through the ON CONFLICT path and adds to the count
+        for price in (10_150, 10_200):
+            market_data.store_tick("REGA", Paise(price), 5, "NSE")
+        market_data.flush_ticks()
+        stored = _history_rows(market_data, "REGA")
+        assert _table(market_data, "REGA")[3] == stored and _table(market_data, "REGA")[1] == first_seen
+
+        reloaded = SymbolRegistry(market_data.db)
+        reloaded.load()
+        assert [(i.symbol, i.exchange, i.stored_ticks, i.last_price) for i in reloaded.infos()] == [
+            ("REGA", "NSE", stored, 10_200), ("REGB", "BSE", 1, 50_000),
+        ]
+        details = {d.symbol: d for d in market_data.get_symbol_details()}
+        assert details["REGA"].stored_ticks == stored and str(details["REGA"].last_price) == "102.00"
+        print(f"✅ stored_ticks = {stored} rows for {len(offered) + 2} ticks offered")
+    finally:
+        market_data.close()
+
+
+def test_late_batch_keeps_last_price():
+    """A batch older than the table's last_seen widens first_seen only"""
+    print("Testing a late tick batch...")
+    market_data = _manager()
+    try:
+        market_data.store_tick("REGC", Paise(20_000), 1, "NSE")
+        market_data.flush_ticks()
+        _, first_seen, last_seen, _, _ = _table(market_data, "REGC")
+        late = pd.DataFrame({
+            "symbol": ["REGC", "REGC"],
+            "price": [19_000, 19_500],
+            "volume": [1, 1],
+            "timestamp": [first_seen - timedelta(hours=2), first_seen - timedelta(hours=1)],
+            "exchange": ["BSE", "BSE"],
+        })
+
+        def upsert(cursor):
+            cursor.register("late_batch", late)
+            try:
+                cursor.execute(UPSERT_SQL.format(view="late_batch"))
+            finally:
+                cursor.unregister("late_batch")
+
+        market_data.db.write(upsert)
+        _, new_first, new_last, stored_ticks, last_price = _table(market_data, "REGC")
+        assert new_first == first_seen - timedelta(hours=2) and new_last == last_seen
+        assert stored_ticks == 3 and last_price == 20_000
+        print("✅ Late batch counted without replacing the last price")
+    finally:
+        market_data.close()
+
+
+def test_backfill_from_history():
+    """An empty symbols table is rebuilt from the ticks table on load"""
+    print("Testing the one-time backfill...")
+    market_data = _manager()
+    try:
+        start = datetime(2026, 1, 5, 9, 15)
+        for i, price in enumerate((1_000.25, 1_001.50, 999.75)):
+            market_data.db.execute(
+                "INSERT INTO ticks (symbol, price, volume, timestamp, exchange) VALUES (?, ?, ?, ?, ?)",
+                ["REGD", price, 1, start + timedelta(seconds=i), "NSE"],
+            )
+        registry = SymbolRegistry(market_data.db)
+        registry.load(["ticks"])
+        info = {i.symbol: i for i in registry.infos()}["REGD"]
+        assert (info.stored_ticks, info.last_price, info.first_seen) == (3, 99_975, start)
+        print("✅ Registry rebuilt from tick history")
+    finally:
+        market_data.close()
+
+
+def main():
+    """Run symbol registry tests"""
+    print("🧪 QuantAlert Symbol Registry Test")
+    print("=" * 50)
+    test_upsert_counts_stored_ticks()
+    test_late_batch_keeps_last_price()
+    test_backfill_from_history()
+    print("=" * 50)
+    print("✅ All symbol registry tests completed!")
+
+
+if __name__ == "__main__":
+    main()
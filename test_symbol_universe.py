@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Symbol universe test for QuantAlert's demand-driven feed subscriptions
+Checks the pieces that decide which symbols the feeds poll:
+  - normalize_symbols / parse_symbol_list clean and de-duplicate input
+  - WatchRegistry keeps per-client watches, capped, and forgets clients
+  - SymbolUniverse.update unions rules, watches and config symbols and
+    reports only what changed since the last update
+  - diff_symbols keeps existing feed mappings, and the Yahoo feed forgets
+    the fetch tiers of symbols it stops polling
+No running API, network or market feed is required.
+"""
+
+from app.symbol_universe import (
+    SymbolUniverse,
+    WatchRegistry,
+    diff_symbols,
+    normalize_symbols,
+    parse_symbol_list,
+)
+from app.yahoo_feed import YahooFinanceFeed, yahoo_symbol
+
+
+def test_normalize_symbols():
+    """Case, whitespace, duplicates and malformed names"""
+    print("Testing symbol normalisation...")
+    assert normalize_symbols([" tcs", "TCS", "m&m", "^nsei", "infy.ns", "bad symbol", "", "DROP;TABLE"]) == [
+        "TCS", "M&M", "^NSEI", "INFY.NS",
+    ]
+    assert parse_symbol_list("reliance, tcs,,RELIANCE") == ["RELIANCE", "TCS"]
+    assert parse_symbol_list(None) == [] and parse_symbol_list("") == []
+    print("✅ Symbols normalised")
+
+
+def test_watch_registry():
+    """Watches are replaced per client, capped at the limit and dropped with the client"""
+    print("Testing the watch registry...")
+    registry = WatchRegistry(limit=2)
+    assert registry.watch("a", ["tcs", "infy", "sbin"]) == ["TCS", "INFY"]
+    registry.watch("b", ["INFY", "ITC"])
+    assert registry.symbols() == ["INFY", "ITC", "TCS"]
+    registry.watch("a", ["SBIN"])
+    assert registry.symbols() == ["INFY", "ITC", "SBIN"]
+    assert registry.watch("b", ["not a symbol"]) == []
+    assert registry.symbols() == ["SBIN"]
+    registry.forget("a")
+    registry.forget("unknown")
+    assert registry.symbols() == []
+    print("✅ Per-client watches tracked")
+
+
+def test_universe_update():
+    """Only the difference since the last update is reported"""
+    print("Testing universe updates...")
+    universe = SymbolUniverse(static=["nifty50"])
+    assert universe.update(rule_symbols=["TCS", "INFY"]) == (["INFY", "NIFTY50", "TCS"], [])
+    assert universe.update(watched=["tcs", "sbin"]) == (["SBIN"], [])
+    # Same sources again: nothing to do, no change counted
+    assert universe.update(rule_symbols=["INFY", "TCS"]) == ([], [])
+    # A rule symbol still watched stays; the static one never leaves
+    assert universe.update(rule_symbols=[]) == ([], ["INFY"])
+    assert universe.update(watched=[]) == ([], ["SBIN", "TCS"])
+    assert universe.symbols() == ["NIFTY50"]
+    assert universe.stats() == {"symbols": 1, "from_rules": 0, "watched": 0, "static": 1, "changes": 4}
+    print("✅ Universe diffs reported once")
+
+
+def test_feed_symbol_diff():
+    """Existing mappings survive; dropped symbols lose their fetch-tier state"""
+    print("Testing feed symbol diffs...")
+    mapping, added, removed = diff_symbols({"TCS": "TCS.BO", "OLD": "OLD.NS"}, ["TCS", "INFY"], yahoo_symbol)
+    assert mapping == {"TCS": "TCS.BO", "INFY": "INFY.NS"}
+    assert added == ["INFY"] and removed == ["OLD"]
+    assert yahoo_symbol("^NSEI") == "^NSEI" and yahoo_symbol("SBIN.BO") == "SBIN.BO"
+
+    feed = YahooFinanceFeed()
+    feed.tier_memo.record("RELIANCE", "info", True, 0.01)
+    assert feed.tier_memo.preferred("RELIANCE") == "info"
+    added, removed = feed.set_symbols(["TCS", "ZOMATO"])
+    assert added == ["ZOMATO"] and "RELIANCE" in removed and "TCS" not in removed
+    assert feed.symbols == {"TCS": "TCS.NS", "ZOMATO": "ZOMATO.NS"}
+    assert feed.tier_memo.preferred("RELIANCE") is None
+    assert feed.set_symbols(["TCS", "ZOMATO"]) == ([], [])
+    print("✅ Feed follows the universe and forgets dropped symbols")
+
+
+def main():
+    """Run symbol universe tests"""
+    print("🧪 QuantAlert Symbol Universe Test")
+    print("=" * 50)
+    test_normalize_symbols()
+    test_watch_registry()
+    test_universe_update()
+    test_feed_symbol_diff()
+    print("=" * 50)
+    print("✅ All symbol universe tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Change-only tick filter test for QuantAlert's tick storage
+Offers tick streams to ChangeOnlyFilter and checks that:
+  - a tick is stored when its price, volume or exchange changes
+  - a run of repeats keeps its first tick and its latest repeat, in order
+  - the held end of an open run is returned by drain() (shutdown) exactly once
+  - symbols are filtered independently, and disabling the filter stores everything
+No running API, database or market feed is required.
+"""
+
+from datetime import datetime, timedelta
+
+from app.tick_filter import ChangeOnlyFilter
+
+START = datetime(2024, 3, 14, 9, 15)
+
+
+def _quotes(prices, volume=10, exchange="NSE"):
+    return [(price, volume, START + timedelta(seconds=i), exchange) for i, price in enumerate(prices)]
+
+
+def _stored(tick_filter, symbol, quotes):
+    stored = []
+    for quote in quotes:
+        stored.extend(tick_filter.offer(symbol, quote))
+    return stored
+
+
+def test_changes_are_stored():
+    """Every tick that differs from the previous one in price, volume or exchange is stored at once"""
+    print("Testing changed ticks...")
+    tick_filter = ChangeOnlyFilter()
+    quotes = [
+        (10_000, 10, START, "NSE"),
+        (10_005, 10, START + timedelta(seconds=1), "NSE"),
+        (10_005, 11, START + timedelta(seconds=2), "NSE"),
+        (10_005, 11, START + timedelta(seconds=3), "BSE"),
+    ]
+    assert _stored(tick_filter, "TCS", quotes) == quotes
+    assert tick_filter.held("TCS") is None and tick_filter.collapsed == 0
+    print("✅ Price, volume and exchange changes stored")
+
+
+def test_runs_keep_both_ends():
+    """A run keeps its first tick and, once the price moves, its latest repeat just before the change"""
+    print("Testing runs of repeats...")
+    tick_filter = ChangeOnlyFilter()
+    quotes = _quotes([100, 100, 100, 100, 105, 105, 110])
+    stored = _stored(tick_filter, "TCS", quotes)
+    assert stored == [quotes[0], quotes[3], quotes[4], quotes[5], quotes[6]], stored
+    # Two repeats in the middle of the first run were only counted
+    assert tick_filter.collapsed == 2 and tick_filter.offered == 7
+    assert [quote[2] for quote in stored] == sorted(quote[2] for quote in stored)
+    print("✅ Run endpoints kept, 2 middle repeats collapsed")
+
+
+def test_drain_takes_held_run_ends():
+    """drain() hands over the open runs' latest repeats once; the runs keep collapsing afterwards"""
+    print("Testing drain at shutdown...")
+    tick_filter = ChangeOnlyFilter()
+    a = _quotes([100, 100, 100])
+    b = _quotes([200, 201])
+    _stored(tick_filter, "AAA", a)
+    _stored(tick_filter, "BBB", b)
+    assert tick_filter.held("AAA") == a[2] and tick_filter.held("BBB") is None
+
+    assert tick_filter.drain() == [("AAA", a[2])]
+    assert tick_filter.drain() == []
+    assert tick_filter.stats()["held_runs"] == 0
+    # Still the same run: the next repeat is held again, not stored
+    later = (100, 10, START + timedelta(seconds=9), "NSE")
+    assert tick_filter.offer("AAA", later) == [] and tick_filter.held("AAA") == later
+    print("✅ Held run end drained once")
+
+
+def test_symbols_are_independent():
+    """Interleaved symbols each have their own previous tick and held run end"""
+    print("Testing interleaved symbols...")
+    tick_filter = ChangeOnlyFilter()
+    a, b = _quotes([100, 100, 101]), _quotes([100, 100, 100])
+    stored = []
+    for qa, qb in zip(a, b):
+        stored += [("A", q) for q in tick_filter.offer("A", qa)]
+        stored += [("B", q) for q in tick_filter.offer("B", qb)]
+    assert stored == [("A", a[0]), ("B", b[0]), ("A", a[1]), ("A", a[2])], stored
+    assert tick_filter.held("B") == b[2]
+    print("✅ Symbols filtered independently")
+
+
+def test_disabled_stores_everything():
+    """TICK_CHANGE_ONLY=false: every tick is stored and nothing is held"""
+    print("Testing the disabled filter...")
+    tick_filter = ChangeOnlyFilter(enabled=False)
+    quotes = _quotes([100, 100, 100])
+    assert _stored(tick_filter, "TCS", quotes) == quotes
+    assert tick_filter.drain() == []
+    print("✅ Disabled filter stores every tick")
+
+
+def main():
+    """Run change-only tick filter tests"""
+    print("🧪 QuantAlert Tick Filter Test")
+    print("=" * 50)
+    test_changes_are_stored()
+    test_runs_keep_both_ends()
+    test_drain_takes_held_run_ends()
+    test_symbols_are_independent()
+    test_disabled_stores_everything()
+    print("=" * 50)
+    print("✅ All tick filter tests completed!")
+
+
+if __name__ == "__main__":
+    main()
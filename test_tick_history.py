@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tick history test for QuantAlert's /ticks queries
+Drives a private MarketDataManager (temporary DuckDB file and archive
+directory) and checks that:
+  - get_ticks returns every tick exactly once while a flush commits, whether
+    the commit lands before, during or after the hot-table query
+  - closed days move to the Parquet archive and read back unchanged
+  - late ticks for an archived day add a file that compaction merges back
+No running API or market feed is required.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from app.config import Settings
+from app.market_data import MarketDataManager
+from app.prices import Paise
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_tick_history.duckdb")
+ARCHIVE_PATH = os.path.join(tempfile.gettempdir(), "quantalert_tick_history_archive")
+
+
+def _manager():
+    """A MarketDataManager of its own; ticks stay buffered until a test flushes them"""
+    for leftover in (DB_PATH, DB_PATH + ".wal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    shutil.rmtree(ARCHIVE_PATH, ignore_errors=True)
+    return MarketDataManager(Settings(
+        duckdb_path=DB_PATH,
+        tick_archive_path=ARCHIVE_PATH,
+        quote_table_path=os.path.join(tempfile.gettempdir(), "quantalert_tick_history.shm"),
+        tick_flush_rows=1_000_000,
+        tick_flush_seconds=3600,
+    ))
+
+
+def _store(market_data, symbol, prices):
+    for price in prices:
+        market_data.store_tick(symbol, Paise(price), 1, "NSE")
+
+
+def _history(market_data, symbol):
+    now = datetime.now()
+    ticks = market_data.get_ticks(symbol, now - timedelta(days=10), now + timedelta(minutes=1), 10_000)
+    return sorted(int(tick.price * 100) for tick in ticks)
+
+
+def test_read_while_flushing():
+    """A flush committing at any point of a read neither duplicates nor drops its ticks"""
+    print("Testing reads during a tick flush...")
+    market_data = _manager()
+    try:
+        prices = list(range(10_000, 10_200))
+        db_fetchall, pending = market_data.db.fetchall, market_data.tick_writer.pending
+
+        # Commit right after the buffered rows were taken: the query sees them too
+        _store(market_data, "HISTA", prices)
+        def pending_then_flush(*args):
+            rows = pending(*args)
+            market_data.flush_ticks()
+            return rows
+        market_data.tick_writer.pending = pending_then_flush
+        assert _history(market_data, "HISTA") == prices
+        market_data.tick_writer.pending = pending
+
+        # Commit right after the hot-table query: only the buffered rows have them
+        _store(market_data, "HISTB", prices)
+        def fetchall_then_flush(*args):
+            rows = db_fetchall(*args)
+            market_data.flush_ticks()
+            return rows
+        market_data.db.fetchall = fetchall_then_flush
+        assert _history(market_data, "HISTB") == prices
+        market_data.db.fetchall = db_fetchall
+
+        # Reads while a slow flush holds its batch in flight
+        _store(market_data, "HISTC", prices)
+        market_data.tick_writer.after_load.append(lambda cursor, table, view: time.sleep(0.2))
+        flusher = threading.Thread(target=market_data.flush_ticks)
+        flusher.start()
+        reads = 0
+        while flusher.is_alive() or reads == 0:
+            assert _history(market_data, "HISTC") == prices
+            reads += 1
+        flusher.join()
+        assert _history(market_data, "HISTC") == prices
+        print(f"✅ Every tick returned once across the flush ({reads} reads during it)")
+    finally:
+        market_data.close()
+
+
+def test_archive_round_trip():
+    """Closed days read back unchanged from Parquet; a late file is compacted into the day's partition"""
+    print("Testing the tick archive round trip...")
+    market_data = _manager()
+    try:
+        today = date.today()
+        days = [today - timedelta(days=2), today - timedelta(days=1)]
+        expected = []
+        for offset, day in enumerate(days):
+            start = datetime(day.year, day.month, day.day, 9, 15)
+            for i in range(50):
+                # Small moves with repeats, the shape delta encoding is meant for
+                price = 250_000 + offset * 1_000 + (i % 7) - 3
+                market_data.db.execute(
+                    "INSERT INTO ticks (symbol, price, volume, timestamp, exchange) VALUES (?, ?, ?, ?, ?)",
+                    ["HISTD", price / 100, 10 + i, start + timedelta(seconds=i), "NSE"],
+                )
+                expected.append(price)
+        _store(market_data, "HISTD", [260_000])
+        market_data.flush_ticks()
+        expected.append(260_000)
+
+        assert market_data.archive_ticks()["archived_rows"] == 100
+        assert market_data.db.fetchone("SELECT count(*) FROM ticks WHERE symbol = 'HISTD'")[0] == 1
+        files = [name for _, _, names in os.walk(ARCHIVE_PATH) for name in names]
+        assert len(files) == 2 and all(name.startswith("delta_") for name in files), files
+        assert _history(market_data, "HISTD") == sorted(expected)
+        volumes = sorted(tick.volume for tick in market_data.get_ticks(
+            "HISTD", datetime.combine(days[0], datetime.min.time()), datetime.combine(today, datetime.min.time())
+        ))
+        assert volumes == sorted(list(range(10, 60)) * 2)
+
+        # A late tick for an archived day: a second file, merged by the next run
+        late = datetime(days[1].year, days[1].month, days[1].day, 15, 29)
+        market_data.db.execute(
+            "INSERT INTO ticks (symbol, price, volume, timestamp, exchange) VALUES (?, ?, ?, ?, ?)",
+            ["HISTD", 2_512.34, 5, late, "NSE"],
+        )
+        result = market_data.archive_ticks()
+        assert result == {"archived_rows": 1, "compacted_partitions": 1}, result
+        partition = os.path.join(ARCHIVE_PATH, f"date={days[1].isoformat()}", "symbol=HISTD")
+        assert len(os.listdir(partition)) == 1, os.listdir(partition)
+        assert _history(market_data, "HISTD") == sorted(expected + [251_234])
+        assert market_data.get_latest_price("HISTD").price == 2600
+        print("✅ Archived days read back unchanged; late file compacted")
+    finally:
+        market_data.close()
+
+
+def main():
+    """Run tick history tests"""
+    print("🧪 QuantAlert Tick History Test")
+    print("=" * 50)
+    test_read_while_flushing()
+    test_archive_round_trip()
+    print("=" * 50)
+    print("✅ All tick history tests completed!")
+
+
+if __name__ == "__main__":
+    main()
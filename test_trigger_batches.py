@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Trigger persistence test for QuantAlert's alert worker
+Writes fired batches through AlertWorker._persist_triggers / _fire_batch on a
+temporary SQLite database and checks that:
+  - a batch's triggers and one-shot deactivations commit together
+  - a commit that went through but reported failure is retried without
+    duplicating a trigger (ON CONFLICT (alert_rule_id, batch_id) DO NOTHING)
+  - replaying a batch id adds nothing; a new batch id records again
+  - a write that keeps failing gives up after trigger_write_attempts and leaves nothing
+  - _fire_batch marks the delivered emails of its batch as sent
+No running API, SMTP server or market feed is required.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import AlertRule, AlertRuleChange, AlertTrigger, User
+from app.rule_index import CachedRule
+from app.worker import AlertWorker
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_trigger_batches.db")
+
+
+def _setup():
+    """Fresh database with a one-shot and a recurring rule, and a worker writing to it"""
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(User(id=1, email="batch@example.com", password_hash="x"))
+    db.add(AlertRule(id=1, user_id=1, symbol="TCS", condition_type=">", target_price=Decimal("100.00")))
+    db.add(AlertRule(id=2, user_id=1, symbol="INFY", condition_type="<", target_price=Decimal("50.00"),
+                     alert_type="recurring", cooldown_minutes=5))
+    db.commit()
+    worker = AlertWorker()
+    worker._new_db_session = Session
+    fired = [(CachedRule.from_model(rule), price) for rule, price in ((db.get(AlertRule, 1), 10_050),
+                                                                        (db.get(AlertRule, 2), 4_990))]
+    return db, worker, fired
+
+
+def _triggers(db):
+    return sorted((t.alert_rule_id, t.batch_id, t.triggered_price) for t in db.query(AlertTrigger))
+
+
+def _active(db, rule_id):
+    db.expire_all()
+    return db.get(AlertRule, rule_id).is_active
+
+
+def test_retry_after_unacknowledged_commit():
+    """The first COMMIT lands but raises; the retry must not add a second copy"""
+    print("Testing a retried batch whose first commit went through...")
+    db, worker, fired = _setup()
+    commit, calls = db.commit, []
+
+    def commit_then_fail():
+        calls.append(True)
+        commit()
+        if len(calls) == 1:
+            raise ConnectionError("connection lost before the COMMIT was acknowledged")
+
+    db.commit = commit_then_fail
+    worker._persist_triggers(db, fired, "batch1")
+    assert len(calls) == 2
+    assert _triggers(db) == [(1, "batch1", Decimal("100.50")), (2, "batch1", Decimal("49.90"))]
+    assert not _active(db, 1) and _active(db, 2)
+    # Both attempts queued a change row for the one-shot rule; replaying a change is harmless
+    assert {c.alert_rule_id for c in db.query(AlertRuleChange)} == {1}
+    db.close()
+    print("✅ One trigger per rule after the retry; one-shot rule disabled")
+
+
+def test_replayed_batch_id():
+    """Writing the same batch twice is a no-op; another batch id records new rows"""
+    print("Testing replayed batch ids...")
+    db, worker, fired = _setup()
+    worker._persist_triggers(db, fired, "batch1")
+    worker._persist_triggers(db, fired, "batch1")
+    assert [row[:2] for row in _triggers(db)] == [(1, "batch1"), (2, "batch1")]
+    worker._persist_triggers(db, fired[1:], "batch2")
+    assert [row[:2] for row in _triggers(db)] == [(1, "batch1"), (2, "batch1"), (2, "batch2")]
+    db.close()
+    print("✅ Replay ignored, next batch recorded")
+
+
+def test_gives_up_after_attempts():
+    """A write failing every time is rolled back after trigger_write_attempts tries"""
+    print("Testing a batch write that keeps failing...")
+    db, worker, fired = _setup()
+    calls = []
+
+    def failing_commit():
+        calls.append(True)
+        raise ConnectionError("database unavailable")
+
+    db.commit = failing_commit
+    try:
+        worker._persist_triggers(db, fired, "batch1")
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("persisting a failing batch did not raise")
+    assert len(calls) == max(1, settings.trigger_write_attempts)
+    assert _triggers(db) == [] and _active(db, 1)
+    db.close()
+    print(f"✅ Gave up after {len(calls)} attempts with nothing written")
+
+
+def test_fire_batch_marks_emails():
+    """One evaluation batch: triggers recorded, emails marked sent, one-shot rule leaves the index"""
+    print("Testing a fired batch end to end...")
+    db, worker, fired = _setup()
+    worker.rule_index.load([rule for rule, _ in fired])
+    sent = []
+
+    async def send(alert, triggered_price):
+        sent.append((alert.id, triggered_price))
+        return True
+
+    worker._send_alert_email = send
+    asyncio.run(worker._fire_batch([("TCS", [1], 10_050, None), ("INFY", [2], 4_990, None)]))
+    assert sorted(sent) == [(1, Decimal("100.50")), (2, Decimal("49.90"))]
+    db.expire_all()
+    assert all(t.email_sent for t in db.query(AlertTrigger)) and len(_triggers(db)) == 2
+    assert 1 not in worker.rule_index and 2 in worker.rule_index
+    assert worker.cooldowns.active(2, time.time()) and len(worker.cooldowns) == 1
+    db.close()
+    print("✅ Batch recorded, emails marked, recurring rule cooling down")
+
+
+def main():
+    """Run trigger persistence tests"""
+    print("🧪 QuantAlert Trigger Batch Test")
+    print("=" * 50)
+    test_retry_after_unacknowledged_commit()
+    test_replayed_batch_id()
+    test_gives_up_after_attempts()
+    test_fire_batch_marks_emails()
+    print("=" * 50)
+    print("✅ All trigger batch tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Shutdown test for QuantAlert's worker
+Feeds ticks through the worker's ingest path in a child process, stops the
+worker the way a real shutdown does and checks in the DuckDB file that:
+  - the open 1-minute bar of every symbol was saved to ohlcv_1min
+  - the open 5m/15m/1h/1d rollup bars were saved to their tables
+  - the held end of an unchanged run (change-only tick filter) was stored
+  - a restarted worker takes those partial bars over instead of duplicating them
+  - the worker's shared quote table file was deleted
+No running API or market feed is required.
+"""
+
+import asyncio
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "quantalert_shutdown_test.duckdb")
+QUOTE_TABLE_PATH = os.path.join(tempfile.gettempdir(), "quantalert_shutdown_quotes.shm")
+# Environment of the worker child only; this process's own stays untouched
+WORKER_ENV = {
+    "DUCKDB_PATH": DB_PATH,
+    "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.gettempdir(), 'quantalert_shutdown_test.db')}",
+    "TICK_ARCHIVE_PATH": os.path.join(tempfile.gettempdir(), "quantalert_shutdown_archive"),
+    "QUOTE_TABLE_PATH": QUOTE_TABLE_PATH,
+    # Nothing may reach DuckDB before the shutdown flush
+    "TICK_FLUSH_ROWS": "1000000",
+    "TICK_FLUSH_SECONDS": "3600",
+}
+
+# symbol -> prices in paise, in arrival order
+TICKS = {
+    "SHUTA": [250000, 250500, 249000, 250200],
+    "SHUTB": [10000, 10100],
+    # Ends on a run of repeats: the last one is held by the change-only filter
+    "SHUTC": [5000, 5100, 5100, 5100, 5100],
+}
+VOLUME = 3
+
+
+def _ingest_and_stop(env):
+    """Child process: ingest TICKS through the worker, then run its shutdown path"""
+    # Before the first app import, which reads settings from the environment
+    os.environ.update(env)
+    from app.prices import Paise
+    from app.worker import AlertWorker
+
+    worker = AlertWorker()
+
+    async def ingest():
+        for symbol, prices in TICKS.items():
+            for price in prices:
+                await worker.price_batch_callback([(symbol, Paise(price), VOLUME, "NSE")])
+
+    async def no_broadcast(message):
+        pass
+
+    worker._broadcast_price_update = no_broadcast
+    worker._open_quote_table()
+    asyncio.run(ingest())
+    worker.stop()
+
+
+def _stored_ticks(prices):
+    """Ticks the change-only filter stores: each change, plus the last repeat of a run"""
+    stored = []
+    for i, price in enumerate(prices):
+        repeat = i > 0 and prices[i - 1] == price
+        run_end = i + 1 == len(prices) or prices[i + 1] != price
+        if not repeat or run_end:
+            stored.append(price)
+    return stored
+
+
+def _fresh_db(seconds_needed: int):
+    for leftover in (DB_PATH, DB_PATH + ".wal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    if datetime.now().second > 60 - seconds_needed:
+        # Keep every tick inside one minute
+        time.sleep(61 - datetime.now().second)
+
+
+def _run_worker():
+    child = mp.get_context("spawn").Process(target=_ingest_and_stop, args=(WORKER_ENV,))
+    child.start()
+    child.join(120)
+    assert child.exitcode == 0, f"worker child exited with {child.exitcode}"
+
+
+def _ohlcv_rows(conn, table):
+    return conn.execute(f"""
+        SELECT symbol, CAST(open_price * 100 AS BIGINT), CAST(high_price * 100 AS BIGINT),
+               CAST(low_price * 100 AS BIGINT), CAST(close_price * 100 AS BIGINT), volume
+        FROM {table} ORDER BY symbol
+    """).fetchall()
+
+
+def test_stop_saves_open_bars():
+    """worker.stop() persists the open minute bars, every open rollup bar and held ticks"""
+    print("Testing that a worker shutdown saves open OHLCV bars...")
+    import duckdb
+    from app.bars import OHLCV_TABLES
+
+    _fresh_db(15)
+    _run_worker()
+
+    conn = duckdb.connect(DB_PATH, read_only=True)
+    try:
+        for table in OHLCV_TABLES.values():
+            rows = _ohlcv_rows(conn, table)
+            # Every tick fell into the same minute, hence the same period of each timeframe
+            expected = [
+                (symbol, prices[0], max(prices), min(prices), prices[-1], VOLUME * len(prices))
+                for symbol, prices in sorted(TICKS.items())
+            ]
+            assert rows == expected, f"{table}: {rows} != {expected}"
+        print(f"✅ Open bars saved to {', '.join(OHLCV_TABLES.values())}")
+
+        for symbol, prices in TICKS.items():
+            stored = [row[0] for row in conn.execute(
+                "SELECT CAST(price * 100 AS BIGINT) FROM ticks WHERE symbol = ? ORDER BY timestamp", [symbol]
+            ).fetchall()]
+            assert stored == _stored_ticks(prices), f"{symbol} ticks: {stored} != {_stored_ticks(prices)}"
+        print("✅ Held run ends stored on shutdown")
+        assert not os.path.exists(QUOTE_TABLE_PATH), "quote table left behind"
+        print("✅ Shared quote table removed")
+    finally:
+        conn.close()
+
+
+def test_restart_resumes_open_bars():
+    """A worker restarted within the minute continues the bars the previous one saved"""
+    print("Testing that a restarted worker resumes the saved partial bars...")
+    import duckdb
+    from app.bars import OHLCV_TABLES
+
+    _fresh_db(30)
+    _run_worker()
+    _run_worker()
+
+    conn = duckdb.connect(DB_PATH, read_only=True)
+    try:
+        for table in OHLCV_TABLES.values():
+            rows = _ohlcv_rows(conn, table)
+            # Same ticks twice in one minute: still one bar per symbol, with both runs' volume
+            expected = [
+                (symbol, prices[0], max(prices), min(prices), prices[-1], 2 * VOLUME * len(prices))
+                for symbol, prices in sorted(TICKS.items())
+            ]
+            assert rows == expected, f"{table}: {rows} != {expected}"
+        print("✅ Partial bars resumed and replaced, not duplicated")
+    finally:
+        conn.close()
+
+
+def main():
+    """Run worker shutdown tests"""
+    print("🧪 QuantAlert Worker Shutdown Test")
+    print("=" * 50)
+    test_stop_saves_open_bars()
+    test_restart_resumes_open_bars()
+    print("=" * 50)
+    print("✅ All worker shutdown tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Batched quote test for QuantAlert's Yahoo Finance client
+Parses quoteResponse results and runs YahooQuoteClient against a local
+stand-in for the Yahoo endpoints (cookie, getcrumb, v7 quote), checking that:
+  - parse_quotes converts rupee floats to paise like to_paise, drops quotes
+    without a price and fills missing volume/time with 0
+  - symbols go out in chunk_size requests after a single cookie/crumb fetch
+  - a rejected crumb (401) is refreshed once for all chunks and retried
+  - a chunk whose request fails comes back as failed symbols
+No running API, network or market feed is required.
+"""
+
+import asyncio
+
+from aiohttp import web
+
+from app.prices import to_paise
+from app.yahoo_quotes import YahooQuoteClient, parse_quotes
+
+PRICES = {"AAA.NS": 2512.35, "BBB.NS": 0.1 + 0.2, "CCC.NS": 101.005, "DDD.NS": 99.99, "EEE.NS": 1500.0}
+
+
+class FakeYahoo:
+    """Serves the three endpoints; `crumb` is the one quote requests must carry"""
+
+    def __init__(self):
+        self.crumb_version = 1
+        self.crumb_requests = 0
+        self.quote_requests = []
+        self.failing = set()
+
+    @property
+    def crumb(self):
+        return f"crumb{self.crumb_version}"
+
+    async def cookie(self, request):
+        response = web.Response(status=404)
+        response.set_cookie("A3", "session")
+        return response
+
+    async def getcrumb(self, request):
+        self.crumb_requests += 1
+        assert request.cookies.get("A3") == "session"
+        return web.Response(text=self.crumb + "\n")
+
+    async def quote(self, request):
+        symbols = request.query["symbols"].split(",")
+        self.quote_requests.append(symbols)
+        if request.query.get("crumb") != self.crumb:
+            return web.Response(status=401)
+        if self.failing & set(symbols):
+            return web.Response(status=500)
+        result = [
+            {"symbol": s, "regularMarketPrice": PRICES[s], "regularMarketVolume": 10, "regularMarketTime": 1_700_000_000}
+            for s in symbols if s in PRICES
+        ]
+        return web.json_response({"quoteResponse": {"result": result, "error": None}})
+
+
+async def _serve(yahoo):
+    app = web.Application()
+    app.router.add_get("/cookie", yahoo.cookie)
+    app.router.add_get("/v1/test/getcrumb", yahoo.getcrumb)
+    app.router.add_get("/v7/finance/quote", yahoo.quote)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    # By name: the client cookie jar ignores cookies set by bare IP hosts
+    return runner, f"http://localhost:{port}"
+
+
+def test_parse_quotes():
+    """Prices in paise, unpriced quotes dropped, gaps filled with 0"""
+    print("Testing parse_quotes...")
+    quotes = parse_quotes([
+        {"symbol": "AAA.NS", "regularMarketPrice": 2512.35, "regularMarketVolume": 1200, "regularMarketTime": 1_700_000_000},
+        {"symbol": "BBB.NS", "regularMarketPrice": 0.1 + 0.2},
+        {"symbol": "CCC.NS", "regularMarketVolume": 5},
+        {"symbol": "DDD.NS", "regularMarketPrice": None, "regularMarketVolume": 7},
+    ])
+    assert list(quotes.index) == ["AAA.NS", "BBB.NS"]
+    assert quotes["price"].tolist() == [to_paise(2512.35), to_paise(0.1 + 0.2)] == [251235, 30]
+    assert quotes["volume"].tolist() == [1200, 0] and quotes["time"].tolist() == [1_700_000_000, 0]
+    assert str(quotes["price"].dtype) == "int64"
+    assert len(parse_quotes([])) == 0
+    print("✅ Quotes parsed into paise")
+
+
+async def _fetch_rounds():
+    yahoo = FakeYahoo()
+    runner, host = await _serve(yahoo)
+    client = YahooQuoteClient(chunk_size=2, max_connections=2, timeout_seconds=5,
+                              host=host, cookie_url=f"{host}/cookie")
+    symbols = sorted(PRICES) + ["ZZZ.NS"]
+    try:
+        quotes, failed = await client.fetch(symbols)
+        assert failed == [] and sorted(quotes.index) == sorted(PRICES)
+        assert quotes.loc["CCC.NS", "price"] == to_paise(101.005)
+        assert yahoo.crumb_requests == 1 and len(yahoo.quote_requests) == 3
+        assert all(len(chunk) <= 2 for chunk in yahoo.quote_requests)
+
+        # Yahoo rotates the crumb: every chunk is rejected once, the crumb is fetched once
+        yahoo.crumb_version += 1
+        yahoo.quote_requests.clear()
+        quotes, failed = await client.fetch(symbols)
+        assert failed == [] and len(quotes) == len(PRICES)
+        assert yahoo.crumb_requests == 2 and len(yahoo.quote_requests) == 6
+
+        # One chunk's request fails; the others still answer
+        yahoo.failing = {"CCC.NS"}
+        quotes, failed = await client.fetch(symbols)
+        assert sorted(failed) == ["CCC.NS", "DDD.NS"]
+        assert sorted(quotes.index) == ["AAA.NS", "BBB.NS", "EEE.NS"]
+        return client.stats(), yahoo.crumb_requests
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_chunks_and_crumb_refresh():
+    """Chunked requests share one crumb, refresh it once on 401 and report failed chunks"""
+    print("Testing chunked quote requests and crumb refresh...")
+    stats, crumb_requests = asyncio.run(_fetch_rounds())
+    assert crumb_requests == 2
+    # 2 crumb fetches of 2 requests each, 3 + 6 + 3 quote requests
+    assert stats == {"requests": 16, "failed_requests": 1}, stats
+    print("✅ One crumb per session, refreshed once after a 401")
+
+
+def main():
+    """Run Yahoo quote client tests"""
+    print("🧪 QuantAlert Yahoo Quotes Test")
+    print("=" * 50)
+    test_parse_quotes()
+    test_chunks_and_crumb_refresh()
+    print("=" * 50)
+    print("✅ All Yahoo quote tests completed!")
+
+
+if __name__ == "__main__":
+    main()